@@ -2,6 +2,22 @@ from .database import collection_name_users
 from .database import collection_name_holdings
 from .database import collection_name_journals
 from .database import collection_name_trades
+from .database import collection_name_price_history
+from .database import collection_name_lot_events
+from .database import collection_name_lots
+from .database import collection_name_pnl
+from .database import collection_name_tombstones
+from .database import collection_name_idempotency_keys
+from .database import collection_name_job_locks
+from .database import collection_name_job_runs
+from .database import collection_name_pnl_rollups
+from .database import collection_name_journals_archive
+from .database import collection_name_statements
+from .database import collection_name_export_checkpoints
+from .database import collection_name_deletion_jobs
+from .database import collection_name_strategy_stats
+from .database import collection_name_view_checkpoints
+from .database import collection_name_fx_rates
 
-__all__  = ["collection_name_users", "collection_name_holdings", "collection_name_journals", "collection_name_trades"]
+__all__  = ["collection_name_users", "collection_name_holdings", "collection_name_journals", "collection_name_trades", "collection_name_price_history", "collection_name_lot_events", "collection_name_lots", "collection_name_pnl", "collection_name_tombstones", "collection_name_idempotency_keys", "collection_name_job_locks", "collection_name_job_runs", "collection_name_pnl_rollups", "collection_name_journals_archive", "collection_name_statements", "collection_name_export_checkpoints", "collection_name_deletion_jobs", "collection_name_strategy_stats", "collection_name_view_checkpoints", "collection_name_fx_rates"]
 
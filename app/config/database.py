@@ -1,7 +1,10 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING
 from pymongo.server_api import ServerApi
+from pymongo.errors import CollectionInvalid, OperationFailure
 import os
 from dotenv import load_dotenv
+from app.services.metrics import CommandMetrics
+from app.services.tracing import CommandTracing
 
 # Load environment variables from .env file
 load_dotenv()
@@ -9,14 +12,131 @@ load_dotenv()
 # Get the MongoDB URL from environment variables
 DATABASE_URL = os.getenv("MONGO_URL")
 
+# Database name, overridable so tests can run against a throwaway database
+DATABASE_NAME = os.getenv("DATABASE_NAME", "journalpro")
+
+# Tombstones for deleted records are kept this long for delta sync
+TOMBSTONE_RETENTION_DAYS = int(os.getenv("TOMBSTONE_RETENTION_DAYS", "90"))
+
+# Idempotency keys (and their recorded responses) expire after this many hours
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+
+# Scheduled job run records are kept this long
+JOB_RUN_RETENTION_DAYS = int(os.getenv("JOB_RUN_RETENTION_DAYS", "30"))
+
+# Price ticks older than this are expired by the server (0 keeps them forever)
+PRICE_HISTORY_EXPIRE_DAYS = int(os.getenv("PRICE_HISTORY_EXPIRE_DAYS", "0"))
+
 # Create MongoDB client
-client = MongoClient(DATABASE_URL, server_api=ServerApi('1'))
+client = MongoClient(DATABASE_URL, server_api=ServerApi('1'), event_listeners=[CommandMetrics(), CommandTracing()])
 
 # Access the database
-db = client.journalpro
+db = client[DATABASE_NAME]
 
 # Access specific collections
 collection_name_users = db["users"]
 collection_name_holdings = db["holdings"]
 collection_name_trades = db["trades"]
 collection_name_journals = db["journals"]
+collection_name_price_history = db["price_history"]
+collection_name_lot_events = db["lot_events"]
+collection_name_lots = db["lots"]
+collection_name_pnl = db["pnl"]
+collection_name_tombstones = db["tombstones"]
+collection_name_idempotency_keys = db["idempotency_keys"]
+collection_name_job_locks = db["job_locks"]
+collection_name_job_runs = db["job_runs"]
+collection_name_pnl_rollups = db["pnl_rollups"]
+collection_name_journals_archive = db["journals_archive"]
+collection_name_statements = db["statements"]
+collection_name_export_checkpoints = db["export_checkpoints"]
+collection_name_deletion_jobs = db["deletion_jobs"]
+collection_name_strategy_stats = db["strategy_stats"]
+collection_name_view_checkpoints = db["view_checkpoints"]
+collection_name_fx_rates = db["fx_rates"]
+
+
+def init_collections():
+    """Creates collections that need explicit options (time-series etc.) and indexes."""
+    existing = set(db.list_collection_names())
+
+    if "price_history" not in existing:
+        options = {
+            "timeseries": {
+                "timeField": "timestamp",
+                "metaField": "asset_name",
+                "granularity": "minutes",
+            }
+        }
+        if PRICE_HISTORY_EXPIRE_DAYS > 0:
+            options["expireAfterSeconds"] = PRICE_HISTORY_EXPIRE_DAYS * 86400
+        try:
+            db.create_collection("price_history", **options)
+        except CollectionInvalid:
+            # Another worker created it first
+            pass
+
+    # Latest price per asset before a chart window (time-series secondary index)
+    collection_name_price_history.create_index([("asset_name", ASCENDING), ("timestamp", DESCENDING)])
+
+    # Per-user holdings grouped by asset for the positions view
+    collection_name_holdings.create_index([("user", ASCENDING), ("asset_name", ASCENDING)])
+
+    # Delta sync reads changes and tombstones per user since a checkpoint
+    for collection in (collection_name_trades, collection_name_holdings, collection_name_journals):
+        collection.create_index([("user", ASCENDING), ("updated_at", ASCENDING)])
+    collection_name_tombstones.create_index([("user", ASCENDING), ("deleted_at", ASCENDING)])
+    collection_name_tombstones.create_index("deleted_at", expireAfterSeconds=TOMBSTONE_RETENTION_DAYS * 86400)
+
+    # Per-user trades by date for listings and calendar buckets; _id breaks ties in search pages
+    collection_name_trades.create_index([("user", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)])
+
+    # Tag filters: multikey indexes on the tags arrays, plus date ordering for journals
+    collection_name_trades.create_index([("user", ASCENDING), ("tags", ASCENDING)])
+    collection_name_journals.create_index([("user", ASCENDING), ("tags", ASCENDING)])
+    collection_name_journals.create_index([("user", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)])
+
+    # The {user, date, _id} indexes serve every query the older {user, date} ones did
+    for collection in (collection_name_trades, collection_name_journals):
+        try:
+            collection.drop_index("user_1_date_1")
+        except OperationFailure:
+            # Already dropped, or never created
+            pass
+
+    # Idempotency keys are looked up by _id and expire on their own
+    collection_name_idempotency_keys.create_index("created_at", expireAfterSeconds=IDEMPOTENCY_TTL_HOURS * 3600)
+
+    # Scheduler run history and nightly rollups
+    collection_name_job_runs.create_index([("job", ASCENDING), ("started_at", ASCENDING)])
+    collection_name_job_runs.create_index("finished_at", expireAfterSeconds=JOB_RUN_RETENTION_DAYS * 86400)
+    collection_name_pnl_rollups.create_index([("user", ASCENDING), ("day", ASCENDING)])
+
+    # Register, login and password reset look users up by email
+    collection_name_users.create_index([("email", ASCENDING)])
+
+    # Journal archiving and ban expiry sweeps
+    collection_name_journals.create_index([("date", ASCENDING)])
+    collection_name_users.create_index([("is_banned", ASCENDING), ("ban_time", ASCENDING)])
+
+    # Account deletions still to be processed; archived journals are only ever removed per user
+    collection_name_deletion_jobs.create_index([("status", ASCENDING), ("requested_at", ASCENDING)])
+    collection_name_journals_archive.create_index([("user", ASCENDING)])
+
+    # Rendered statements are fetched by _id and flagged stale per user and month
+    collection_name_statements.create_index([("user", ASCENDING), ("month", ASCENDING)])
+    collection_name_statements.create_index([("stale", ASCENDING)])
+
+    # Strategy stats refresh: trades changed since the last run, recomputed per strategy
+    # from a covering index; the leaderboard sorts the small stats collection
+    collection_name_trades.create_index([("updated_at", ASCENDING)])
+    collection_name_trades.create_index([("strategy_name", ASCENDING), ("user", ASCENDING), ("profit_or_loss", ASCENDING)])
+    collection_name_strategy_stats.create_index([("stale", ASCENDING)])
+    for field in ("win_rate", "avg_pnl", "trades"):
+        collection_name_strategy_stats.create_index([(field, DESCENDING)])
+
+    # Lot-matching ledger, open lots and per-asset P&L
+    collection_name_lot_events.create_index([("user", ASCENDING), ("asset_name", ASCENDING), ("date", ASCENDING)])
+    collection_name_lot_events.create_index([("user", ASCENDING), ("source_id", ASCENDING)])
+    collection_name_lots.create_index([("user", ASCENDING), ("asset_name", ASCENDING), ("date", ASCENDING)])
+    collection_name_pnl.create_index([("user", ASCENDING), ("asset_name", ASCENDING)], unique=True)
@@ -3,6 +3,7 @@ from datetime import datetime, timedelta
 from jose import jwt, JWTError
 from fastapi import HTTPException, Request, status
 from typing import Optional
+from app.services.tracing import span
 
 import os
 from dotenv import load_dotenv
@@ -27,6 +28,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 def verify_token_dependency(request: Request):
     """Middleware-like dependency to verify JWT token."""
+    with span("auth.verify_token"):
+        return _verify_token(request)
+
+
+def _verify_token(request: Request):
     token = request.headers.get("Authorization")
     if not token:
         raise HTTPException(
@@ -47,7 +53,7 @@ def verify_token_dependency(request: Request):
                 detail="Invalid token payload",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        return {"username": username}
+        return {"username": username, "email": payload.get("email", username)}
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -10,8 +10,8 @@ MAIL_PASSWORD=os.getenv("MAIL_PASSWORD")
 MAIL_FROM=os.getenv("MAIL_FROM")
 MAIL_PORT=os.getenv("MAIL_PORT")
 MAIL_SERVER=os.getenv("MAIL_SERVER")
-MAIL_TLS=True
-MAIL_SSL=False
+MAIL_STARTTLS=True
+MAIL_SSL_TLS=False
 
 mail_conf = ConnectionConfig(
     MAIL_USERNAME=MAIL_USERNAME,
@@ -19,8 +19,8 @@ mail_conf = ConnectionConfig(
     MAIL_FROM=MAIL_FROM,
     MAIL_PORT=MAIL_PORT,
     MAIL_SERVER=MAIL_SERVER,
-    MAIL_TLS=MAIL_TLS,
-    MAIL_SSL=MAIL_SSL,
+    MAIL_STARTTLS=MAIL_STARTTLS,
+    MAIL_SSL_TLS=MAIL_SSL_TLS,
     USE_CREDENTIALS=True,
     VALIDATE_CERTS=True
 )
\ No newline at end of file
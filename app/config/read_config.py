@@ -0,0 +1,113 @@
+import os
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+
+from app.config.database import client
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Bounded staleness for secondary reads (MongoDB requires at least 90 seconds, -1 disables)
+READ_MAX_STALENESS_SECONDS = int(os.getenv("READ_MAX_STALENESS_SECONDS", "90"))
+
+# After a user's own write, their routed reads wait for that write for this long
+CAUSAL_WINDOW_SECONDS = int(os.getenv("CAUSAL_WINDOW_SECONDS", "60"))
+
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Endpoint class -> (read preference, read concern), overridable per class from the environment
+ENDPOINT_CLASSES = {
+    "detail": (
+        os.getenv("READ_PREFERENCE_DETAIL", "primary"),
+        os.getenv("READ_CONCERN_DETAIL", "local"),
+    ),
+    "listing": (
+        os.getenv("READ_PREFERENCE_LISTING", "secondaryPreferred"),
+        os.getenv("READ_CONCERN_LISTING", "local"),
+    ),
+    "analytics": (
+        os.getenv("READ_PREFERENCE_ANALYTICS", "secondaryPreferred"),
+        os.getenv("READ_CONCERN_ANALYTICS", "majority"),
+    ),
+}
+
+READ_CONCERN_LEVELS = ("local", "available", "majority", "linearizable", "snapshot")
+
+# Fail at startup rather than on the first routed read
+for _endpoint_class, (_mode, _level) in ENDPOINT_CLASSES.items():
+    if _mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"READ_PREFERENCE_{_endpoint_class.upper()} must be one of {', '.join(READ_PREFERENCE_MODES)}, got {_mode!r}")
+    if _level not in READ_CONCERN_LEVELS:
+        raise ValueError(f"READ_CONCERN_{_endpoint_class.upper()} must be one of {', '.join(READ_CONCERN_LEVELS)}, got {_level!r}")
+
+# user_id -> (cluster_time, operation_time, recorded_at) of the user's last write on this worker.
+# It is per process: a read served by another worker than the write falls back to the endpoint
+# class's staleness bound, so deployments that need read-your-own-writes across workers route a
+# user's requests to one worker or read from the primary (READ_PREFERENCE_*=primary)
+user_write_times = {}
+_pruned_at = 0.0
+
+
+def _read_preference(mode: str):
+    preference = READ_PREFERENCE_MODES[mode]
+    if preference is Primary:
+        return Primary()
+    return preference(max_staleness=READ_MAX_STALENESS_SECONDS)
+
+
+def reader(collection, endpoint_class: str):
+    """Returns the collection configured with the endpoint class's read preference and concern."""
+    mode, level = ENDPOINT_CLASSES[endpoint_class]
+    return collection.with_options(read_preference=_read_preference(mode), read_concern=ReadConcern(level))
+
+
+@contextmanager
+def write_session(user_id: str):
+    """Causally consistent session for a user's write; remembers its cluster and operation time."""
+    with client.start_session(causal_consistency=True) as session:
+        yield session
+        if session.operation_time is not None:
+            now = time.time()
+            user_write_times[user_id] = (session.cluster_time, session.operation_time, now)
+            _prune_write_times(now)
+
+
+def _prune_write_times(now: float):
+    """Drops entries past the causal window, at most once per window, so writers who never read again don't pile up."""
+    global _pruned_at
+    if now - _pruned_at < CAUSAL_WINDOW_SECONDS:
+        return
+    _pruned_at = now
+    for user_id, entry in list(user_write_times.items()):
+        if now - entry[2] > CAUSAL_WINDOW_SECONDS and user_write_times.get(user_id) is entry:
+            user_write_times.pop(user_id, None)
+
+
+@contextmanager
+def read_session(user_id: str):
+    """Yields a session that reads after the user's recent write, or None when there is none.
+
+    Passing the session to a secondary read makes that read wait until the
+    secondary has applied the write, which gives read-your-own-writes.
+    """
+    entry = user_write_times.get(user_id)
+    if not entry or time.time() - entry[2] > CAUSAL_WINDOW_SECONDS:
+        user_write_times.pop(user_id, None)
+        yield None
+        return
+
+    cluster_time, operation_time, _ = entry
+    with client.start_session(causal_consistency=True) as session:
+        if cluster_time is not None:
+            session.advance_cluster_time(cluster_time)
+        session.advance_operation_time(operation_time)
+        yield session
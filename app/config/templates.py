@@ -37,3 +37,44 @@ RESET_OTP_TEMPLATE = """
 </body>
 </html>
 """
+
+STATEMENT_HTML_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Statement {{ month }}</title>
+</head>
+<body>
+    <h2>Monthly statement for {{ name }}</h2>
+    <p>Period: {{ month }} &middot; Generated: {{ generated_at.strftime("%Y-%m-%d %H:%M") }}</p>
+
+    <h3>Summary</h3>
+    <p>Trades: {{ summary.trade_count }} &middot; Net P&amp;L: {{ "%.2f"|format(summary.net_pnl) }} {{ currency }} &middot; Win ratio: {{ "%.1f"|format(summary.win_ratio * 100) }}%</p>
+    {% if summary.unconverted_trades %}<p>{{ summary.unconverted_trades }} trade(s) in currencies without an exchange rate to {{ currency }} are left out of the totals.</p>{% endif %}
+
+    <h3>P&amp;L by strategy</h3>
+    <table>
+        <tr><th>Strategy</th><th>Trades</th><th>Wins</th><th>Net P&amp;L ({{ currency }})</th></tr>
+        {% for row in strategies %}
+        <tr><td>{{ row.strategy_name }}</td><td>{{ row.trade_count }}</td><td>{{ row.wins }}</td><td>{{ "%.2f"|format(row.net_pnl) }}</td></tr>
+        {% endfor %}
+    </table>
+
+    <h3>Trades</h3>
+    <table>
+        <tr><th>Date</th><th>Asset</th><th>Category</th><th>Quantity</th><th>Entry</th><th>Exit</th><th>P&amp;L</th><th>Currency</th><th>Strategy</th></tr>
+        {% for trade in trades %}
+        <tr><td>{{ trade.date.strftime("%Y-%m-%d") }}</td><td>{{ trade.asset_name }}</td><td>{{ trade.trade_category }}</td><td>{{ trade.quantity }}</td><td>{{ trade.enter_price }}</td><td>{{ trade.exit_price }}</td><td>{{ "%.2f"|format(trade.profit_or_loss) }}</td><td>{{ trade.currency or default_currency }}</td><td>{{ trade.strategy_name }}</td></tr>
+        {% endfor %}
+    </table>
+
+    <h3>Holdings (as of generation)</h3>
+    <table>
+        <tr><th>Asset</th><th>Quantity</th><th>Avg. price</th><th>Invested</th><th>Current value</th><th>Currency</th></tr>
+        {% for holding in holdings %}
+        <tr><td>{{ holding.asset_name }}</td><td>{{ holding.quantity }}</td><td>{{ "%.2f"|format(holding.avg_bought_price) }}</td><td>{{ "%.2f"|format(holding.total_investment) }}</td><td>{{ "%.2f"|format(holding.current_investment) }}</td><td>{{ holding.currency }}</td></tr>
+        {% endfor %}
+    </table>
+</body>
+</html>
+"""
@@ -0,0 +1,40 @@
+import os
+from dotenv import load_dotenv
+from pymongo.write_concern import WriteConcern
+
+# Load environment variables from .env file
+load_dotenv()
+
+
+def _w(value: str):
+    return int(value) if value.isdigit() else value
+
+
+def _j(value: str):
+    return value.lower() == "true"
+
+
+# Durability tier -> write concern, overridable per tier from the environment
+#   primary: user-authored records (users, trades, holdings, journals) and their tombstones,
+#            since a lost tombstone leaves a deleted record on every synced client
+#   derived: records rebuilt from primary ones (auto journals, lots, P&L, price ticks)
+#   audit:   bookkeeping such as job run history
+WRITE_TIERS = {
+    "primary": WriteConcern(
+        w=_w(os.getenv("WRITE_CONCERN_PRIMARY_W", "majority")),
+        j=_j(os.getenv("WRITE_CONCERN_PRIMARY_J", "true")),
+    ),
+    "derived": WriteConcern(
+        w=_w(os.getenv("WRITE_CONCERN_DERIVED_W", "1")),
+        j=_j(os.getenv("WRITE_CONCERN_DERIVED_J", "false")),
+    ),
+    "audit": WriteConcern(
+        w=_w(os.getenv("WRITE_CONCERN_AUDIT_W", "1")),
+        j=_j(os.getenv("WRITE_CONCERN_AUDIT_J", "false")),
+    ),
+}
+
+
+def writer(collection, tier: str):
+    """Returns the collection configured with the tier's write concern."""
+    return collection.with_options(write_concern=WRITE_TIERS[tier])
@@ -1,3 +1,5 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
@@ -8,12 +10,47 @@ from app.routes.holdings_route import router as holding_router
 from app.routes.trades_route import router as trade_router
 from app.routes.journal_route import router as journal_router
 from app.routes.email_route import router as email_routeer
+from app.routes.prices_route import router as price_router
+from app.routes.pnl_route import router as pnl_router
+from app.routes.sync_route import router as sync_router
+from app.routes.live_route import router as live_router
+from app.routes.metrics_route import router as metrics_router
+from app.routes.statements_route import router as statements_router
+from app.routes.strategies_route import router as strategies_router
+from app.config.database import init_collections
+from app.services.live import start_live, stop_live
+from app.middleware.admission import AdmissionControlMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.negotiation import ContentNegotiationMiddleware
+from app.services.scheduler import SCHEDULER_ENABLED, run_scheduler
+import app.services.jobs  # registers the scheduled jobs
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("MONGO_URL")
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        init_collections()
+    except Exception as e:
+        print(e)
+    try:
+        start_live()
+    except Exception as e:
+        print(e)
+    scheduler = asyncio.create_task(run_scheduler()) if SCHEDULER_ENABLED else None
+    yield
+    if scheduler:
+        scheduler.cancel()
+    stop_live()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(ContentNegotiationMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(AdmissionControlMiddleware)
 
 # Create a new client and connect to the server
 client = MongoClient(DATABASE_URL, server_api=ServerApi('1'))
@@ -31,6 +68,13 @@ app.include_router(holding_router, prefix="/holdings", tags=["holdings"])
 app.include_router(trade_router, prefix="/trades", tags=["trades"])
 app.include_router(journal_router, prefix="/journals", tags=["journals"])
 app.include_router(email_routeer, prefix="/email", tags=["email"])
+app.include_router(price_router, prefix="/prices", tags=["prices"])
+app.include_router(pnl_router, prefix="/pnl", tags=["pnl"])
+app.include_router(sync_router, prefix="/sync", tags=["sync"])
+app.include_router(live_router, prefix="/live", tags=["live"])
+app.include_router(metrics_router, prefix="/metrics", tags=["metrics"])
+app.include_router(statements_router, prefix="/statements", tags=["statements"])
+app.include_router(strategies_router, prefix="/strategies", tags=["strategies"])
 
 # routes
 @app.get("/")
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+
+from dotenv import load_dotenv
+
+from app.services.metrics import increment, set_gauge
+
+load_dotenv()
+
+# How long a queued request may wait for a slot before it is shed
+ADMISSION_QUEUE_TIMEOUT_MS = int(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "2000"))
+
+# Retry-After sent with shed responses
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "2"))
+
+# Route class -> (max in flight, max queued)
+ROUTE_CLASS_LIMITS = {
+    "auth": (int(os.getenv("ADMISSION_AUTH_CONCURRENCY", "16")), int(os.getenv("ADMISSION_AUTH_QUEUE", "32"))),
+    "write": (int(os.getenv("ADMISSION_WRITE_CONCURRENCY", "32")), int(os.getenv("ADMISSION_WRITE_QUEUE", "64"))),
+    "read": (int(os.getenv("ADMISSION_READ_CONCURRENCY", "64")), int(os.getenv("ADMISSION_READ_QUEUE", "128"))),
+}
+
+# Cheap or long-lived paths that never take a slot
+EXEMPT_PREFIXES = ("/health", "/metrics", "/docs", "/redoc", "/openapi.json", "/live/")
+
+
+def route_class(method: str, path: str):
+    if path == "/" or path.startswith(EXEMPT_PREFIXES):
+        return None
+    if path.startswith(("/users/", "/email/")):
+        return "auth"
+    if method in ("POST", "PUT", "PATCH", "DELETE"):
+        return "write"
+    return "read"
+
+
+class _Gate:
+    def __init__(self, name: str, limit: int, queue_size: int):
+        self.name = name
+        self.queue_size = queue_size
+        self.semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+
+    def publish(self):
+        set_gauge("admission_in_flight", self.in_flight, {"class": self.name})
+        set_gauge("admission_queue_depth", self.waiting, {"class": self.name})
+
+
+class AdmissionControlMiddleware:
+    """Caps in-flight requests per route class and sheds load once the bounded queue is full."""
+
+    def __init__(self, app):
+        self.app = app
+        self.gates = {name: _Gate(name, limit, queue) for name, (limit, queue) in ROUTE_CLASS_LIMITS.items()}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        name = route_class(scope["method"], scope["path"])
+        if name is None:
+            return await self.app(scope, receive, send)
+
+        gate = self.gates[name]
+        if gate.semaphore.locked():
+            if gate.waiting >= gate.queue_size:
+                return await self._shed(gate, "queue_full", send)
+            gate.waiting += 1
+            gate.publish()
+            try:
+                await asyncio.wait_for(gate.semaphore.acquire(), ADMISSION_QUEUE_TIMEOUT_MS / 1000)
+            except asyncio.TimeoutError:
+                return await self._shed(gate, "deadline", send)
+            finally:
+                gate.waiting -= 1
+                gate.publish()
+        else:
+            await gate.semaphore.acquire()
+
+        gate.in_flight += 1
+        gate.publish()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.in_flight -= 1
+            gate.semaphore.release()
+            gate.publish()
+
+    async def _shed(self, gate: _Gate, reason: str, send):
+        increment("admission_rejections_total", {"class": gate.name, "reason": reason})
+        body = json.dumps({"detail": "Server is busy, please retry later"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(ADMISSION_RETRY_AFTER_SECONDS).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
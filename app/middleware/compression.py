@@ -0,0 +1,99 @@
+import gzip
+import os
+
+from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+
+# brotli is in requirements.txt; a deployment without it only offers gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+load_dotenv()
+
+# Bodies smaller than this go out as they are; compressing them costs more than it saves
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+# Fast settings: responses are compressed per request, not cached
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/vnd.", "application/msgpack", "text/html", "text/csv", "text/plain")
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def choose_encoding(accept_encoding: str):
+    """Picks br over gzip when the client accepts both; None when it accepts neither."""
+    accepted = {}
+    for entry in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in entry.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+
+    offered = (["br"] if brotli is not None else []) + ["gzip"]
+    candidates = [coding for coding in offered if accepted.get(coding, accepted.get("*", 0.0)) > 0]
+    return max(candidates, key=lambda coding: accepted.get(coding, accepted.get("*", 0.0)), default=None)
+
+
+class CompressionMiddleware:
+    """Compresses whole response bodies above COMPRESSION_MIN_BYTES with brotli or gzip.
+
+    Responses that already carry a Content-Encoding (pre-compressed
+    statements), streamed bodies (live updates) and binary or unknown
+    content types pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough or start is None:
+                return await send(message)
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or len(body) < COMPRESSION_MIN_BYTES
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            ):
+                passthrough = True
+                await send(start)
+                return await send(message)
+
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
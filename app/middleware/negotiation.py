@@ -0,0 +1,24 @@
+from starlette.datastructures import Headers
+
+from app.services.wire import negotiate, wire_format
+
+
+class ContentNegotiationMiddleware:
+    """Records the response encoding the client accepts so NegotiatedResponse can render it."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        accept = Headers(scope=scope).get("accept")
+        if not accept:
+            return await self.app(scope, receive, send)
+
+        token = wire_format.set(negotiate(accept))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            wire_format.reset(token)
@@ -2,12 +2,19 @@ from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Any,Optional
 
+# Fields a client may select or exclude on holding reads
+HOLDING_FIELDS = {
+    "asset_name", "quantity", "bought_price", "current_price", "total_investment",
+    "current_investment", "date", "user", "created_at", "updated_at", "currency",
+}
+
 class NewHolding(BaseModel):
     asset_name: str
     quantity: int
     bought_price: float
     current_price: float
     date: datetime
+    currency: Optional[str] = None
 
 
 class ResponseModel(BaseModel):
@@ -16,8 +23,14 @@ class ResponseModel(BaseModel):
     data: Any
 
 class UpdateHolding(BaseModel):
-    asset_name: Optional[str]
-    quantity: Optional[int]
-    bought_price: Optional[float]
-    current_price: Optional[float]
-    date: Optional[datetime]
\ No newline at end of file
+    asset_name: Optional[str] = None
+    quantity: Optional[int] = None
+    bought_price: Optional[float] = None
+    current_price: Optional[float] = None
+    date: Optional[datetime] = None
+    currency: Optional[str] = None
+
+class AdjustHolding(BaseModel):
+    quantity_delta: int = 0
+    bought_price_delta: float = 0.0
+    current_price_delta: float = 0.0
@@ -2,6 +2,13 @@ from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import List, Optional,Any
 
+# Fields a client may select or exclude on journal reads
+JOURNAL_FIELDS = {
+    "asset_name", "quantity", "asset_type", "journal_for", "trade_category",
+    "enter_price", "exit_price", "stop_loss", "strategy_name",
+    "strategy_description", "user", "date", "updated_at", "tags",
+}
+
 class NewJournal(BaseModel):
     asset_name: str
     quantity: int
@@ -14,21 +21,23 @@ class NewJournal(BaseModel):
     strategy_name: str
     strategy_description: str
     date: datetime
+    tags: List[str] = []
 
 
 
 class UpdateJournal(BaseModel):
-    asset_name: Optional[str]
-    quantity: Optional[int]
-    asset_type: Optional[str]
-    journal_for: Optional[str]
-    trade_category: Optional[str]
-    enter_price: Optional[float]
-    exit_price: Optional[float]
-    stop_loss: Optional[float]
-    strategy_name: Optional[str]
-    strategy_description: Optional[str]
-    date: Optional[datetime]
+    asset_name: Optional[str] = None
+    quantity: Optional[int] = None
+    asset_type: Optional[str] = None
+    journal_for: Optional[str] = None
+    trade_category: Optional[str] = None
+    enter_price: Optional[float] = None
+    exit_price: Optional[float] = None
+    stop_loss: Optional[float] = None
+    strategy_name: Optional[str] = None
+    strategy_description: Optional[str] = None
+    date: Optional[datetime] = None
+    tags: Optional[List[str]] = None
 
 
 class ResponseModel(BaseModel):
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import Any
+
+
+class ResponseModel(BaseModel):
+    success: bool
+    message: str
+    data: Any
@@ -1,6 +1,14 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Any
+from typing import Any, List, Optional
+
+# Fields a client may select or exclude on trade reads
+TRADE_FIELDS = {
+    "asset_name", "quantity", "trade_category", "journal_for", "trade_type",
+    "enter_price", "stop_loss", "exit_price", "total_traded", "profit_or_loss",
+    "date", "strategy_name", "strategy_description", "user", "created_at", "updated_at",
+    "asset_type", "tags", "currency",
+}
 
 class NewTrade(BaseModel):
     asset_name: str
@@ -13,8 +21,24 @@ class NewTrade(BaseModel):
     strategy_name: str
     strategy_description: str
     date: datetime
+    tags: List[str] = []
+    currency: Optional[str] = None
+
 
 
+class UpdateTrade(BaseModel):
+    asset_name: Optional[str] = None
+    quantity: Optional[int] = None
+    trade_type: Optional[str] = None
+    asset_type: Optional[str] = None
+    trade_category: Optional[str] = None
+    enter_price: Optional[float] = None
+    exit_price: Optional[float] = None
+    strategy_name: Optional[str] = None
+    strategy_description: Optional[str] = None
+    date: Optional[datetime] = None
+    tags: Optional[List[str]] = None
+    currency: Optional[str] = None
 
 class ResponseModel(BaseModel):
     success: bool
@@ -12,4 +12,5 @@ class User(BaseModel):
     created_at: datetime = Field(default_factory=datetime.now)
     is_banned: bool = False
     ban_time: Optional[datetime] = None
+    base_currency: Optional[str] = None
 
@@ -1,16 +1,21 @@
 import random
 import time
-from fastapi import APIRouter, BackgroundTasks, HTTPException,status
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, status
 from fastapi_mail import FastMail, MessageSchema
 from app.models.email import EmailSchema
 from app.config.mail_config import mail_conf
 from app.config.templates import REGISTER_OTP_TEMPLATE, LOGIN_OTP_TEMPLATE, RESET_OTP_TEMPLATE
+from app.services.rate_limit import email_limiter, email_ip_limiter, client_ip
+from app.services.tracing import TracedRoute, span
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 # In-memory OTP cache
 otp_cache = {}
 
+# Seconds an OTP stays valid
+OTP_TTL_SECONDS = 300
+
 def generate_otp() -> str:
     """Generates a 6-digit OTP."""
     return str(random.randint(100000, 999999))
@@ -20,7 +25,11 @@ def save_otp(email: str, otp: str):
     otp_cache[email] = {"otp": otp, "timestamp": time.time()}
 
 @router.post("/send-otp/" , tags=["email"], status_code=status.HTTP_200_OK )
-async def send_email(email: EmailSchema, background_tasks: BackgroundTasks, name: str):
+async def send_email(email: EmailSchema, background_tasks: BackgroundTasks, name: str, request: Request):
+    # Throttle OTP mails per recipient and per client address
+    email_limiter.enforce(email.email.lower())
+    email_ip_limiter.enforce(client_ip(request))
+
     try:
         otp = generate_otp()
         save_otp(email.email, otp)  
@@ -41,8 +50,9 @@ async def send_email(email: EmailSchema, background_tasks: BackgroundTasks, name
             subtype="html"
         )
 
-        fm = FastMail(mail_conf)
-        background_tasks.add_task(fm.send_message, message)
+        with span("mail.enqueue", **{"mail.use_case": email.use_case}):
+            fm = FastMail(mail_conf)
+            background_tasks.add_task(fm.send_message, message)
         return {"message": "Email has been sent successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to send email: {str(e)}")
@@ -59,7 +69,7 @@ async def verify_otp(email: str, otp: str):
     if saved_otp != otp:
         raise HTTPException(status_code=400, detail="Invalid OTP")
 
-    if time.time() - timestamp > 300:
+    if time.time() - timestamp > OTP_TTL_SECONDS:
         del otp_cache[email]
         raise HTTPException(status_code=400, detail="OTP expired")
 
@@ -1,14 +1,29 @@
 from fastapi import APIRouter, Depends, status, HTTPException
 from datetime import datetime
+from typing import Optional
 from bson import ObjectId
+from pymongo import ReturnDocument
 
-from app.models.holding import NewHolding, ResponseModel, UpdateHolding
+from app.models.holding import NewHolding, ResponseModel, UpdateHolding, AdjustHolding, HOLDING_FIELDS
 from ..config import collection_name_users, collection_name_holdings, collection_name_journals
+from app.config.write_config import writer
 from app.config.jwt_config import verify_token_dependency
-
-router = APIRouter()
+from app.config.read_config import reader, read_session, write_session
+from app.services.price_history import record_price
+from app.services.lots import resolve_method, record_buy, record_sell, mark_price, reprice_source
+from app.services.projection import build_projection
+from app.services.sync import record_tombstone
+from app.services.live import notify
+from app.services.idempotency import idempotent, record_response
+from app.services.tracing import TracedRoute
+from app.services.fx import base_currency, conversion_factor, currency_of, normalize_currency
+from app.services.wire import NegotiatedResponse
+
+# List-heavy routes answer in columnar JSON or MessagePack when the client asks for it
+router = APIRouter(route_class=TracedRoute, default_response_class=NegotiatedResponse)
 
 @router.post("/{user_id}/new-holding/", tags=["holdings"], status_code=status.HTTP_201_CREATED)
+@idempotent("new-holding", "new_holding")
 async def create_holding(
     user_id: str, 
     new_holding: NewHolding, 
@@ -20,6 +35,11 @@ async def create_holding(
     except Exception:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user ID format")
 
+    try:
+        currency = normalize_currency(new_holding.currency)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Check if user exists in the database
     existing_user = collection_name_users.find_one({"_id": user_object_id})
     if not existing_user:
@@ -37,9 +57,12 @@ async def create_holding(
         "current_price": new_holding.current_price,
         "total_investment": total_investment,
         "current_investment": current_investment,
+        # Amounts are in this currency; it defaults to the user's base currency
+        "currency": currency or base_currency(existing_user),
         "date": new_holding.date,
         "user": str(user_object_id),
-        "created_at": datetime.now()
+        "created_at": datetime.now(),
+        "updated_at": datetime.now()
     }
 
     # Prepare journal data
@@ -55,77 +78,191 @@ async def create_holding(
         "strategy_name": "Longterm",
         "strategy_description": "Longterm",
         "user": str(user_object_id),
-        "date": datetime.now()
+        "date": datetime.now(),
+        "updated_at": datetime.now()
     }
 
     try:
-        # Insert journal data
-        journal = collection_name_journals.insert_one(journal_data)
-
-        # Insert holding data
-        result = collection_name_holdings.insert_one(holding_data)
-
-        # Update user with new holding and journal
-        collection_name_users.update_one(
-            {"_id": user_object_id},
-            {
-                "$push": {
-                    "holdings": str(result.inserted_id),
-                    "journals": str(journal.inserted_id)
-                }
-            }
+        with write_session(str(user_object_id)) as session:
+            # Insert journal data
+            journal = writer(collection_name_journals, "derived").insert_one(journal_data, session=session)
+
+            # Insert holding data
+            result = writer(collection_name_holdings, "primary").insert_one(holding_data, session=session)
+
+            # Update user with new holding and journal
+            writer(collection_name_users, "primary").update_one(
+                {"_id": user_object_id},
+                {
+                    "$push": {
+                        "holdings": str(result.inserted_id),
+                        "journals": str(journal.inserted_id)
+                    }
+                },
+                session=session
+            )
+
+        response = ResponseModel(
+            success=True,
+            message="Holding added successfully",
+            data={**holding_data, "_id": str(result.inserted_id)}
         )
+        # The holding is saved: a retry must get it back even if the lot bookkeeping fails
+        record_response(response)
+
+        # Open a lot for the holding and revalue the position
+        record_buy(str(user_object_id), new_holding.asset_name, new_holding.quantity, new_holding.bought_price, new_holding.date, str(result.inserted_id))
+        mark_price(str(user_object_id), new_holding.asset_name, new_holding.current_price)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-    # Return success response
-    return ResponseModel(
-        success=True,
-        message="Holding added successfully",
-        data={**holding_data, "_id": str(result.inserted_id)}
-    )
+    # Record the price tick for charting once the holding is saved; never fails the request
+    record_price(new_holding.asset_name, new_holding.current_price)
+
+    notify(str(user_object_id), "holdings", "insert", str(result.inserted_id))
+    notify(str(user_object_id), "journals", "insert", str(journal.inserted_id))
+
+    return response
 
 @router.get("/{user_id}/all-holdings", 
             tags=["holdings"], 
             status_code=status.HTTP_200_OK)
-async def get_all_holdings(user_id: str,user: dict = Depends(verify_token_dependency)) -> ResponseModel:
+async def get_all_holdings(user_id: str, fields: Optional[str] = None, exclude: Optional[str] = None, user: dict = Depends(verify_token_dependency)) -> ResponseModel:
     try:
         user_object_id = ObjectId(user_id)
     except:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
 
+    try:
+        projection = build_projection(fields, exclude, HOLDING_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     existing_user = collection_name_users.find_one({"_id": user_object_id})
     if not existing_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
 
     holdings_ids = existing_user.get("holdings", [])
-    holdings_data = list(collection_name_holdings.find({"_id": {"$in": [ObjectId(h) for h in holdings_ids]}}))
+    with read_session(user_id) as session:
+        holdings_data = list(reader(collection_name_holdings, "listing").find({"_id": {"$in": [ObjectId(h) for h in holdings_ids]}}, projection, session=session))
     for holding in holdings_data:
         holding["_id"] = str(holding["_id"])
-        holding["user"] = str(holding["user"])
+        if "user" in holding:
+            holding["user"] = str(holding["user"])
 
     return ResponseModel(success=True, message="Holdings retrieved successfully", data=holdings_data)
 
 
+# Sortable position columns -> field in the grouped document
+POSITION_SORT_FIELDS = {
+    "exposure": "current_investment",
+    "quantity": "quantity",
+    "unrealized_pnl": "unrealized_pnl",
+    "asset_name": "asset_name",
+}
+
+@router.get("/{user_id}/positions", tags=["holdings"], status_code=status.HTTP_200_OK)
+async def get_positions(
+    user_id: str,
+    page: int = 1,
+    page_size: int = 20,
+    sort_by: str = "exposure",
+    order: str = "desc",
+    user: dict = Depends(verify_token_dependency)
+) -> ResponseModel:
+    try:
+        user_object_id = ObjectId(user_id)
+    except:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
+
+    if sort_by not in POSITION_SORT_FIELDS or order not in ("asc", "desc"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sort parameters")
+    if page < 1 or not 1 <= page_size <= 100:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination parameters")
+
+    existing_user = collection_name_users.find_one({"_id": user_object_id})
+    if not existing_user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
+
+    # Group the user's holdings per asset and currency, convert each group's
+    # sums to the base currency, then page through the assets server-side
+    base = base_currency(existing_user)
+    pipeline = [
+        {"$match": {"user": user_id}},
+        {"$group": {
+            "_id": {"asset_name": "$asset_name", "currency": currency_of()},
+            "quantity": {"$sum": "$quantity"},
+            "total_investment": {"$sum": "$total_investment"},
+            "current_investment": {"$sum": "$current_investment"},
+            "holdings_count": {"$sum": 1},
+        }},
+        {"$set": {"rate": conversion_factor("$_id.currency", base)}},
+        {"$group": {
+            "_id": "$_id.asset_name",
+            "quantity": {"$sum": "$quantity"},
+            "total_investment": {"$sum": {"$multiply": ["$total_investment", "$rate"]}},
+            "current_investment": {"$sum": {"$multiply": ["$current_investment", "$rate"]}},
+            "holdings_count": {"$sum": "$holdings_count"},
+            "currencies": {"$addToSet": "$_id.currency"},
+            "unconverted_holdings": {"$sum": {"$cond": [{"$eq": ["$rate", None]}, "$holdings_count", 0]}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "asset_name": "$_id",
+            "quantity": 1,
+            "total_investment": 1,
+            "current_investment": 1,
+            "holdings_count": 1,
+            "currencies": 1,
+            "unconverted_holdings": 1,
+            "avg_bought_price": {
+                "$cond": [{"$gt": ["$quantity", 0]}, {"$divide": ["$total_investment", "$quantity"]}, 0]
+            },
+            "unrealized_pnl": {"$subtract": ["$current_investment", "$total_investment"]},
+        }},
+        {"$sort": {POSITION_SORT_FIELDS[sort_by]: 1 if order == "asc" else -1, "asset_name": 1}},
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "items": [{"$skip": (page - 1) * page_size}, {"$limit": page_size}],
+        }},
+    ]
+    with read_session(user_id) as session:
+        result = next(reader(collection_name_holdings, "listing").aggregate(pipeline, session=session), {"total": [], "items": []})
+    total = result["total"][0]["count"] if result["total"] else 0
+
+    return ResponseModel(
+        success=True,
+        message="Positions retrieved successfully",
+        data={"page": page, "page_size": page_size, "total": total, "currency": base, "positions": result["items"]}
+    )
+
+
 @router.get("/{user_id}/{holding_id}", tags=["holdings"], status_code=status.HTTP_200_OK)
-async def get_holding(user_id: str, holding_id: str,user: dict = Depends(verify_token_dependency)) -> ResponseModel:
+async def get_holding(user_id: str, holding_id: str, fields: Optional[str] = None, exclude: Optional[str] = None, user: dict = Depends(verify_token_dependency)) -> ResponseModel:
     try:
         user_object_id = ObjectId(user_id)
         holding_object_id = ObjectId(holding_id)
     except:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
 
+    try:
+        projection = build_projection(fields, exclude, HOLDING_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     existing_user = collection_name_users.find_one({"_id": user_object_id})
     if not existing_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
 
-    holding = collection_name_holdings.find_one({"_id": holding_object_id})
+    with read_session(user_id) as session:
+        holding = reader(collection_name_holdings, "detail").find_one({"_id": holding_object_id}, projection, session=session)
 
     if not holding:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Holding does not exist or does not belong to the user")
 
     holding["_id"] = str(holding["_id"])
-    holding["user"] = str(holding["user"])
+    if "user" in holding:
+        holding["user"] = str(holding["user"])
 
     return ResponseModel(success=True, message="Holding retrieved successfully", data=holding)
 
@@ -139,6 +276,11 @@ async def update_holding(user_id: str, holding_id: str, holding_data: UpdateHold
     except:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
 
+    try:
+        currency = normalize_currency(holding_data.currency)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     existing_user = collection_name_users.find_one({"_id": user_object_id})
     if not existing_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
@@ -161,18 +303,186 @@ async def update_holding(user_id: str, holding_id: str, holding_data: UpdateHold
         "current_price": updated_current_price,
         "total_investment": total_investment,
         "current_investment": current_investment,
+        "currency": currency or existing_holding.get("currency") or base_currency(existing_user),
         "date": holding_data.date if holding_data.date is not None else existing_holding["date"],
         "updated_at": datetime.now()
     }
 
-    collection_name_holdings.update_one({"_id": holding_object_id}, {"$set": update_fields})
+    with write_session(user_id) as session:
+        writer(collection_name_holdings, "primary").update_one({"_id": holding_object_id}, {"$set": update_fields}, session=session)
+
+    # Record the price tick for charting when the price was updated
+    if holding_data.current_price is not None:
+        record_price(update_fields["asset_name"], updated_current_price)
+
+    # Keep the lot ledger in step: a changed cost replays the asset,
+    # quantity changes open or match lots, and the price revalues the position
+    method = resolve_method(existing_user)
+    if updated_bought_price != existing_holding["bought_price"]:
+        reprice_source(user_id, holding_id, updated_bought_price, method)
+    quantity_delta = updated_quantity - existing_holding["quantity"]
+    if quantity_delta > 0:
+        record_buy(user_id, update_fields["asset_name"], quantity_delta, updated_bought_price, datetime.now(), holding_id)
+    elif quantity_delta < 0:
+        record_sell(user_id, update_fields["asset_name"], -quantity_delta, updated_current_price, datetime.now(), holding_id, method)
+    mark_price(user_id, update_fields["asset_name"], updated_current_price)
+
     updated_holding = collection_name_holdings.find_one({"_id": holding_object_id})
     updated_holding["_id"] = str(updated_holding["_id"])
     updated_holding["user"] = str(updated_holding["user"])
 
+    notify(user_id, "holdings", "update", holding_id)
+
+    return ResponseModel(success=True, message="Holding updated successfully", data=updated_holding)
+
+
+@router.patch("/{user_id}/{holding_id}", tags=["holdings"], status_code=status.HTTP_200_OK)
+async def patch_holding(user_id: str, holding_id: str, holding_data: UpdateHolding, user: dict = Depends(verify_token_dependency)) -> ResponseModel:
+    try:
+        user_object_id = ObjectId(user_id)
+        holding_object_id = ObjectId(holding_id)
+    except:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
+
+    # Only the fields the client sent are written
+    changes = {field: value for field, value in holding_data.model_dump(exclude_unset=True).items() if value is not None}
+    if not changes:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No fields to update")
+    if "currency" in changes:
+        try:
+            changes["currency"] = normalize_currency(changes["currency"])
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    query = {"_id": holding_object_id, "user": user_id}
+
+    # The ledger needs the previous quantity and cost; only patches touching
+    # them read first, and the values read become part of the filter so a
+    # concurrent change is reported instead of booking the wrong delta
+    previous = None
+    if changes.keys() & {"quantity", "bought_price"}:
+        previous = collection_name_holdings.find_one(query, {"quantity": 1, "bought_price": 1})
+        if not previous:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Holding does not exist or does not belong to the user")
+        query.update(quantity=previous["quantity"], bought_price=previous["bought_price"])
+
+    # Values are wrapped in $literal so client strings are never read as field paths
+    pipeline = [{"$set": {**{field: {"$literal": value} for field, value in changes.items()}, "updated_at": datetime.now()}}]
+    if changes.keys() & {"quantity", "bought_price", "current_price"}:
+        pipeline.append({"$set": {
+            "total_investment": {"$multiply": ["$quantity", "$bought_price"]},
+            "current_investment": {"$multiply": ["$quantity", "$current_price"]},
+        }})
+
+    with write_session(user_id) as session:
+        updated_holding = writer(collection_name_holdings, "primary").find_one_and_update(
+            query,
+            pipeline,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+
+    if not updated_holding:
+        if previous:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Holding was modified concurrently, retry the update")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Holding does not exist or does not belong to the user")
+
+    asset_name = updated_holding["asset_name"]
+
+    # Record the price tick for charting when the price was updated
+    if "current_price" in changes:
+        record_price(asset_name, updated_holding["current_price"])
+
+    # Keep the lot ledger in step, as the full update does
+    if previous:
+        quantity_delta = updated_holding["quantity"] - previous["quantity"]
+        repriced = updated_holding["bought_price"] != previous["bought_price"]
+        if repriced or quantity_delta < 0:
+            method = resolve_method(collection_name_users.find_one({"_id": user_object_id}, {"lot_method": 1}))
+            if repriced:
+                reprice_source(user_id, holding_id, updated_holding["bought_price"], method)
+            if quantity_delta < 0:
+                record_sell(user_id, asset_name, -quantity_delta, updated_holding["current_price"], datetime.now(), holding_id, method)
+        if quantity_delta > 0:
+            record_buy(user_id, asset_name, quantity_delta, updated_holding["bought_price"], datetime.now(), holding_id)
+    mark_price(user_id, asset_name, updated_holding["current_price"])
+
+    updated_holding["_id"] = str(updated_holding["_id"])
+    updated_holding["user"] = str(updated_holding["user"])
+
+    notify(user_id, "holdings", "update", holding_id)
+
     return ResponseModel(success=True, message="Holding updated successfully", data=updated_holding)
 
 
+@router.post("/{user_id}/{holding_id}/adjust", tags=["holdings"], status_code=status.HTTP_200_OK)
+async def adjust_holding(user_id: str, holding_id: str, adjustment: AdjustHolding, user: dict = Depends(verify_token_dependency)) -> ResponseModel:
+    try:
+        user_object_id = ObjectId(user_id)
+        holding_object_id = ObjectId(holding_id)
+    except:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
+
+    if not (adjustment.quantity_delta or adjustment.bought_price_delta or adjustment.current_price_delta):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Adjustment has no deltas")
+
+    # Ownership and the no-short guard are part of the filter so the whole
+    # adjustment is a single atomic read-modify-write on the server
+    query = {"_id": holding_object_id, "user": user_id}
+    if adjustment.quantity_delta < 0:
+        query["quantity"] = {"$gte": -adjustment.quantity_delta}
+
+    # Pipeline form of $inc, followed by a stage recomputing the derived totals
+    with write_session(user_id) as session:
+        updated_holding = writer(collection_name_holdings, "primary").find_one_and_update(
+            query,
+            [
+                {"$set": {
+                    "quantity": {"$add": ["$quantity", adjustment.quantity_delta]},
+                    "bought_price": {"$add": ["$bought_price", adjustment.bought_price_delta]},
+                    "current_price": {"$add": ["$current_price", adjustment.current_price_delta]},
+                    "updated_at": datetime.now(),
+                }},
+                {"$set": {
+                    "total_investment": {"$multiply": ["$quantity", "$bought_price"]},
+                    "current_investment": {"$multiply": ["$quantity", "$current_price"]},
+                }},
+            ],
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+
+    if not updated_holding:
+        # Only the failure path pays for a second lookup to tell the cases apart
+        if adjustment.quantity_delta < 0 and collection_name_holdings.find_one({"_id": holding_object_id, "user": user_id}, {"_id": 1}):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Adjustment would make the quantity negative")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Holding does not exist or does not belong to the user")
+
+    asset_name = updated_holding["asset_name"]
+
+    # Record the price tick for charting when the price moved
+    if adjustment.current_price_delta:
+        record_price(asset_name, updated_holding["current_price"])
+
+    # Keep the lot ledger in step with the adjustment
+    if adjustment.bought_price_delta or adjustment.quantity_delta < 0:
+        method = resolve_method(collection_name_users.find_one({"_id": user_object_id}, {"lot_method": 1}))
+        if adjustment.bought_price_delta:
+            reprice_source(user_id, holding_id, updated_holding["bought_price"], method)
+        if adjustment.quantity_delta < 0:
+            record_sell(user_id, asset_name, -adjustment.quantity_delta, updated_holding["current_price"], datetime.now(), holding_id, method)
+    if adjustment.quantity_delta > 0:
+        record_buy(user_id, asset_name, adjustment.quantity_delta, updated_holding["bought_price"], datetime.now(), holding_id)
+    mark_price(user_id, asset_name, updated_holding["current_price"])
+
+    updated_holding["_id"] = str(updated_holding["_id"])
+    updated_holding["user"] = str(updated_holding["user"])
+
+    notify(user_id, "holdings", "update", holding_id)
+
+    return ResponseModel(success=True, message="Holding adjusted successfully", data=updated_holding)
+
+
 @router.delete("/{user_id}/{holding_id}", tags=["holdings"], status_code=status.HTTP_200_OK)
 async def delete_holding(user_id: str, holding_id: str, user: dict = Depends(verify_token_dependency)  ) -> ResponseModel:
     try:
@@ -206,23 +516,37 @@ async def delete_holding(user_id: str, holding_id: str, user: dict = Depends(ver
         "strategy_description": "Longterm",
         "date": datetime.now(),
         "user": str(user_object_id),
+        "updated_at": datetime.now(),
     }
 
     try:
-        # Insert journal entry for deletion record
-        journal = collection_name_journals.insert_one(journal_data)
-
-        # Delete holding and update user data
-        collection_name_holdings.delete_one({"_id": holding_object_id})
-        collection_name_users.update_one(
-            {"_id": user_object_id},
-            {
-                "$pull": {"holdings": str(holding_object_id)},
-                "$push": {"journals": str(journal.inserted_id)}
-            }
+        with write_session(str(user_object_id)) as session:
+            # Insert journal entry for deletion record
+            journal = writer(collection_name_journals, "derived").insert_one(journal_data, session=session)
+
+            # Delete holding and update user data
+            writer(collection_name_holdings, "primary").delete_one({"_id": holding_object_id}, session=session)
+            writer(collection_name_users, "primary").update_one(
+                {"_id": user_object_id},
+                {
+                    "$pull": {"holdings": str(holding_object_id)},
+                    "$push": {"journals": str(journal.inserted_id)}
+                },
+                session=session
+            )
+
+        record_tombstone(str(user_object_id), "holdings", str(holding_object_id))
+
+        # Selling the holding matches its quantity against the open lots
+        record_sell(
+            str(user_object_id), existing_holding["asset_name"], existing_holding["quantity"],
+            existing_holding["current_price"], datetime.now(), str(holding_object_id), resolve_method(existing_user)
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+    notify(str(user_object_id), "holdings", "delete", str(holding_object_id))
+    notify(str(user_object_id), "journals", "insert", str(journal.inserted_id))
+
     # Return success response
     return ResponseModel(success=True, message="Holding deleted successfully", data={})
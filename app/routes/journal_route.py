@@ -1,15 +1,28 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, Query, status, HTTPException
 from datetime import datetime
+from typing import List, Optional
 from bson import ObjectId
+from pymongo import ReturnDocument
 
+from app.config.write_config import writer
 from app.config.jwt_config import verify_token_dependency
-from app.models.journal import NewJournal, ResponseModel
+from app.config.read_config import reader, read_session, write_session
+from app.models.journal import NewJournal, UpdateJournal, ResponseModel, JOURNAL_FIELDS
+from app.services.projection import build_projection
+from app.services.sync import record_tombstone
+from app.services.live import notify
+from app.services.idempotency import idempotent
+from app.services.tags import normalize_tags, filter_query, faceted_search
+from app.services.tracing import TracedRoute
+from app.services.wire import NegotiatedResponse
 
 from ..config import collection_name_users, collection_name_journals
 
-router = APIRouter()
+# List-heavy routes answer in columnar JSON or MessagePack when the client asks for it
+router = APIRouter(route_class=TracedRoute, default_response_class=NegotiatedResponse)
 
 @router.post("/{user_id}/new-journal/", tags=["journals"], status_code=status.HTTP_201_CREATED)
+@idempotent("new-journal", "new_journal")
 async def create_journal(user_id: str, new_journal: NewJournal, user: dict = Depends(verify_token_dependency)  ) -> ResponseModel:
     try:
         # Convert user_id to ObjectId
@@ -17,6 +30,11 @@ async def create_journal(user_id: str, new_journal: NewJournal, user: dict = Dep
     except Exception:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user ID format")
 
+    try:
+        tags = normalize_tags(new_journal.tags)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Check if user exists
     existing_user = collection_name_users.find_one({"_id": user_object_id})
     if not existing_user:
@@ -34,18 +52,23 @@ async def create_journal(user_id: str, new_journal: NewJournal, user: dict = Dep
         "stop_loss": new_journal.stop_loss,
         "strategy_name": new_journal.strategy_name,
         "strategy_description": new_journal.strategy_description,
+        "tags": tags,
         "user": str(user_object_id),
-        "date": datetime.now()
+        "date": datetime.now(),
+        "updated_at": datetime.now()
     }
 
-    # Insert journal entry
-    journal = collection_name_journals.insert_one(journal_data)
+    with write_session(str(user_object_id)) as session:
+        # Insert journal entry
+        journal = writer(collection_name_journals, "primary").insert_one(journal_data, session=session)
 
-    # Update user's journal list
-    collection_name_users.update_one(
-        {"_id": user_object_id},
-        {"$push": {"journals": str(journal.inserted_id)}}
-    )
+        # Update user's journal list
+        writer(collection_name_users, "primary").update_one(
+            {"_id": user_object_id},
+            {"$push": {"journals": str(journal.inserted_id)}},
+            session=session
+        )
+    notify(str(user_object_id), "journals", "insert", str(journal.inserted_id))
 
     # Return success response
     return ResponseModel(
@@ -56,25 +79,32 @@ async def create_journal(user_id: str, new_journal: NewJournal, user: dict = Dep
 
 
 @router.get("/{user_id}/all-journals", tags=["journals"], status_code=status.HTTP_200_OK)
-async def get_all_journals(user_id: str, user: dict = Depends(verify_token_dependency)  ) -> ResponseModel:
+async def get_all_journals(user_id: str, fields: Optional[str] = None, exclude: Optional[str] = None, user: dict = Depends(verify_token_dependency)  ) -> ResponseModel:
     try:
         # Convert user_id to ObjectId
         user_object_id = ObjectId(user_id)
     except:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
 
+    try:
+        projection = build_projection(fields, exclude, JOURNAL_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Check if user exists
     existing_user = collection_name_users.find_one({"_id": user_object_id})
     if not existing_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
 
     # Retrieve all journals for the user
-    journals = list(collection_name_journals.find({"user": str(user_object_id)}))
+    with read_session(user_id) as session:
+        journals = list(reader(collection_name_journals, "listing").find({"user": str(user_object_id)}, projection, session=session))
 
     # Convert ObjectId fields to strings for proper JSON serialization
     for journal in journals:
         journal["_id"] = str(journal["_id"])
-        journal["user"] = str(journal["user"])
+        if "user" in journal:
+            journal["user"] = str(journal["user"])
 
     # Return success response with journal list
     return ResponseModel(
@@ -84,8 +114,51 @@ async def get_all_journals(user_id: str, user: dict = Depends(verify_token_depen
     )
 
 
+@router.get("/{user_id}/search", tags=["journals"], status_code=status.HTTP_200_OK)
+async def search_journals(
+    user_id: str,
+    tags: Optional[List[str]] = Query(None),
+    match: str = "all",
+    asset_type: Optional[str] = None,
+    journal_for: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    page: int = 1,
+    page_size: int = 20,
+    fields: Optional[str] = None,
+    exclude: Optional[str] = None,
+    user: dict = Depends(verify_token_dependency)
+) -> ResponseModel:
+    try:
+        user_object_id = ObjectId(user_id)
+    except:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
+
+    if page < 1 or not 1 <= page_size <= 100:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination parameters")
+    try:
+        query = filter_query(user_id, tags, match, asset_type, journal_for, start, end)
+        projection = build_projection(fields, exclude, JOURNAL_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    existing_user = collection_name_users.find_one({"_id": user_object_id})
+    if not existing_user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
+
+    # One page of matches and the facet counts come back from a single $facet
+    with read_session(user_id) as session:
+        result = faceted_search(reader(collection_name_journals, "listing"), query, projection, page, page_size, session=session)
+
+    return ResponseModel(
+        success=True,
+        message="Journals retrieved successfully",
+        data=result
+    )
+
+
 @router.get("/{user_id}/{journal_id}", tags=["journals"], status_code=status.HTTP_200_OK)
-async def get_journal(user_id: str, journal_id: str, user: dict = Depends(verify_token_dependency)  ) -> ResponseModel:
+async def get_journal(user_id: str, journal_id: str, fields: Optional[str] = None, exclude: Optional[str] = None, user: dict = Depends(verify_token_dependency)  ) -> ResponseModel:
     try:
         # Convert IDs to ObjectId
         user_object_id = ObjectId(user_id)
@@ -93,19 +166,26 @@ async def get_journal(user_id: str, journal_id: str, user: dict = Depends(verify
     except:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
 
+    try:
+        projection = build_projection(fields, exclude, JOURNAL_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Check if user exists
     existing_user = collection_name_users.find_one({"_id": user_object_id})
     if not existing_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
 
     # Retrieve the specific journal
-    journal = collection_name_journals.find_one({"_id": journal_object_id, "user": str(user_object_id)})
+    with read_session(user_id) as session:
+        journal = reader(collection_name_journals, "detail").find_one({"_id": journal_object_id, "user": str(user_object_id)}, projection, session=session)
     if not journal:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Journal does not exist or does not belong to the user")
 
     # Convert ObjectId fields to strings for proper JSON serialization
     journal["_id"] = str(journal["_id"])
-    journal["user"] = str(journal["user"])
+    if "user" in journal:
+        journal["user"] = str(journal["user"])
 
     # Return success response with the journal data
     return ResponseModel(
@@ -125,6 +205,11 @@ async def update_journal(user_id: str, journal_id: str, journal_data: NewJournal
     except:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
 
+    try:
+        tags = normalize_tags(journal_data.tags)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Check if user exists
     existing_user = collection_name_users.find_one({"_id": user_object_id})
     if not existing_user:
@@ -147,19 +232,25 @@ async def update_journal(user_id: str, journal_id: str, journal_data: NewJournal
         "stop_loss": journal_data.stop_loss,
         "strategy_name": journal_data.strategy_name,
         "strategy_description": journal_data.strategy_description,
+        "tags": tags,
         "date": journal_data.date, 
-        "user": str(user_object_id)
+        "user": str(user_object_id),
+        "updated_at": datetime.now()
     }
 
     # Update the journal in the database
     try:
-        collection_name_journals.update_one(
-            {"_id": journal_object_id},
-            {"$set": updated_journal_data}
-        )
+        with write_session(str(user_object_id)) as session:
+            writer(collection_name_journals, "primary").update_one(
+                {"_id": journal_object_id},
+                {"$set": updated_journal_data},
+                session=session
+            )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+    notify(str(user_object_id), "journals", "update", str(journal_object_id))
+
     # Return success response with updated data
     return ResponseModel(
         success=True,
@@ -168,6 +259,46 @@ async def update_journal(user_id: str, journal_id: str, journal_data: NewJournal
     )
 
 
+@router.patch("/{user_id}/{journal_id}", tags=["journals"], status_code=status.HTTP_200_OK)
+async def patch_journal(user_id: str, journal_id: str, journal_data: UpdateJournal, user: dict = Depends(verify_token_dependency)) -> ResponseModel:
+    try:
+        journal_object_id = ObjectId(journal_id)
+    except:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
+
+    # Only the fields the client sent are written
+    changes = {field: value for field, value in journal_data.model_dump(exclude_unset=True).items() if value is not None}
+    if not changes:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No fields to update")
+    if "tags" in changes:
+        try:
+            changes["tags"] = normalize_tags(changes["tags"])
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Journals have no derived fields, so a plain $set of the diff is enough
+    with write_session(user_id) as session:
+        updated_journal = writer(collection_name_journals, "primary").find_one_and_update(
+            {"_id": journal_object_id, "user": user_id},
+            {"$set": {**changes, "updated_at": datetime.now()}},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+
+    if not updated_journal:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Journal does not exist or does not belong to the user")
+
+    notify(user_id, "journals", "update", journal_id)
+
+    updated_journal["_id"] = journal_id
+
+    return ResponseModel(
+        success=True,
+        message="Journal updated successfully",
+        data=updated_journal
+    )
+
+
 @router.delete("/{user_id}/{journal_id}", tags=["journals"], status_code=status.HTTP_200_OK)
 async def delete_journal(user_id: str, journal_id: str,user: dict = Depends(verify_token_dependency)) -> ResponseModel:
     # Ensure that the IDs are valid ObjectId format
@@ -188,16 +319,21 @@ async def delete_journal(user_id: str, journal_id: str,user: dict = Depends(veri
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Journal does not exist or does not belong to the user")
 
     try:
-        # Delete the journal entry
-        collection_name_journals.delete_one({"_id": journal_object_id})
-        
-        # Update the user's data to remove the journal reference
-        collection_name_users.update_one(
-            {"_id": user_object_id},
-            {"$pull": {"journals": str(journal_object_id)}}
-        )
+        with write_session(str(user_object_id)) as session:
+            # Delete the journal entry
+            writer(collection_name_journals, "primary").delete_one({"_id": journal_object_id}, session=session)
+
+            # Update the user's data to remove the journal reference
+            writer(collection_name_users, "primary").update_one(
+                {"_id": user_object_id},
+                {"$pull": {"journals": str(journal_object_id)}},
+                session=session
+            )
+        record_tombstone(str(user_object_id), "journals", str(journal_object_id))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     
+    notify(str(user_object_id), "journals", "delete", str(journal_object_id))
+
     # Return success response
     return ResponseModel(success=True, message="Journal deleted successfully", data={})
\ No newline at end of file
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, Request, status, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from bson import ObjectId
+
+from app.config.jwt_config import verify_token_dependency
+from app.services.fx import base_currency
+from app.services.live import subscribe, unsubscribe, event_stream, TooManySubscribers
+from ..config import collection_name_users
+
+router = APIRouter()
+
+@router.get("/{user_id}", tags=["live"], status_code=status.HTTP_200_OK)
+async def live_updates(user_id: str, request: Request, user: dict = Depends(verify_token_dependency)):
+    try:
+        user_object_id = ObjectId(user_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
+
+    # Check if user exists
+    existing_user = collection_name_users.find_one({"_id": user_object_id})
+    if not existing_user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
+
+    try:
+        queue = subscribe(user_id)
+    except TooManySubscribers:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many live subscribers on this worker",
+            headers={"Retry-After": "30"},
+        )
+
+    # The stream releases its slot when it ends, but a client that disconnects before
+    # the first chunk never starts it; the background task runs after either
+    return StreamingResponse(
+        event_stream(request, user_id, queue, base_currency(existing_user)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(unsubscribe, user_id, queue),
+    )
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends, status
+
+from app.config.jwt_config import verify_token_dependency
+from app.config.write_config import WRITE_TIERS
+from app.services.metrics import snapshot
+
+router = APIRouter()
+
+@router.get("/", tags=["metrics"], status_code=status.HTTP_200_OK)
+async def get_metrics(user: dict = Depends(verify_token_dependency)):
+    return {
+        **snapshot(),
+        "write_tiers": {tier: concern.document for tier, concern in WRITE_TIERS.items()},
+    }
@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, status, HTTPException
+from bson import ObjectId
+
+from app.config.jwt_config import verify_token_dependency
+from app.config.read_config import reader, read_session
+from app.models.pnl import ResponseModel
+from app.services.fx import base_currency, conversion_factors, convert, DEFAULT_CURRENCY
+from app.services.lots import resolve_method, position_currencies
+from app.services.tracing import TracedRoute
+from ..config import collection_name_users, collection_name_pnl, collection_name_lots
+
+router = APIRouter(route_class=TracedRoute)
+
+@router.get("/{user_id}", tags=["pnl"], status_code=status.HTTP_200_OK)
+async def get_pnl(user_id: str, user: dict = Depends(verify_token_dependency)) -> ResponseModel:
+    try:
+        user_object_id = ObjectId(user_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
+
+    # Check if user exists
+    existing_user = collection_name_users.find_one({"_id": user_object_id})
+    if not existing_user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
+
+    with read_session(user_id) as session:
+        positions = list(reader(collection_name_pnl, "analytics").find({"user": user_id}, {"_id": 0, "user": 0}, session=session).sort("asset_name", 1))
+        currencies = position_currencies(user_id, session)
+
+    # Positions stay in their own currency; the totals are converted to the base currency
+    base = base_currency(existing_user)
+    factors = conversion_factors(base)
+    realized, unrealized, unconverted = 0.0, 0.0, 0
+    for position in positions:
+        position["currency"] = currencies.get(position["asset_name"], DEFAULT_CURRENCY)
+        converted = [convert(position.get(field, 0.0), position["currency"], base, factors) for field in ("realized_pnl", "unrealized_pnl")]
+        if None in converted:
+            # No rate to the base currency; left out rather than mixed in
+            unconverted += 1
+            continue
+        realized += converted[0]
+        unrealized += converted[1]
+
+    return ResponseModel(
+        success=True,
+        message="P&L retrieved successfully",
+        data={
+            "method": resolve_method(existing_user),
+            "currency": base,
+            "realized_pnl": realized,
+            "unrealized_pnl": unrealized,
+            "unconverted_positions": unconverted,
+            "positions": positions,
+        }
+    )
+
+
+@router.get("/{user_id}/{asset_name}/lots", tags=["pnl"], status_code=status.HTTP_200_OK)
+async def get_open_lots(user_id: str, asset_name: str, user: dict = Depends(verify_token_dependency)) -> ResponseModel:
+    try:
+        user_object_id = ObjectId(user_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
+
+    # Check if user exists
+    existing_user = collection_name_users.find_one({"_id": user_object_id})
+    if not existing_user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
+
+    with read_session(user_id) as session:
+        lots = list(reader(collection_name_lots, "analytics").find({"user": user_id, "asset_name": asset_name}, {"_id": 0, "user": 0}, session=session).sort("date", 1))
+
+    return ResponseModel(success=True, message="Open lots retrieved successfully", data=lots)
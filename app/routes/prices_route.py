@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, status, HTTPException
+from datetime import datetime
+from typing import Optional
+from bson import ObjectId
+
+from app.config.jwt_config import verify_token_dependency
+from app.models.price import ResponseModel
+from app.services.price_history import resolve_range, price_buckets, portfolio_value_series
+from app.services.tracing import TracedRoute
+from ..config import collection_name_users
+
+router = APIRouter(route_class=TracedRoute)
+
+@router.get("/assets/{asset_name}/history", tags=["prices"], status_code=status.HTTP_200_OK)
+async def get_price_history(
+    asset_name: str,
+    granularity: str = "1h",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user: dict = Depends(verify_token_dependency)
+) -> ResponseModel:
+    try:
+        start, end = resolve_range(granularity, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    buckets = price_buckets(asset_name, granularity, start, end)
+
+    return ResponseModel(
+        success=True,
+        message="Price history retrieved successfully",
+        data={"asset_name": asset_name, "granularity": granularity, "buckets": buckets}
+    )
+
+
+@router.get("/{user_id}/portfolio-value", tags=["prices"], status_code=status.HTTP_200_OK)
+async def get_portfolio_value(
+    user_id: str,
+    granularity: str = "1d",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user: dict = Depends(verify_token_dependency)
+) -> ResponseModel:
+    try:
+        user_object_id = ObjectId(user_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
+
+    # Check if user exists
+    existing_user = collection_name_users.find_one({"_id": user_object_id})
+    if not existing_user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
+
+    try:
+        start, end = resolve_range(granularity, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    series = portfolio_value_series(user_id, granularity, start, end)
+
+    return ResponseModel(
+        success=True,
+        message="Portfolio value retrieved successfully",
+        data={"granularity": granularity, "series": series}
+    )
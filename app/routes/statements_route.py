@@ -0,0 +1,53 @@
+import gzip
+from fastapi import APIRouter, Depends, Request, Response, status, HTTPException
+from bson import ObjectId
+
+from app.config.jwt_config import verify_token_dependency
+from app.services.statements import FORMATS, month_bounds, get_statement
+from app.services.tracing import TracedRoute
+from ..config import collection_name_users
+
+router = APIRouter(route_class=TracedRoute)
+
+@router.get("/{user_id}/{month}", tags=["statements"], status_code=status.HTTP_200_OK)
+async def get_monthly_statement(user_id: str, month: str, request: Request, format: str = "html", user: dict = Depends(verify_token_dependency)):
+    try:
+        user_object_id = ObjectId(user_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
+
+    if format not in FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="format must be html or csv")
+    try:
+        month_bounds(month)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="month must be formatted as YYYY-MM")
+
+    # Check if user exists
+    existing_user = collection_name_users.find_one({"_id": user_object_id})
+    if not existing_user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
+
+    statement = get_statement(user_id, month, format)
+
+    etag = f'"{statement["etag"]}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, max-age=3600",
+        "Last-Modified": statement["generated_at"].strftime("%a, %d %b %Y %H:%M:%S GMT"),
+        "Vary": "Accept-Encoding",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Serve the stored gzip bytes as-is when the client accepts them
+    content = bytes(statement["content"])
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+    else:
+        content = gzip.decompress(content)
+
+    if format == "csv":
+        headers["Content-Disposition"] = f'attachment; filename="statement-{month}.csv"'
+
+    return Response(content=content, media_type=FORMATS[format], headers=headers)
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, status, HTTPException
+
+from app.config.jwt_config import verify_token_dependency
+from app.models.strategy import ResponseModel
+from app.services.strategy_stats import LEADERBOARD_SORTS, leaderboard
+from app.services.tracing import TracedRoute
+
+router = APIRouter(route_class=TracedRoute)
+
+@router.get("/leaderboard", tags=["strategies"], status_code=status.HTTP_200_OK)
+async def get_leaderboard(sort: str = "win_rate", min_trades: int = 20, limit: int = 20, user: dict = Depends(verify_token_dependency)) -> ResponseModel:
+    if sort not in LEADERBOARD_SORTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"sort must be one of {', '.join(LEADERBOARD_SORTS)}")
+    if min_trades < 1 or not 1 <= limit <= 100:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="min_trades must be positive and limit between 1 and 100")
+
+    # Served from the materialized strategy_stats view, never from trades
+    return ResponseModel(
+        success=True,
+        message="Leaderboard retrieved successfully",
+        data=leaderboard(sort, min_trades, limit)
+    )
@@ -0,0 +1,80 @@
+import os
+from fastapi import APIRouter, Depends, status, HTTPException
+from datetime import datetime, timedelta
+from typing import Optional
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from app.config.jwt_config import verify_token_dependency
+from app.config.database import TOMBSTONE_RETENTION_DAYS
+from app.config.read_config import reader
+from app.models.sync import ResponseModel
+from app.services.tracing import TracedRoute
+from ..config import collection_name_users, collection_name_trades, collection_name_holdings, collection_name_journals, collection_name_tombstones
+
+load_dotenv()
+
+# Re-read a small window before the checkpoint so writes that committed
+# while the previous sync was running are not missed; clients upsert by _id.
+# Sync reads the primary: a lagging secondary would hide writes from before
+# the checkpoint for good, since the next sync starts after it
+SYNC_OVERLAP_SECONDS = int(os.getenv("SYNC_OVERLAP_SECONDS", "5"))
+
+SYNC_COLLECTIONS = {
+    "trades": collection_name_trades,
+    "holdings": collection_name_holdings,
+    "journals": collection_name_journals,
+}
+
+router = APIRouter(route_class=TracedRoute)
+
+@router.get("/{user_id}", tags=["sync"], status_code=status.HTTP_200_OK)
+async def sync(user_id: str, checkpoint: Optional[datetime] = None, user: dict = Depends(verify_token_dependency)) -> ResponseModel:
+    try:
+        user_object_id = ObjectId(user_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
+
+    # Check if user exists
+    existing_user = collection_name_users.find_one({"_id": user_object_id})
+    if not existing_user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
+
+    # The new checkpoint is taken before reading so nothing written meanwhile is skipped
+    new_checkpoint = datetime.now()
+
+    # Tombstones older than the retention window are gone, so such clients start over
+    full_resync = checkpoint is None or checkpoint < new_checkpoint - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+
+    changes = {}
+    deleted = {name: [] for name in SYNC_COLLECTIONS}
+    if full_resync:
+        for name, collection in SYNC_COLLECTIONS.items():
+            changes[name] = list(reader(collection, "detail").find({"user": user_id}))
+    else:
+        since = checkpoint - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+        for name, collection in SYNC_COLLECTIONS.items():
+            changes[name] = list(reader(collection, "detail").find({"user": user_id, "updated_at": {"$gte": since}}))
+        for tombstone in reader(collection_name_tombstones, "detail").find(
+            {"user": user_id, "deleted_at": {"$gte": since}},
+            {"collection": 1, "doc_id": 1},
+        ):
+            if tombstone["collection"] in deleted:
+                deleted[tombstone["collection"]].append(tombstone["doc_id"])
+
+    # Convert ObjectId fields to strings for proper JSON serialization
+    for records in changes.values():
+        for record in records:
+            record["_id"] = str(record["_id"])
+            record["user"] = str(record["user"])
+
+    return ResponseModel(
+        success=True,
+        message="Sync completed successfully",
+        data={
+            "checkpoint": new_checkpoint,
+            "full_resync": full_resync,
+            "changes": changes,
+            "deleted": deleted,
+        }
+    )
@@ -1,14 +1,33 @@
-from fastapi import APIRouter, Depends, status, HTTPException
-from datetime import datetime
+from fastapi import APIRouter, Depends, Query, status, HTTPException
+from datetime import datetime, timedelta
+from typing import List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from bson import ObjectId
+from pymongo import ReturnDocument
 
+from app.config.write_config import writer
 from app.config.jwt_config import verify_token_dependency
-from app.models.trade import NewTrade, ResponseModel
+from app.config.read_config import reader, read_session, write_session
+from app.models.trade import NewTrade, UpdateTrade, ResponseModel, TRADE_FIELDS
+from app.services.lots import resolve_method, record_round_trip, remove_source
+from app.services.cache import get_cached, set_cached, invalidate_user
+from app.services.projection import build_projection
+from app.services.sync import record_tombstone
+from app.services.live import notify
+from app.services.idempotency import idempotent, record_response
+from app.services.statements import mark_stale
+from app.services.strategy_stats import mark_strategies_stale
+from app.services.tags import normalize_tags, filter_query, faceted_search
+from app.services.tracing import TracedRoute
+from app.services.fx import base_currency, conversion_factor, currency_of, normalize_currency
+from app.services.wire import NegotiatedResponse
 from ..config import collection_name_users, collection_name_trades, collection_name_journals
 
-router = APIRouter()
+# List-heavy routes answer in columnar JSON or MessagePack when the client asks for it
+router = APIRouter(route_class=TracedRoute, default_response_class=NegotiatedResponse)
 
 @router.post("/{user_id}/new-trade/", tags=["trades"], status_code=status.HTTP_201_CREATED)
+@idempotent("new-trade", "new_trade")
 async def create_trade(user_id: str, new_trade: NewTrade, user: dict = Depends(verify_token_dependency)  ) -> ResponseModel:
     try:
         # Convert user_id to ObjectId
@@ -16,6 +35,12 @@ async def create_trade(user_id: str, new_trade: NewTrade, user: dict = Depends(v
     except Exception:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user ID format")
 
+    try:
+        tags = normalize_tags(new_trade.tags)
+        currency = normalize_currency(new_trade.currency)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Check if user exists in the database
     existing_user = collection_name_users.find_one({"_id": user_object_id})
     if not existing_user:
@@ -39,18 +64,23 @@ async def create_trade(user_id: str, new_trade: NewTrade, user: dict = Depends(v
             "stop_loss": 0.00,
             "strategy_name": new_trade.strategy_name,
             "strategy_description": new_trade.strategy_description,
+            "tags": tags,
             "user": str(user_object_id),
-            "date": datetime.now()
+            "date": datetime.now(),
+            "updated_at": datetime.now()
         }
 
-        # Insert journal entry into the collection
-        journal = collection_name_journals.insert_one(journal_data)
+        with write_session(str(user_object_id)) as session:
+            # Insert journal entry into the collection
+            journal = writer(collection_name_journals, "primary").insert_one(journal_data, session=session)
 
-        # Update user by adding the journal entry ID
-        collection_name_users.update_one(
-            {"_id": user_object_id},
-            {"$push": {"journals": str(journal.inserted_id)}}
-        )
+            # Update user by adding the journal entry ID
+            writer(collection_name_users, "primary").update_one(
+                {"_id": user_object_id},
+                {"$push": {"journals": str(journal.inserted_id)}},
+                session=session
+            )
+        notify(str(user_object_id), "journals", "insert", str(journal.inserted_id))
 
         return ResponseModel(
             success=True,
@@ -61,6 +91,7 @@ async def create_trade(user_id: str, new_trade: NewTrade, user: dict = Depends(v
     # For new trades, prepare trade data
     trade_data = {
         "asset_name": new_trade.asset_name,
+        "asset_type": new_trade.asset_type,
         "quantity": new_trade.quantity,
         "trade_category": new_trade.trade_category,
         "journal_for": "Trade",
@@ -70,48 +101,71 @@ async def create_trade(user_id: str, new_trade: NewTrade, user: dict = Depends(v
         "exit_price": new_trade.exit_price,
         "total_traded": total_traded_value,
         "profit_or_loss": total_profit_or_loss,
+        # Amounts are in this currency; it defaults to the user's base currency
+        "currency": currency or base_currency(existing_user),
         "date": new_trade.date,
         "strategy_name": new_trade.strategy_name,
         "strategy_description": new_trade.strategy_description,
+        "tags": tags,
         "user": str(user_object_id),
-        "created_at": datetime.now()
+        "created_at": datetime.now(),
+        "updated_at": datetime.now()
     }
 
-    # Insert trade into the trades collection
-    trade = collection_name_trades.insert_one(trade_data)
+    with write_session(str(user_object_id)) as session:
+        # Insert trade into the trades collection
+        trade = writer(collection_name_trades, "primary").insert_one(trade_data, session=session)
 
-    # Update user by adding the trade entry ID
-    collection_name_users.update_one(
-        {"_id": user_object_id},
-        {"$push": {"trades": str(trade.inserted_id)}}
-    )
+        # Update user by adding the trade entry ID
+        writer(collection_name_users, "primary").update_one(
+            {"_id": user_object_id},
+            {"$push": {"trades": str(trade.inserted_id)}},
+            session=session
+        )
 
-    return ResponseModel(
+    response = ResponseModel(
         success=True,
         message="Trade added successfully",
         data={**trade_data, "_id": str(trade.inserted_id)}
     )
+    # The trade is saved: a retry must get it back even if the bookkeeping below fails
+    record_response(response)
+
+    # Book the realized P&L of the closed trade
+    record_round_trip(str(user_object_id), new_trade.asset_name, new_trade.quantity, new_trade.enter_price, new_trade.exit_price, new_trade.date, str(trade.inserted_id))
+    invalidate_user(str(user_object_id))
+    mark_stale(str(user_object_id), new_trade.date)
+    notify(str(user_object_id), "trades", "insert", str(trade.inserted_id))
+
+    return response
 
 @router.get("/{user_id}/all-trades", tags=["trades"], status_code=status.HTTP_200_OK)
-async def get_all_trades(user_id: str,user: dict = Depends(verify_token_dependency)  ) -> ResponseModel:
+async def get_all_trades(user_id: str, fields: Optional[str] = None, exclude: Optional[str] = None, user: dict = Depends(verify_token_dependency)  ) -> ResponseModel:
     try:
         user_object_id = ObjectId(user_id)
     except:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
 
+    try:
+        projection = build_projection(fields, exclude, TRADE_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Check if the user exists in the database
     existing_user = collection_name_users.find_one({"_id": user_object_id})
     if not existing_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
 
     # Fetch all trades for the given user
-    trades_cursor = collection_name_trades.find({"user": user_id})
-    trades = list(trades_cursor)
+    with read_session(user_id) as session:
+        trades_cursor = reader(collection_name_trades, "listing").find({"user": user_id}, projection, session=session)
+        trades = list(trades_cursor)
 
     # Convert ObjectId to string for each trade
     for trade in trades:
         trade["_id"] = str(trade["_id"])
-        trade["user"] = str(trade["user"])
+        if "user" in trade:
+            trade["user"] = str(trade["user"])
 
     return ResponseModel(
         success=True,
@@ -120,8 +174,131 @@ async def get_all_trades(user_id: str,user: dict = Depends(verify_token_dependen
     )
 
 
+@router.get("/{user_id}/calendar", tags=["trades"], status_code=status.HTTP_200_OK)
+async def get_pnl_calendar(
+    user_id: str,
+    unit: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    tz: Optional[str] = None,
+    user: dict = Depends(verify_token_dependency)
+) -> ResponseModel:
+    try:
+        user_object_id = ObjectId(user_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
+
+    if unit not in ("day", "week", "month"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="unit must be one of day, week, month")
+
+    # Check if user exists
+    existing_user = collection_name_users.find_one({"_id": user_object_id})
+    if not existing_user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
+
+    # Bucket in the requested timezone, else the user's, else UTC
+    tz = tz or existing_user.get("timezone") or "UTC"
+    try:
+        ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid timezone")
+
+    # The default window ends at the next midnight so repeated requests share a cache key;
+    # trade writes invalidate the user's cache, so today's trades still show up
+    end = end or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    start = start or end - timedelta(days=365)
+
+    base = base_currency(existing_user)
+    cache_key = f"calendar:{unit}:{tz}:{base}:{start.isoformat()}:{end.isoformat()}"
+    buckets = get_cached(user_id, cache_key)
+    if buckets is None:
+        date_trunc = {"date": "$date", "unit": unit, "timezone": tz}
+        if unit == "week":
+            date_trunc["startOfWeek"] = "monday"
+
+        # Sum per bucket and currency, then convert each sum to the base currency once
+        pipeline = [
+            {"$match": {"user": user_id, "date": {"$gte": start, "$lt": end}}},
+            {"$group": {
+                "_id": {"bucket": {"$dateTrunc": date_trunc}, "currency": currency_of()},
+                "net_pnl": {"$sum": "$profit_or_loss"},
+                "trade_count": {"$sum": 1},
+                "wins": {"$sum": {"$cond": [{"$gt": ["$profit_or_loss", 0]}, 1, 0]}},
+            }},
+            {"$set": {"rate": conversion_factor("$_id.currency", base)}},
+            {"$group": {
+                "_id": "$_id.bucket",
+                "net_pnl": {"$sum": {"$multiply": ["$net_pnl", "$rate"]}},
+                "trade_count": {"$sum": "$trade_count"},
+                "wins": {"$sum": "$wins"},
+                "unconverted_trades": {"$sum": {"$cond": [{"$eq": ["$rate", None]}, "$trade_count", 0]}},
+            }},
+            {"$sort": {"_id": 1}},
+            {"$project": {
+                "_id": 0,
+                "bucket": "$_id",
+                "net_pnl": 1,
+                "trade_count": 1,
+                "unconverted_trades": 1,
+                "win_ratio": {"$divide": ["$wins", "$trade_count"]},
+            }},
+        ]
+        with read_session(user_id) as session:
+            buckets = list(reader(collection_name_trades, "analytics").aggregate(pipeline, session=session))
+        set_cached(user_id, cache_key, buckets)
+
+    return ResponseModel(
+        success=True,
+        message="P&L calendar retrieved successfully",
+        data={"unit": unit, "timezone": tz, "currency": base, "buckets": buckets}
+    )
+
+
+@router.get("/{user_id}/search", tags=["trades"], status_code=status.HTTP_200_OK)
+async def search_trades(
+    user_id: str,
+    tags: Optional[List[str]] = Query(None),
+    match: str = "all",
+    asset_type: Optional[str] = None,
+    journal_for: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    page: int = 1,
+    page_size: int = 20,
+    fields: Optional[str] = None,
+    exclude: Optional[str] = None,
+    user: dict = Depends(verify_token_dependency)
+) -> ResponseModel:
+    try:
+        user_object_id = ObjectId(user_id)
+    except:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
+
+    if page < 1 or not 1 <= page_size <= 100:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination parameters")
+    try:
+        query = filter_query(user_id, tags, match, asset_type, journal_for, start, end)
+        projection = build_projection(fields, exclude, TRADE_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    existing_user = collection_name_users.find_one({"_id": user_object_id})
+    if not existing_user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
+
+    # One page of matches and the facet counts come back from a single $facet
+    with read_session(user_id) as session:
+        result = faceted_search(reader(collection_name_trades, "listing"), query, projection, page, page_size, session=session)
+
+    return ResponseModel(
+        success=True,
+        message="Trades retrieved successfully",
+        data=result
+    )
+
+
 @router.get("/{user_id}/{trade_id}", tags=["trades"], status_code=status.HTTP_200_OK)
-async def get_trade(user_id: str, trade_id: str, user: dict = Depends(verify_token_dependency)  ) -> ResponseModel:
+async def get_trade(user_id: str, trade_id: str, fields: Optional[str] = None, exclude: Optional[str] = None, user: dict = Depends(verify_token_dependency)  ) -> ResponseModel:
     try:
         # Convert IDs to ObjectId
         user_object_id = ObjectId(user_id)
@@ -129,19 +306,26 @@ async def get_trade(user_id: str, trade_id: str, user: dict = Depends(verify_tok
     except Exception:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
 
+    try:
+        projection = build_projection(fields, exclude, TRADE_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Check if user exists
     existing_user = collection_name_users.find_one({"_id": user_object_id})
     if not existing_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
 
     # Query for trade with ownership verification
-    trade = collection_name_trades.find_one({"_id": trade_object_id, "user": user_id})
+    with read_session(user_id) as session:
+        trade = reader(collection_name_trades, "detail").find_one({"_id": trade_object_id, "user": user_id}, projection, session=session)
     if not trade:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trade does not exist or does not belong to the user")
 
     # Convert ObjectId fields to string
     trade["_id"] = str(trade["_id"])
-    trade["user"] = str(trade["user"])
+    if "user" in trade:
+        trade["user"] = str(trade["user"])
 
     # Return success response
     return ResponseModel(success=True, message="Trade retrieved successfully", data=trade)
@@ -156,6 +340,12 @@ async def update_holding(user_id: str, trade_id: str, trade_data: NewTrade, user
     except:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
 
+    try:
+        tags = normalize_tags(trade_data.tags)
+        currency = normalize_currency(trade_data.currency)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Check if user exists
     existing_user = collection_name_users.find_one({"_id": user_object_id})
     if not existing_user:
@@ -174,6 +364,7 @@ async def update_holding(user_id: str, trade_id: str, trade_data: NewTrade, user
     # Prepare updated trade data
     updated_trade_data = {
         "asset_name": trade_data.asset_name,
+        "asset_type": trade_data.asset_type,
         "quantity": trade_data.quantity,
         "trade_category": trade_data.trade_category,
         "trade_type": trade_data.trade_type,
@@ -182,20 +373,34 @@ async def update_holding(user_id: str, trade_id: str, trade_data: NewTrade, user
         "stop_loss": 0.00,
         "total_traded": total_traded_value,
         "profit_or_loss": total_profit_or_loss,
+        "currency": currency or existing_trade.get("currency") or base_currency(existing_user),
         "strategy_name": trade_data.strategy_name,
         "strategy_description": trade_data.strategy_description,
-        "date": trade_data.date
+        "tags": tags,
+        "date": trade_data.date,
+        "updated_at": datetime.now()
     }
 
     # Update the trade in the collection
-    result = collection_name_trades.update_one(
-        {"_id": trade_object_id},
-        {"$set": updated_trade_data}
-    )
+    with write_session(user_id) as session:
+        result = writer(collection_name_trades, "primary").update_one(
+            {"_id": trade_object_id},
+            {"$set": updated_trade_data},
+            session=session
+        )
 
     if result.modified_count == 0:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to update trade")
 
+    # Replace the trade's ledger entry and replay only the affected assets
+    remove_source(user_id, trade_id, resolve_method(existing_user))
+    record_round_trip(user_id, trade_data.asset_name, trade_data.quantity, trade_data.enter_price, trade_data.exit_price, trade_data.date, trade_id)
+    invalidate_user(user_id)
+    mark_stale(user_id, existing_trade.get("date"), trade_data.date)
+    if existing_trade.get("strategy_name") != trade_data.strategy_name:
+        mark_strategies_stale(existing_trade.get("strategy_name"))
+    notify(user_id, "trades", "update", trade_id)
+
     return ResponseModel(
         success=True,
         message="Trade updated successfully",
@@ -203,6 +408,77 @@ async def update_holding(user_id: str, trade_id: str, trade_data: NewTrade, user
     )
 
 
+@router.patch("/{user_id}/{trade_id}", tags=["trades"], status_code=status.HTTP_200_OK)
+async def patch_trade(user_id: str, trade_id: str, trade_data: UpdateTrade, user: dict = Depends(verify_token_dependency)) -> ResponseModel:
+    try:
+        trade_object_id = ObjectId(trade_id)
+    except:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
+
+    # Only the fields the client sent are written
+    changes = {field: value for field, value in trade_data.model_dump(exclude_unset=True).items() if value is not None}
+    if not changes:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No fields to update")
+    try:
+        if "tags" in changes:
+            changes["tags"] = normalize_tags(changes["tags"])
+        if "currency" in changes:
+            changes["currency"] = normalize_currency(changes["currency"])
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Ownership is part of the filter; the previous date and strategy are only
+    # needed to refresh the statement month and strategy the trade moves out of
+    query = {"_id": trade_object_id, "user": user_id}
+    previous_date = previous_strategy = None
+    if changes.keys() & {"date", "strategy_name"}:
+        existing_trade = collection_name_trades.find_one(query, {"date": 1, "strategy_name": 1})
+        if not existing_trade:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trade does not exist or does not belong to the user")
+        previous_date = existing_trade["date"] if "date" in changes else None
+        if existing_trade.get("strategy_name") != changes.get("strategy_name", existing_trade.get("strategy_name")):
+            previous_strategy = existing_trade.get("strategy_name")
+
+    # Values are wrapped in $literal so client strings are never read as field paths
+    pipeline = [{"$set": {**{field: {"$literal": value} for field, value in changes.items()}, "updated_at": datetime.now()}}]
+    if changes.keys() & {"quantity", "enter_price", "exit_price"}:
+        pipeline.append({"$set": {
+            "total_traded": {"$multiply": ["$quantity", "$enter_price"]},
+            "profit_or_loss": {"$subtract": [{"$multiply": ["$quantity", "$exit_price"]}, {"$multiply": ["$quantity", "$enter_price"]}]},
+        }})
+
+    with write_session(user_id) as session:
+        updated_trade = writer(collection_name_trades, "primary").find_one_and_update(
+            query,
+            pipeline,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+
+    if not updated_trade:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trade does not exist or does not belong to the user")
+
+    # Replay the ledger only when the round trip itself changed
+    if changes.keys() & {"asset_name", "quantity", "enter_price", "exit_price", "date"}:
+        remove_source(user_id, trade_id, resolve_method(collection_name_users.find_one({"_id": ObjectId(user_id)}, {"lot_method": 1})))
+        record_round_trip(
+            user_id, updated_trade["asset_name"], updated_trade["quantity"], updated_trade["enter_price"],
+            updated_trade["exit_price"], updated_trade["date"], trade_id
+        )
+    invalidate_user(user_id)
+    mark_stale(user_id, previous_date, updated_trade["date"])
+    mark_strategies_stale(previous_strategy)
+    notify(user_id, "trades", "update", trade_id)
+
+    updated_trade["_id"] = trade_id
+
+    return ResponseModel(
+        success=True,
+        message="Trade updated successfully",
+        data=updated_trade
+    )
+
+
 @router.delete("/{user_id}/{trade_id}", tags=["trades"], status_code=status.HTTP_200_OK)
 async def delete_trade(user_id: str, trade_id: str,user: dict = Depends(verify_token_dependency)  ) -> ResponseModel:
     try:
@@ -236,23 +512,37 @@ async def delete_trade(user_id: str, trade_id: str,user: dict = Depends(verify_t
         "strategy_description": existing_trade["strategy_description"],
         "date": datetime.now(),
         "user": str(user_object_id),
+        "updated_at": datetime.now(),
     }
 
     try:
-        # Insert journal entry for deletion record
-        journal = collection_name_journals.insert_one(journal_data)
-
-        # Delete trade and update user data
-        collection_name_trades.delete_one({"_id": trade_object_id})
-        collection_name_users.update_one(
-            {"_id": user_object_id},
-            {
-                "$pull": {"trades": str(trade_object_id)},
-                "$push": {"journals": str(journal.inserted_id)}
-            }
-        )
+        with write_session(user_id) as session:
+            # Insert journal entry for deletion record
+            journal = writer(collection_name_journals, "derived").insert_one(journal_data, session=session)
+
+            # Delete trade and update user data
+            writer(collection_name_trades, "primary").delete_one({"_id": trade_object_id}, session=session)
+            writer(collection_name_users, "primary").update_one(
+                {"_id": user_object_id},
+                {
+                    "$pull": {"trades": str(trade_object_id)},
+                    "$push": {"journals": str(journal.inserted_id)}
+                },
+                session=session
+            )
+
+        # The strategy name lets the leaderboard refresh find the strategy this trade leaves
+        record_tombstone(user_id, "trades", trade_id, strategy_name=existing_trade.get("strategy_name"))
+
+        # Drop the trade from the lot ledger
+        remove_source(user_id, trade_id, resolve_method(existing_user))
+        invalidate_user(user_id)
+        mark_stale(user_id, existing_trade.get("date"))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to delete trade: {str(e)}")
 
+    notify(user_id, "trades", "delete", trade_id)
+    notify(user_id, "journals", "insert", str(journal.inserted_id))
+
     # Return success response
     return ResponseModel(success=True, message="Trade deleted successfully", data={})
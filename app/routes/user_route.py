@@ -1,17 +1,25 @@
-from fastapi import APIRouter, status, HTTPException
+from fastapi import APIRouter, Depends, Request, status, HTTPException
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
+from typing import Optional
+from bson import ObjectId
 from app.models.user import User
-from ..config import collection_name_users
+from ..config import collection_name_users, collection_name_deletion_jobs
 import bcrypt
-from app.config.jwt_config import create_access_token
+from app.config.write_config import writer
+from app.config.jwt_config import create_access_token, verify_token_dependency
+from app.services.account_deletion import schedule_deletion, forget_user
+from app.services.fx import DEFAULT_CURRENCY, normalize_currency
+from app.services.rate_limit import login_limiter, login_ip_limiter, client_ip
+from app.services.tracing import TracedRoute, span
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 class NewUser(BaseModel):
     name: str
     email: EmailStr 
     password: str
+    base_currency: Optional[str] = None
 
 # Response model for API response
 class Response(BaseModel):
@@ -29,10 +37,17 @@ async def create_user(new_user: NewUser) -> Response:
     existing_user = collection_name_users.find_one({"email": new_user.email})
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
+
+    # Totals and analytics are reported in this currency
+    try:
+        base_currency = normalize_currency(new_user.base_currency) or DEFAULT_CURRENCY
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
     # Hash the password
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(new_user.password.encode('utf-8'), salt).decode('utf-8')
+    with span("bcrypt.hashpw"):
+        salt = bcrypt.gensalt()
+        hashed_password = bcrypt.hashpw(new_user.password.encode('utf-8'), salt).decode('utf-8')
 
     # Create a new user document
     user = {
@@ -44,11 +59,12 @@ async def create_user(new_user: NewUser) -> Response:
         "journal": [],
         "created_at": datetime.now(),  
         "is_banned": False,
-        "ban_time": None
+        "ban_time": None,
+        "base_currency": base_currency,
     }
 
     # Insert the new user into the MongoDB collection
-    result = collection_name_users.insert_one(user)
+    result = writer(collection_name_users, "primary").insert_one(user)
     
     if result.inserted_id:
         new_user_with_id = {**user, "_id": str(result.inserted_id)}  # Include the inserted _id
@@ -81,23 +97,28 @@ class LoginResponse(BaseModel):
     status_code=status.HTTP_200_OK,
     response_model=LoginResponse
 )
-async def login_user(login_user: LoginUser):
+async def login_user(login_user: LoginUser, request: Request):
+    # Throttle guessing per account and per client address
+    login_limiter.enforce(login_user.email.lower())
+    login_ip_limiter.enforce(client_ip(request))
+
     # Check if user exists
     existing_user: User = collection_name_users.find_one({"email": login_user.email})
     if not existing_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
     
     # Validate password
-    is_match = bcrypt.checkpw(
-        login_user.password.encode('utf-8'), 
-        existing_user["password"].encode('utf-8')
-    )
+    with span("bcrypt.checkpw"):
+        is_match = bcrypt.checkpw(
+            login_user.password.encode('utf-8'), 
+            existing_user["password"].encode('utf-8')
+        )
 
     if not is_match:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
     
     # Create token 
-    access_token = create_access_token({"email": login_user.email})
+    access_token = create_access_token({"sub": login_user.email, "email": login_user.email})
     
 
     return LoginResponse(
@@ -122,11 +143,12 @@ async def reset_password(reset_password: ResetPassword) -> Response:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
     
     # Hash the new password
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(reset_password.password.encode('utf-8'), salt).decode('utf-8')
+    with span("bcrypt.hashpw"):
+        salt = bcrypt.gensalt()
+        hashed_password = bcrypt.hashpw(reset_password.password.encode('utf-8'), salt).decode('utf-8')
 
     # Update the password in the database
-    update_result = collection_name_users.update_one(
+    update_result = writer(collection_name_users, "primary").update_one(
         {"email": reset_password.email}, 
         {"$set": {"password": hashed_password}}
     )
@@ -141,3 +163,40 @@ async def reset_password(reset_password: ResetPassword) -> Response:
     else:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to reset password")
 
+
+@router.delete(
+    "/{user_id}",
+    tags=["users"],
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def delete_user(user_id: str, user: dict = Depends(verify_token_dependency)) -> Response:
+    try:
+        user_object_id = ObjectId(user_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID format")
+
+    existing_user = collection_name_users.find_one({"_id": user_object_id}, {"email": 1})
+    if existing_user:
+        # Only the account holder may delete an account
+        if existing_user.get("email") != user.get("email"):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to delete this account")
+        # Record the job before removing the account so the cascade always runs
+        job = schedule_deletion(user_id, existing_user["email"])
+    else:
+        # A retried request sees its own pending job; anyone else sees no account
+        job = collection_name_deletion_jobs.find_one({"_id": user_id})
+        if job and job.get("requested_by") != user.get("email"):
+            job = None
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User does not exist")
+
+    # The account disappears now; trades, holdings, journals and derived data follow in the background
+    writer(collection_name_users, "primary").delete_one({"_id": user_object_id})
+    forget_user(user_id)
+
+    return Response(
+        success=True,
+        message="Account deletion scheduled",
+        user={"_id": user_id, "status": job["status"], "requested_at": job["requested_at"]}
+    )
+
@@ -0,0 +1,124 @@
+import os
+import re
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from app.config.read_config import user_write_times
+from app.config.write_config import writer
+from app.services.cache import invalidate_user
+from app.services.export import purge_user as purge_exports
+from app.services.strategy_stats import mark_strategies_stale
+from ..config import (
+    collection_name_users,
+    collection_name_trades,
+    collection_name_holdings,
+    collection_name_journals,
+    collection_name_journals_archive,
+    collection_name_lot_events,
+    collection_name_lots,
+    collection_name_pnl,
+    collection_name_pnl_rollups,
+    collection_name_statements,
+    collection_name_tombstones,
+    collection_name_idempotency_keys,
+    collection_name_deletion_jobs,
+)
+
+load_dotenv()
+
+# Documents removed per delete_many, and the pause between batches that keeps primary load flat
+DELETION_BATCH_SIZE = int(os.getenv("DELETION_BATCH_SIZE", "500"))
+DELETION_BATCH_PAUSE_MS = int(os.getenv("DELETION_BATCH_PAUSE_MS", "250"))
+
+# Work budget per scheduler run; unfinished deletions resume on the next run
+DELETION_RUN_SECONDS = int(os.getenv("DELETION_RUN_SECONDS", "50"))
+
+
+def _cascade(user_id: str) -> list:
+    """Every collection holding the user's data with the filter that selects it, derived data first."""
+    return [
+        ("users", collection_name_users, {"_id": ObjectId(user_id)}),
+        ("statements", collection_name_statements, {"user": user_id}),
+        ("pnl_rollups", collection_name_pnl_rollups, {"user": user_id}),
+        ("pnl", collection_name_pnl, {"user": user_id}),
+        ("lots", collection_name_lots, {"user": user_id}),
+        ("lot_events", collection_name_lot_events, {"user": user_id}),
+        # Keys are "<user>:<scope>:<key>", so an anchored prefix walks the _id index
+        ("idempotency_keys", collection_name_idempotency_keys, {"_id": {"$regex": f"^{re.escape(user_id)}:"}}),
+        ("trades", collection_name_trades, {"user": user_id}),
+        ("holdings", collection_name_holdings, {"user": user_id}),
+        ("journals", collection_name_journals, {"user": user_id}),
+        ("journals_archive", collection_name_journals_archive, {"user": user_id}),
+        ("tombstones", collection_name_tombstones, {"user": user_id}),
+    ]
+
+
+def schedule_deletion(user_id: str, requested_by: str) -> dict:
+    """Records a deletion job for the user; scheduling the same user again returns the existing job.
+
+    `requested_by` (the account's email) lets a retried request find its job
+    after the account is gone; it is dropped once the deletion finishes.
+    """
+    now = datetime.now()
+    writer(collection_name_deletion_jobs, "primary").update_one(
+        {"_id": user_id},
+        {"$setOnInsert": {"status": "pending", "requested_by": requested_by, "requested_at": now, "updated_at": now, "deleted": {}}},
+        upsert=True,
+    )
+    return collection_name_deletion_jobs.find_one({"_id": user_id})
+
+
+def forget_user(user_id: str):
+    """Drops this worker's in-memory state keyed on the user."""
+    invalidate_user(user_id)
+    user_write_times.pop(user_id, None)
+
+
+def process_deletion(user_id: str, deadline: float) -> bool:
+    """Deletes the user's data in batches until done (True) or the deadline passes (False).
+
+    Batches select _ids first and delete by _id, so each delete_many is
+    bounded and a restarted run simply picks up whatever is left. Exported
+    snapshots are rewritten without the user's rows once the database is clean.
+    """
+    for name, collection, query in _cascade(user_id):
+        if name == "trades":
+            # Bulk deletes leave no tombstones, so the leaderboard has to be told which strategies changed
+            mark_strategies_stale(*collection_name_trades.distinct("strategy_name", {"user": user_id}))
+        while True:
+            if time.monotonic() >= deadline:
+                return False
+
+            ids = [document["_id"] for document in collection.find(query, {"_id": 1}).limit(DELETION_BATCH_SIZE)]
+            if not ids:
+                break
+
+            result = writer(collection, "primary").delete_many({"_id": {"$in": ids}})
+            writer(collection_name_deletion_jobs, "primary").update_one(
+                {"_id": user_id},
+                {"$set": {"status": "running", "step": name, "updated_at": datetime.now()}, "$inc": {f"deleted.{name}": result.deleted_count}},
+            )
+            time.sleep(DELETION_BATCH_PAUSE_MS / 1000)
+
+    exported_rows = purge_exports(user_id)
+    forget_user(user_id)
+    writer(collection_name_deletion_jobs, "primary").update_one(
+        {"_id": user_id},
+        {"$set": {"status": "done", "deleted.exports": exported_rows, "step": None, "finished_at": datetime.now(), "updated_at": datetime.now()}, "$unset": {"requested_by": ""}},
+    )
+    return True
+
+
+def process_pending_deletions() -> dict:
+    """Works through outstanding deletions, oldest first, within one run's time budget."""
+    deadline = time.monotonic() + DELETION_RUN_SECONDS
+    finished = []
+    pending = collection_name_deletion_jobs.find({"status": {"$in": ["pending", "running"]}}, {"_id": 1}).sort("requested_at", 1)
+    for job in pending:
+        if not process_deletion(job["_id"], deadline):
+            break
+        finished.append(job["_id"])
+    return {"finished": len(finished)}
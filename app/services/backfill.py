@@ -0,0 +1,60 @@
+import argparse
+from datetime import datetime
+
+from pymongo import UpdateMany
+
+from app.config.write_config import writer
+from ..config import collection_name_trades, collection_name_journals
+
+
+def backfill_trade_asset_type() -> dict:
+    """Fills in asset_type on trades saved before trades stored it.
+
+    Each (user, asset) takes the asset type of the user's latest journal for
+    that asset. Trades with no such journal get an explicit null, so they
+    show up as an unknown bucket in search facets and a rerun skips them.
+    Re-running is safe; it only touches trades still missing the field.
+    """
+    missing = collection_name_trades.aggregate([
+        {"$match": {"asset_type": {"$exists": False}}},
+        {"$group": {"_id": {"user": "$user", "asset_name": "$asset_name"}}},
+    ], allowDiskUse=True)
+
+    operations, inferred = [], 0
+    for group in missing:
+        user_id, asset_name = group["_id"]["user"], group["_id"]["asset_name"]
+        journal = collection_name_journals.find_one(
+            {"user": user_id, "asset_name": asset_name, "asset_type": {"$type": "string"}},
+            {"asset_type": 1},
+            sort=[("date", -1)],
+        )
+        asset_type = journal["asset_type"] if journal else None
+        inferred += journal is not None
+        operations.append(UpdateMany(
+            {"user": user_id, "asset_name": asset_name, "asset_type": {"$exists": False}},
+            # updated_at moves so delta sync hands the field to clients
+            {"$set": {"asset_type": asset_type, "updated_at": datetime.now()}},
+        ))
+
+    updated = 0
+    if operations:
+        updated = writer(collection_name_trades, "primary").bulk_write(operations, ordered=False).modified_count
+    return {"assets": len(operations), "inferred": inferred, "trades": updated}
+
+
+BACKFILLS = {
+    "trade-asset-type": backfill_trade_asset_type,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="One-off data backfills for records saved before a field existed.")
+    parser.add_argument("backfills", nargs="*", help=f"backfills to run: {', '.join(BACKFILLS)} (default: all)")
+    args = parser.parse_args()
+
+    unknown = set(args.backfills) - BACKFILLS.keys()
+    if unknown:
+        parser.error(f"unknown backfills: {', '.join(sorted(unknown))}")
+
+    for name in args.backfills or BACKFILLS:
+        print(name, BACKFILLS[name]())
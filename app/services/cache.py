@@ -0,0 +1,48 @@
+import os
+import time
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "300"))
+
+# In-memory per-user cache: user_id -> {key: (expires_at, value)}
+user_cache = {}
+
+
+def get_cached(user_id: str, key: str) -> Optional[Any]:
+    """Returns a cached value for a user or None when missing or expired."""
+    entry = user_cache.get(user_id, {}).get(key)
+    if not entry:
+        return None
+    expires_at, value = entry
+    if time.time() > expires_at:
+        user_cache[user_id].pop(key, None)
+        return None
+    return value
+
+
+def set_cached(user_id: str, key: str, value: Any, ttl: int = CACHE_TTL_SECONDS):
+    """Stores a value for a user with a timestamped expiry."""
+    user_cache.setdefault(user_id, {})[key] = (time.time() + ttl, value)
+
+
+def invalidate_user(user_id: str):
+    """Drops every cached value for a user."""
+    user_cache.pop(user_id, None)
+
+
+def purge_expired() -> int:
+    """Drops expired entries, and users left with none, from this worker's cache."""
+    now = time.time()
+    purged = 0
+    for user_id, entries in list(user_cache.items()):
+        for key, (expires_at, _) in list(entries.items()):
+            if now > expires_at:
+                entries.pop(key, None)
+                purged += 1
+        if not entries:
+            user_cache.pop(user_id, None)
+    return purged
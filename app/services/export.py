@@ -0,0 +1,197 @@
+import argparse
+import os
+import shutil
+from datetime import datetime
+from itertools import islice
+
+from dotenv import load_dotenv
+
+from app.config.read_config import reader
+from app.config.write_config import writer
+from ..config import collection_name_trades, collection_name_holdings, collection_name_journals, collection_name_export_checkpoints
+
+# pyarrow is in requirements.txt, but only the export needs it, so the API still starts without it
+try:
+    import pyarrow as pa
+    import pyarrow.compute
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+load_dotenv()
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_FORMAT = os.getenv("EXPORT_FORMAT", "parquet")
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+EXPORT_COLLECTIONS = {
+    "trades": collection_name_trades,
+    "holdings": collection_name_holdings,
+    "journals": collection_name_journals,
+}
+
+# Column name -> arrow type name; documents missing a column export it as null
+EXPORT_COLUMNS = {
+    "trades": {
+        "_id": "string", "user": "string", "asset_name": "string", "asset_type": "string", "quantity": "int64",
+        "trade_type": "string", "trade_category": "string", "enter_price": "float64", "exit_price": "float64",
+        "stop_loss": "float64", "total_traded": "float64", "profit_or_loss": "float64", "currency": "string", "strategy_name": "string",
+        "strategy_description": "string", "tags": "string_list", "date": "timestamp", "created_at": "timestamp",
+        "updated_at": "timestamp",
+    },
+    "holdings": {
+        "_id": "string", "user": "string", "asset_name": "string", "quantity": "int64", "bought_price": "float64",
+        "current_price": "float64", "total_investment": "float64", "current_investment": "float64",
+        "currency": "string", "date": "timestamp", "created_at": "timestamp", "updated_at": "timestamp",
+    },
+    "journals": {
+        "_id": "string", "user": "string", "asset_name": "string", "asset_type": "string", "quantity": "int64",
+        "journal_for": "string", "trade_category": "string", "enter_price": "float64", "exit_price": "float64",
+        "stop_loss": "float64", "strategy_name": "string", "strategy_description": "string", "tags": "string_list",
+        "date": "timestamp", "updated_at": "timestamp",
+    },
+}
+
+
+def _schema(name: str):
+    types = {
+        "string": pa.string(), "string_list": pa.list_(pa.string()), "int64": pa.int64(),
+        "float64": pa.float64(), "timestamp": pa.timestamp("ms"),
+    }
+    return pa.schema([(column, types[kind]) for column, kind in EXPORT_COLUMNS[name].items()])
+
+
+def _row(document: dict) -> dict:
+    row = {**document, "_id": str(document["_id"])}
+    if "user" in row:
+        row["user"] = str(row["user"])
+    return row
+
+
+def _month(document: dict) -> str:
+    # Partition by the record's own date, falling back to when it was inserted
+    date = document.get("date") if isinstance(document.get("date"), datetime) else document["_id"].generation_time
+    return date.strftime("%Y-%m")
+
+
+def _write_part(name: str, month: str, part: str, rows: list, fmt: str) -> str:
+    """Writes one file under <dir>/<collection>/month=YYYY-MM/, replacing it atomically."""
+    directory = os.path.join(EXPORT_DIR, name, f"month={month}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"part-{part}.{'parquet' if fmt == 'parquet' else 'arrow'}")
+
+    _write_table(pa.Table.from_pylist(rows, schema=_schema(name)), path, fmt)
+    return path
+
+
+def _write_table(table, path: str, fmt: str):
+    temporary = path + ".tmp"
+    if fmt == "parquet":
+        pq.write_table(table, temporary, compression="zstd")
+    else:
+        with pa.OSFile(temporary, "wb") as sink, pa.ipc.new_file(sink, table.schema) as out:
+            out.write_table(table)
+    os.replace(temporary, path)
+
+
+def _read_table(path: str):
+    if path.endswith(".parquet"):
+        return pq.read_table(path)
+    with pa.OSFile(path, "rb") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def export_collection(name: str, fmt: str = EXPORT_FORMAT, full: bool = False) -> dict:
+    """Appends documents inserted since the last checkpoint as month-partitioned files.
+
+    Each batch gets its own part file named after its first _id and the
+    checkpoint moves only once that file is on disk, so an interrupted run
+    resumes where it stopped and rewrites at most the unfinished part.
+    Documents edited or deleted after being exported are not revisited.
+    A run without a checkpoint (the first one, or any --full run) starts from
+    an empty collection directory, so old parts never duplicate rows.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed; install it to export snapshots")
+    if fmt not in ("parquet", "arrow"):
+        raise ValueError("format must be parquet or arrow")
+
+    if full:
+        writer(collection_name_export_checkpoints, "derived").delete_one({"_id": name})
+    checkpoint = collection_name_export_checkpoints.find_one({"_id": name})
+    if not checkpoint:
+        shutil.rmtree(os.path.join(EXPORT_DIR, name), ignore_errors=True)
+    query = {"_id": {"$gt": checkpoint["last_id"]}} if checkpoint else {}
+
+    # Exports read through the analytics class so they stay off the primary
+    cursor = reader(EXPORT_COLLECTIONS[name], "analytics").find(query).sort("_id", 1).batch_size(EXPORT_BATCH_SIZE)
+
+    exported, files = 0, 0
+    while True:
+        batch = list(islice(cursor, EXPORT_BATCH_SIZE))
+        if not batch:
+            break
+
+        partitions = {}
+        for document in batch:
+            partitions.setdefault(_month(document), []).append(_row(document))
+        for month, rows in partitions.items():
+            _write_part(name, month, str(batch[0]["_id"]), rows, fmt)
+            files += 1
+
+        exported += len(batch)
+        writer(collection_name_export_checkpoints, "derived").update_one(
+            {"_id": name},
+            {"$set": {"last_id": batch[-1]["_id"], "exported_at": datetime.now(), "format": fmt}, "$inc": {"rows": len(batch)}},
+            upsert=True,
+        )
+
+    return {"collection": name, "rows": exported, "files": files}
+
+
+def export_all(fmt: str = EXPORT_FORMAT, full: bool = False) -> list:
+    return [export_collection(name, fmt, full) for name in EXPORT_COLLECTIONS]
+
+
+def purge_user(user_id: str) -> int:
+    """Rewrites every exported part that holds the user's rows without them; returns the rows removed.
+
+    Part files are replaced atomically like a normal export writes them, and a
+    part left empty is removed. Runs as the last step of an account deletion.
+    """
+    if pa is None:
+        return 0
+
+    removed = 0
+    for name in EXPORT_COLLECTIONS:
+        for directory, _, filenames in os.walk(os.path.join(EXPORT_DIR, name)):
+            for filename in filenames:
+                if not filename.startswith("part-") or not filename.endswith((".parquet", ".arrow")):
+                    continue
+                path = os.path.join(directory, filename)
+                table = _read_table(path)
+                keep = pa.compute.not_equal(table["user"], user_id)
+                kept = table.filter(pa.compute.fill_null(keep, True))
+                if kept.num_rows == table.num_rows:
+                    continue
+                removed += table.num_rows - kept.num_rows
+                if kept.num_rows:
+                    _write_table(kept, path, "parquet" if filename.endswith(".parquet") else "arrow")
+                else:
+                    os.remove(path)
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export trades, holdings and journals as month-partitioned Parquet/Arrow files.")
+    parser.add_argument("collections", nargs="*", help=f"collections to export: {', '.join(EXPORT_COLLECTIONS)} (default: all)")
+    parser.add_argument("--format", default=EXPORT_FORMAT, choices=["parquet", "arrow"])
+    parser.add_argument("--full", action="store_true", help="ignore the checkpoint, remove earlier files and export everything again")
+    args = parser.parse_args()
+
+    unknown = set(args.collections) - EXPORT_COLLECTIONS.keys()
+    if unknown:
+        parser.error(f"unknown collections: {', '.join(sorted(unknown))}")
+
+    for name in args.collections or EXPORT_COLLECTIONS:
+        print(export_collection(name, args.format, args.full))
@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from typing import Optional
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+from app.config.write_config import writer
+from ..config import collection_name_fx_rates
+
+load_dotenv()
+
+# Currency assumed for records and users saved before currencies existed
+DEFAULT_CURRENCY = os.getenv("DEFAULT_CURRENCY", "USD").upper()
+
+# Rates are stored as units of each currency per one unit of this currency
+FX_PIVOT_CURRENCY = os.getenv("FX_PIVOT_CURRENCY", "USD").upper()
+
+# Optional JSON source ({"rates": {"EUR": 0.92, ...}} against the pivot); without it
+# the fx_rates collection is maintained directly
+FX_RATES_URL = os.getenv("FX_RATES_URL")
+FX_FETCH_TIMEOUT_SECONDS = float(os.getenv("FX_FETCH_TIMEOUT_SECONDS", "10"))
+
+# The in-process table is reloaded at least this often even without the scheduler
+FX_CACHE_SECONDS = int(os.getenv("FX_CACHE_SECONDS", "900"))
+
+# In-process copy of fx_rates: currency -> units per pivot
+_rates = {}
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def normalize_currency(code: Optional[str]) -> Optional[str]:
+    """Upper-cases an ISO 4217 code; raises ValueError when it is not three letters."""
+    if code is None:
+        return None
+    code = code.strip().upper()
+    if len(code) != 3 or not code.isalpha():
+        raise ValueError("currency must be a three-letter ISO 4217 code")
+    return code
+
+
+def base_currency(user_doc: Optional[dict]) -> str:
+    """Returns the currency a user's totals are reported in."""
+    return (user_doc or {}).get("base_currency") or DEFAULT_CURRENCY
+
+
+def load_rates() -> dict:
+    """Replaces the in-process table with the contents of fx_rates."""
+    global _rates, _loaded_at
+    rates = {doc["_id"]: doc["rate"] for doc in collection_name_fx_rates.find({}, {"rate": 1}) if doc.get("rate")}
+    rates[FX_PIVOT_CURRENCY] = 1.0
+    with _lock:
+        _rates, _loaded_at = rates, time.time()
+    return rates
+
+
+def get_rates() -> dict:
+    if time.time() - _loaded_at > FX_CACHE_SECONDS:
+        load_rates()
+    return _rates
+
+
+def save_rates(rates: dict, source: str = "manual") -> int:
+    """Upserts units-per-pivot rates into fx_rates and reloads the in-process table."""
+    now = datetime.now()
+    operations = [
+        UpdateOne({"_id": normalize_currency(code)}, {"$set": {"rate": float(rate), "source": source, "updated_at": now}}, upsert=True)
+        for code, rate in rates.items()
+        if rate and float(rate) > 0
+    ]
+    if operations:
+        writer(collection_name_fx_rates, "derived").bulk_write(operations, ordered=False)
+    load_rates()
+    return len(operations)
+
+
+def fetch_rates() -> int:
+    """Pulls the latest rates from FX_RATES_URL into fx_rates."""
+    if not FX_RATES_URL:
+        return 0
+    with urllib.request.urlopen(FX_RATES_URL, timeout=FX_FETCH_TIMEOUT_SECONDS) as response:
+        payload = json.load(response)
+    base = (payload.get("base") or FX_PIVOT_CURRENCY).upper()
+    if base != FX_PIVOT_CURRENCY:
+        raise ValueError(f"FX source quotes against {base}, expected {FX_PIVOT_CURRENCY}")
+    return save_rates(payload.get("rates", {}), source=FX_RATES_URL)
+
+
+def conversion_factors(base: str) -> dict:
+    """How many units of `base` one unit of each currency with a rate is worth."""
+    rates = get_rates()
+    factors = {base: 1.0}
+    if base in rates:
+        factors.update({code: rates[base] / rate for code, rate in rates.items() if code != base})
+    return factors
+
+
+def convert(amount: float, currency: Optional[str], base: str, factors: Optional[dict] = None) -> Optional[float]:
+    """Converts an amount to `base` in Python; None when its currency has no rate."""
+    factor = (factors or conversion_factors(base)).get(currency or DEFAULT_CURRENCY)
+    return None if factor is None else amount * factor
+
+
+def conversion_factor(currency, base: str):
+    """Aggregation expression for how many units of `base` one unit of `currency` is worth.
+
+    `currency` is a field path or expression. Currencies without a rate yield
+    null, so converted sums skip them instead of mixing currencies.
+    """
+    return {"$switch": {
+        "branches": [{"case": {"$eq": [currency, code]}, "then": factor} for code, factor in sorted(conversion_factors(base).items())],
+        "default": None,
+    }}
+
+
+def currency_of(field: str = "$currency") -> dict:
+    """A record's currency, treating records saved before currencies existed as DEFAULT_CURRENCY."""
+    return {"$ifNull": [field, DEFAULT_CURRENCY]}
@@ -0,0 +1,154 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import os
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import Header, HTTPException, status
+from pymongo.errors import DuplicateKeyError
+
+from app.config.write_config import writer
+from ..config import collection_name_idempotency_keys
+
+load_dotenv()
+
+# How long a concurrent duplicate waits for the first request to finish
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "5"))
+
+# A key still pending after this long belongs to a request that died; a retry takes it over
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+
+# Key claimed by the request running in this context, until its response is recorded
+_current_key = ContextVar("idempotency_key", default=None)
+
+
+def _fingerprint(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+async def claim_key(key_id: str, user_id: str, payload) -> Optional[dict]:
+    """Claims an idempotency key.
+
+    Returns None when this request owns the key, or the recorded response of
+    the first request when the key was already used with the same payload.
+    """
+    fingerprint = _fingerprint(payload)
+    try:
+        writer(collection_name_idempotency_keys, "primary").insert_one({
+            "_id": key_id,
+            "user": user_id,
+            "fingerprint": fingerprint,
+            "status": "pending",
+            "created_at": datetime.now(),
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+
+    # A duplicate: wait for the first request to record its response
+    deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        existing = collection_name_idempotency_keys.find_one({"_id": key_id})
+        if existing is None:
+            # The first request failed and released the key, so this one takes over
+            return await claim_key(key_id, user_id, payload)
+        if existing["fingerprint"] != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used with a different request body",
+            )
+        if existing["status"] == "completed":
+            return existing["response"]
+        if existing["created_at"] < datetime.now() - timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS):
+            # Only one of several concurrent retries wins the takeover
+            taken = writer(collection_name_idempotency_keys, "primary").update_one(
+                {"_id": key_id, "status": "pending", "created_at": existing["created_at"]},
+                {"$set": {"created_at": datetime.now()}},
+            )
+            if taken.modified_count:
+                return None
+            continue
+        if asyncio.get_running_loop().time() >= deadline:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress",
+                headers={"Retry-After": "1"},
+            )
+        await asyncio.sleep(0.1)
+
+
+def complete_key(key_id: str, response: dict):
+    writer(collection_name_idempotency_keys, "primary").update_one(
+        {"_id": key_id},
+        {"$set": {"status": "completed", "response": response, "completed_at": datetime.now()}},
+    )
+
+
+def record_response(response):
+    """Records the response of an idempotent request as soon as its main write has committed.
+
+    Endpoints call this right after that write, so a failure in the follow-up
+    work no longer releases the key and a retry gets this response back
+    instead of writing a second record.
+    """
+    key_id = _current_key.get()
+    if key_id is not None:
+        complete_key(key_id, response.model_dump(mode="json"))
+        _current_key.set(None)
+
+
+def release_key(key_id: str):
+    writer(collection_name_idempotency_keys, "primary").delete_one({"_id": key_id, "status": "pending"})
+
+
+def idempotent(scope: str, body_arg: str):
+    """Makes a create endpoint honour an optional `Idempotency-Key` header.
+
+    The first response for a (user, scope, key) is recorded; retries with the
+    same key and body get that response back without writing again. Endpoints
+    with work after their main write call `record_response` once it commits.
+    """
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, idempotency_key: Optional[str] = None, **kwargs):
+            if not idempotency_key:
+                return await endpoint(*args, **kwargs)
+
+            user_id = kwargs["user_id"]
+            key_id = f"{user_id}:{scope}:{idempotency_key}"
+            recorded = await claim_key(key_id, user_id, kwargs[body_arg].model_dump(mode="json"))
+            if recorded is not None:
+                return recorded
+
+            token = _current_key.set(key_id)
+            try:
+                response = await endpoint(*args, **kwargs)
+                if _current_key.get() is not None:
+                    complete_key(key_id, response.model_dump(mode="json"))
+            except Exception:
+                # Only removes a key still pending, i.e. one whose response was never recorded
+                release_key(key_id)
+                raise
+            finally:
+                _current_key.reset(token)
+            return response
+
+        # Expose the header to FastAPI alongside the endpoint's own parameters
+        signature = inspect.signature(endpoint)
+        header = inspect.Parameter(
+            "idempotency_key",
+            inspect.Parameter.KEYWORD_ONLY,
+            default=Header(None, alias="Idempotency-Key"),
+            annotation=Optional[str],
+        )
+        wrapper.__signature__ = signature.replace(parameters=[
+            *(p.replace(kind=inspect.Parameter.KEYWORD_ONLY) for p in signature.parameters.values()),
+            header,
+        ])
+        return wrapper
+    return decorator
@@ -0,0 +1,177 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+from app.config.database import init_collections
+from app.config.write_config import writer
+from app.routes.email_route import otp_cache, OTP_TTL_SECONDS
+from app.services.scheduler import register_job
+from app.services import cache
+from app.services.statements import FORMATS, month_key, generate_statement
+from app.services import export
+from app.services.account_deletion import process_pending_deletions
+from app.services.strategy_stats import refresh_strategy_stats
+from app.services import fx
+from ..config import (
+    collection_name_users,
+    collection_name_trades,
+    collection_name_journals,
+    collection_name_journals_archive,
+    collection_name_statements,
+)
+
+load_dotenv()
+
+# Journals older than this are moved to the archive collection (0 disables archiving)
+JOURNAL_ARCHIVE_AFTER_DAYS = int(os.getenv("JOURNAL_ARCHIVE_AFTER_DAYS", "0"))
+JOURNAL_ARCHIVE_BATCH_SIZE = int(os.getenv("JOURNAL_ARCHIVE_BATCH_SIZE", "500"))
+
+# Nightly columnar snapshot export for research (off by default)
+EXPORT_ENABLED = os.getenv("EXPORT_ENABLED", "false").lower() == "true"
+
+
+@register_job("purge_otp_cache", "*/5 * * * *", fleet_wide=False)
+def purge_otp_cache():
+    """Drops expired OTPs from this worker's in-memory cache."""
+    now = time.time()
+    expired = [email for email, entry in list(otp_cache.items()) if now - entry["timestamp"] > OTP_TTL_SECONDS]
+    for email in expired:
+        otp_cache.pop(email, None)
+    return {"purged": len(expired)}
+
+
+@register_job("purge_user_cache", "*/5 * * * *", fleet_wide=False)
+def purge_user_cache():
+    """Drops expired entries from this worker's per-user cache, which otherwise only expire when read again."""
+    return {"purged": cache.purge_expired()}
+
+
+@register_job("nightly_pnl_rollup", "5 0 * * *")
+def nightly_pnl_rollup():
+    """Rolls yesterday's trades up into one P&L document per user, day and currency.
+
+    Rollups stay in the trades' own currencies: the job runs across users with
+    different base currencies, and converting at read time uses current rates.
+    """
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    yesterday = today - timedelta(days=1)
+    collection_name_trades.aggregate([
+        {"$match": {"date": {"$gte": yesterday, "$lt": today}}},
+        {"$group": {
+            "_id": {"user": "$user", "day": yesterday, "currency": fx.currency_of()},
+            "net_pnl": {"$sum": "$profit_or_loss"},
+            "trade_count": {"$sum": 1},
+            "wins": {"$sum": {"$cond": [{"$gt": ["$profit_or_loss", 0]}, 1, 0]}},
+        }},
+        {"$project": {
+            "user": "$_id.user",
+            "day": "$_id.day",
+            "currency": "$_id.currency",
+            "net_pnl": 1,
+            "trade_count": 1,
+            "wins": 1,
+            "updated_at": "$$NOW",
+        }},
+        {"$merge": {"into": "pnl_rollups", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ])
+    return {"day": yesterday.date().isoformat()}
+
+
+@register_job("index_check", "0 3 * * *")
+def index_check():
+    """Re-applies collection options and indexes so a missing index is recreated."""
+    init_collections()
+
+
+@register_job("archive_old_journals", "30 2 * * *", lease_seconds=3600)
+def archive_old_journals():
+    """Moves journals older than the retention window into the archive collection in batches."""
+    if JOURNAL_ARCHIVE_AFTER_DAYS <= 0:
+        return {"archived": 0}
+
+    cutoff = datetime.now() - timedelta(days=JOURNAL_ARCHIVE_AFTER_DAYS)
+    archived = 0
+    while True:
+        batch = list(collection_name_journals.find({"date": {"$lt": cutoff}}).limit(JOURNAL_ARCHIVE_BATCH_SIZE))
+        if not batch:
+            break
+        ids = [journal["_id"] for journal in batch]
+
+        # Copy first so an interrupted run never loses a journal
+        for journal in batch:
+            writer(collection_name_journals_archive, "primary").replace_one({"_id": journal["_id"]}, journal, upsert=True)
+        writer(collection_name_journals, "primary").delete_many({"_id": {"$in": ids}})
+        writer(collection_name_users, "primary").update_many(
+            {"journals": {"$in": [str(i) for i in ids]}},
+            {"$pull": {"journals": {"$in": [str(i) for i in ids]}}},
+        )
+        archived += len(ids)
+    return {"archived": archived}
+
+
+@register_job("clear_expired_bans", "*/5 * * * *")
+def clear_expired_bans():
+    """Lifts bans whose ban_time has passed."""
+    result = writer(collection_name_users, "primary").update_many(
+        {"is_banned": True, "ban_time": {"$ne": None, "$lte": datetime.now()}},
+        {"$set": {"is_banned": False, "ban_time": None}},
+    )
+    return {"cleared": result.modified_count}
+
+
+@register_job("generate_monthly_statements", "0 4 1 * *", lease_seconds=3600)
+def generate_monthly_statements():
+    """Pre-renders last month's statements for every user who traded in it."""
+    first_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last_month_start = (first_of_month - timedelta(days=1)).replace(day=1)
+    month = month_key(last_month_start)
+
+    users = collection_name_trades.distinct("user", {"date": {"$gte": last_month_start, "$lt": first_of_month}})
+    for user_id in users:
+        for fmt in FORMATS:
+            generate_statement(user_id, month, fmt)
+    return {"month": month, "users": len(users)}
+
+
+@register_job("refresh_stale_statements", "*/30 * * * *", lease_seconds=1800)
+def refresh_stale_statements():
+    """Regenerates statements whose month had trades changed since they were rendered."""
+    refreshed = 0
+    for statement in collection_name_statements.find({"stale": True}, {"user": 1, "month": 1, "format": 1}):
+        generate_statement(statement["user"], statement["month"], statement["format"])
+        refreshed += 1
+    return {"refreshed": refreshed}
+
+
+@register_job("export_snapshots", "0 1 * * *", lease_seconds=3600)
+def export_snapshots():
+    """Appends newly inserted trades, holdings and journals to the Parquet/Arrow export."""
+    if not EXPORT_ENABLED:
+        return {"exported": 0}
+    return {"collections": export.export_all()}
+
+
+@register_job("process_account_deletions", "* * * * *", lease_seconds=300)
+def process_account_deletions():
+    """Continues queued account deletions in rate-limited batches."""
+    return process_pending_deletions()
+
+
+@register_job("refresh_strategy_stats", "*/10 * * * *", lease_seconds=900)
+def refresh_changed_strategy_stats():
+    """Recomputes the leaderboard stats of strategies whose trades changed since the last run."""
+    return refresh_strategy_stats()
+
+
+@register_job("fetch_fx_rates", "0 * * * *", lease_seconds=300)
+def fetch_fx_rates():
+    """Stores the latest FX rates from FX_RATES_URL, when one is configured."""
+    return {"rates": fx.fetch_rates()}
+
+
+@register_job("reload_fx_rates", "*/5 * * * *", fleet_wide=False)
+def reload_fx_rates():
+    """Refreshes this worker's in-memory FX table from fx_rates."""
+    return {"currencies": len(fx.load_rates())}
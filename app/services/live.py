@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime
+
+from dotenv import load_dotenv
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.config.database import client, db
+from app.config.read_config import reader
+from app.services.fx import DEFAULT_CURRENCY, conversion_factor, currency_of
+from ..config import collection_name_holdings, collection_name_trades
+
+load_dotenv()
+
+# Maximum concurrent live subscribers handled by one worker process
+LIVE_MAX_SUBSCRIBERS = int(os.getenv("LIVE_MAX_SUBSCRIBERS", "200"))
+
+# Window in which bursts of changes are merged into one push
+LIVE_COALESCE_MS = int(os.getenv("LIVE_COALESCE_MS", "250"))
+
+# Idle interval after which a keep-alive comment is sent
+LIVE_KEEPALIVE_SECONDS = int(os.getenv("LIVE_KEEPALIVE_SECONDS", "25"))
+
+# Upper bound on the backoff between change stream restarts after an error
+LIVE_RETRY_MAX_SECONDS = int(os.getenv("LIVE_RETRY_MAX_SECONDS", "60"))
+
+WATCHED_COLLECTIONS = ["trades", "holdings", "journals"]
+
+# user_id -> set of subscriber queues
+subscribers = {}
+
+# True when a change stream feeds the subscribers; handlers' notify() is then a no-op
+change_stream_active = False
+
+_loop = None
+_stop = threading.Event()
+# Set while this worker has subscribers, so the watcher knows to open its stream
+_wanted = threading.Event()
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+def subscriber_count() -> int:
+    return sum(len(queues) for queues in subscribers.values())
+
+
+def subscribe(user_id: str) -> asyncio.Queue:
+    """Registers a subscriber queue for a user, enforcing the per-worker cap."""
+    if subscriber_count() >= LIVE_MAX_SUBSCRIBERS:
+        raise TooManySubscribers()
+    queue = asyncio.Queue(maxsize=1000)
+    subscribers.setdefault(user_id, set()).add(queue)
+    _wanted.set()
+    return queue
+
+
+def unsubscribe(user_id: str, queue: asyncio.Queue):
+    queues = subscribers.get(user_id)
+    if queues:
+        queues.discard(queue)
+        if not queues:
+            subscribers.pop(user_id, None)
+    if not subscribers:
+        _wanted.clear()
+
+
+def _deliver(user_id: str, event: dict):
+    for queue in list(subscribers.get(user_id, ())):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The subscriber is behind; it will refetch totals on the next push anyway
+            pass
+
+
+def notify(user_id: str, collection: str, operation: str, doc_id: str):
+    """In-process fallback used by write handlers when no change stream is running."""
+    if change_stream_active or user_id not in subscribers:
+        return
+    _deliver(user_id, {"collection": collection, "operation": operation, "id": doc_id})
+
+
+def _watch():
+    """Blocking change stream loop, run in a daemon thread.
+
+    The stream is only open while this worker has subscribers. After an error
+    it is reopened from the last resume token, backing off exponentially.
+    """
+    pipeline = [
+        {"$match": {"$or": [
+            {"ns.coll": {"$in": WATCHED_COLLECTIONS}, "operationType": {"$in": ["insert", "update", "replace"]}},
+            # Deletes carry no user, so they are observed through their tombstones
+            {"ns.coll": "tombstones", "operationType": "insert"},
+        ]}},
+        # Only the fields an event is built from cross the wire, not whole documents
+        {"$project": {
+            "ns.coll": 1, "operationType": 1, "documentKey": 1,
+            "fullDocument.user": 1, "fullDocument.collection": 1, "fullDocument.doc_id": 1,
+        }},
+    ]
+    resume_token, failures = None, 0
+    while not _stop.is_set():
+        if not _wanted.wait(timeout=1):
+            continue
+        try:
+            with db.watch(pipeline, full_document="updateLookup", resume_after=resume_token) as stream:
+                while not _stop.is_set() and subscribers:
+                    change = stream.try_next()
+                    resume_token, failures = stream.resume_token, 0
+                    if change is None:
+                        continue
+                    document = change.get("fullDocument") or {}
+                    if change["ns"]["coll"] == "tombstones":
+                        event = {"collection": document.get("collection"), "operation": "delete", "id": document.get("doc_id")}
+                    else:
+                        event = {"collection": change["ns"]["coll"], "operation": change["operationType"], "id": str(change["documentKey"]["_id"])}
+                    user_id = document.get("user")
+                    if user_id and user_id in subscribers:
+                        _loop.call_soon_threadsafe(_deliver, user_id, event)
+            # Nobody left to deliver to; a later subscriber starts from the present
+            resume_token = None
+        except PyMongoError as e:
+            if isinstance(e, OperationFailure):
+                # The server rejected the stream, possibly because the token fell off the oplog
+                resume_token = None
+            delay = min(LIVE_RETRY_MAX_SECONDS, 2 ** failures)
+            failures += 1
+            print(f"Live change stream failed, restarting in {delay}s: {e}")
+            _stop.wait(delay)
+
+    global change_stream_active
+    change_stream_active = False
+
+
+def start_live():
+    """Starts the change stream watcher when the deployment supports it."""
+    global _loop, change_stream_active
+    _loop = asyncio.get_running_loop()
+    _stop.clear()
+
+    # Change streams need a replica set or sharded cluster
+    hello = client.admin.command("hello")
+    if "setName" not in hello and hello.get("msg") != "isdbgrid":
+        print("Live updates: standalone deployment, using in-process pub/sub")
+        return
+
+    change_stream_active = True
+    threading.Thread(target=_watch, name="live-change-stream", daemon=True).start()
+
+
+def stop_live():
+    _stop.set()
+
+
+def portfolio_totals(user_id: str, base: str = DEFAULT_CURRENCY) -> dict:
+    """Computes the headline totals pushed alongside each change batch, in the user's base currency.
+
+    Amounts are summed per currency first, so each currency is converted once
+    rather than once per holding or trade.
+    """
+    holdings = next(reader(collection_name_holdings, "analytics").aggregate([
+        {"$match": {"user": user_id}},
+        {"$group": {
+            "_id": currency_of(),
+            "total_investment": {"$sum": "$total_investment"},
+            "current_investment": {"$sum": "$current_investment"},
+        }},
+        {"$set": {"rate": conversion_factor("$_id", base)}},
+        {"$group": {
+            "_id": None,
+            "total_investment": {"$sum": {"$multiply": ["$total_investment", "$rate"]}},
+            "current_investment": {"$sum": {"$multiply": ["$current_investment", "$rate"]}},
+            "unconverted": {"$addToSet": {"$cond": [{"$eq": ["$rate", None]}, "$_id", "$$REMOVE"]}},
+        }},
+    ]), {})
+    trades = next(reader(collection_name_trades, "analytics").aggregate([
+        {"$match": {"user": user_id}},
+        {"$group": {"_id": currency_of(), "realized_pnl": {"$sum": "$profit_or_loss"}, "trade_count": {"$sum": 1}}},
+        {"$set": {"rate": conversion_factor("$_id", base)}},
+        {"$group": {
+            "_id": None,
+            "realized_pnl": {"$sum": {"$multiply": ["$realized_pnl", "$rate"]}},
+            "trade_count": {"$sum": "$trade_count"},
+            "unconverted": {"$addToSet": {"$cond": [{"$eq": ["$rate", None]}, "$_id", "$$REMOVE"]}},
+        }},
+    ]), {})
+    return {
+        "currency": base,
+        "total_investment": holdings.get("total_investment", 0.0),
+        "current_investment": holdings.get("current_investment", 0.0),
+        "unrealized_pnl": holdings.get("current_investment", 0.0) - holdings.get("total_investment", 0.0),
+        "realized_pnl": trades.get("realized_pnl", 0.0),
+        "trade_count": trades.get("trade_count", 0),
+        # Currencies with no rate to the base currency are left out of the sums
+        "unconverted_currencies": sorted(set(holdings.get("unconverted", [])) | set(trades.get("unconverted", []))),
+    }
+
+
+async def event_stream(request, user_id: str, queue: asyncio.Queue, base: str = DEFAULT_CURRENCY):
+    """Yields Server-Sent Events for a subscriber, merging bursts into one message."""
+    try:
+        while not await request.is_disconnected():
+            try:
+                first = await asyncio.wait_for(queue.get(), timeout=LIVE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            # Let the rest of a burst arrive, then drain it into one batch
+            await asyncio.sleep(LIVE_COALESCE_MS / 1000)
+            changes = [first]
+            while not queue.empty():
+                changes.append(queue.get_nowait())
+
+            totals = await asyncio.to_thread(portfolio_totals, user_id, base)
+            payload = {"changes": changes, "totals": totals, "sent_at": datetime.now()}
+            yield f"event: changes\ndata: {json.dumps(payload, default=str)}\n\n"
+    finally:
+        unsubscribe(user_id, queue)
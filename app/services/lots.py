@@ -0,0 +1,282 @@
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING, InsertOne, ReturnDocument
+
+from app.config.read_config import reader, write_session
+from app.config.write_config import writer
+from app.services.fx import currency_of
+from ..config import collection_name_lot_events, collection_name_lots, collection_name_pnl, collection_name_holdings, collection_name_trades
+
+load_dotenv()
+
+METHODS = ("FIFO", "LIFO", "AVERAGE")
+
+# Default lot-matching method, a user document may override it with `lot_method`
+DEFAULT_METHOD = os.getenv("LOT_MATCHING_METHOD", "FIFO").upper()
+
+
+def resolve_method(user_doc: Optional[dict]) -> str:
+    """Returns the lot-matching method for a user, falling back to the default."""
+    method = ((user_doc or {}).get("lot_method") or DEFAULT_METHOD).upper()
+    return method if method in METHODS else "FIFO"
+
+
+def _match(lots: List[dict], quantity: int, price: float, method: str, open_quantity: int, cost_basis: float) -> Tuple[List[Tuple[dict, int]], int, float, float]:
+    """Matches a sell against open lots.
+
+    Returns the (lot, quantity taken) pairs, the matched quantity, the cost
+    removed from the position and the realized P&L.
+    """
+    ordered = sorted(lots, key=lambda lot: (lot["date"], lot["_id"]), reverse=(method == "LIFO"))
+
+    taken = []
+    remaining = quantity
+    for lot in ordered:
+        if remaining <= 0:
+            break
+        take = min(lot["remaining"], remaining)
+        if take > 0:
+            taken.append((lot, take))
+            remaining -= take
+
+    matched = quantity - remaining
+    if method == "AVERAGE":
+        average_cost = cost_basis / open_quantity if open_quantity else 0.0
+        cost_removed = matched * average_cost
+    else:
+        cost_removed = sum(take * lot["price"] for lot, take in taken)
+
+    return taken, matched, cost_removed, matched * price - cost_removed
+
+
+def position_currencies(user_id: str, session=None) -> dict:
+    """Currency of each of the user's positions: that of its holdings, else of its trades.
+
+    The ledger stores bare amounts, so a position is in the currency of the
+    records that fed it; an asset is assumed to trade in one currency.
+    """
+    currencies = {}
+    for collection in (collection_name_trades, collection_name_holdings):
+        for row in reader(collection, "analytics").aggregate([
+            {"$match": {"user": user_id}},
+            {"$group": {"_id": "$asset_name", "currency": {"$last": currency_of()}}},
+        ], session=session):
+            currencies[row["_id"]] = row["currency"]
+    return currencies
+
+
+def _update_position(user_id: str, asset_name: str, quantity: int, cost: float, realized: float = 0.0, unmatched: int = 0, last_price: Optional[float] = None, session=None):
+    """Applies deltas to the per-asset P&L document and recomputes unrealized P&L server-side."""
+    price_expr = last_price if last_price is not None else {"$ifNull": ["$last_price", 0.0]}
+    writer(collection_name_pnl, "derived").update_one(
+        {"user": user_id, "asset_name": asset_name},
+        [
+            {"$set": {
+                "open_quantity": {"$add": [{"$ifNull": ["$open_quantity", 0]}, quantity]},
+                "cost_basis": {"$add": [{"$ifNull": ["$cost_basis", 0.0]}, cost]},
+                "realized_pnl": {"$add": [{"$ifNull": ["$realized_pnl", 0.0]}, realized]},
+                "unmatched_quantity": {"$add": [{"$ifNull": ["$unmatched_quantity", 0]}, unmatched]},
+                "last_price": price_expr,
+                "updated_at": datetime.now(),
+            }},
+            {"$set": {
+                "unrealized_pnl": {"$subtract": [{"$multiply": ["$open_quantity", "$last_price"]}, "$cost_basis"]},
+            }},
+        ],
+        upsert=True,
+        session=session,
+    )
+
+
+def _apply_buy(user_id: str, event: dict, session=None):
+    writer(collection_name_lots, "derived").insert_one({
+        "user": user_id,
+        "asset_name": event["asset_name"],
+        "quantity": event["quantity"],
+        "remaining": event["quantity"],
+        "price": event["price"],
+        "date": event["date"],
+        "source_id": event["source_id"],
+    }, session=session)
+    _update_position(
+        user_id, event["asset_name"], event["quantity"], event["quantity"] * event["price"],
+        last_price={"$ifNull": ["$last_price", event["price"]]}, session=session,
+    )
+
+
+def _claim(user_id: str, asset_name: str, quantity: int, method: str, session=None) -> List[Tuple[dict, int]]:
+    """Takes up to `quantity` from the open lots in matching order, one atomic update per lot.
+
+    Each update lowers `remaining` on the server and returns the lot as it was
+    before, so concurrent sells always take disjoint quantities.
+    """
+    direction = -1 if method == "LIFO" else ASCENDING
+    taken = []
+    wanted = quantity
+    while wanted > 0:
+        lot = writer(collection_name_lots, "derived").find_one_and_update(
+            {"user": user_id, "asset_name": asset_name, "remaining": {"$gt": 0}},
+            [{"$set": {"remaining": {"$max": [0, {"$subtract": ["$remaining", wanted]}]}}}],
+            sort=[("date", direction), ("_id", direction)],
+            return_document=ReturnDocument.BEFORE,
+            session=session,
+        )
+        if lot is None:
+            break
+        take = min(lot["remaining"], wanted)
+        taken.append((lot, take))
+        wanted -= take
+    return taken
+
+
+def _apply_sell(user_id: str, event: dict, method: str, session=None):
+    asset_name = event["asset_name"]
+    taken = _claim(user_id, asset_name, event["quantity"], method, session)
+    matched = sum(take for _, take in taken)
+
+    if method == "AVERAGE":
+        position = collection_name_pnl.find_one({"user": user_id, "asset_name": asset_name}, {"open_quantity": 1, "cost_basis": 1}, session=session) or {}
+        open_quantity = position.get("open_quantity", 0)
+        cost_removed = matched * (position.get("cost_basis", 0.0) / open_quantity if open_quantity else 0.0)
+    else:
+        cost_removed = sum(take * lot["price"] for lot, take in taken)
+    realized = matched * event["price"] - cost_removed
+
+    # Fully consumed lots are removed to keep the open-lot set small
+    if taken:
+        writer(collection_name_lots, "derived").delete_many({"_id": {"$in": [lot["_id"] for lot, _ in taken]}, "remaining": {"$lte": 0}}, session=session)
+
+    _update_position(
+        user_id, asset_name, -matched, -cost_removed, realized,
+        unmatched=event["quantity"] - matched, last_price=event["price"], session=session,
+    )
+
+
+def _record(user_id: str, side: str, asset_name: str, quantity: int, price: float, date: datetime, source_id: str, session=None, **extra) -> dict:
+    event = {
+        "user": user_id,
+        "side": side,
+        "asset_name": asset_name,
+        "quantity": quantity,
+        "price": price,
+        "date": date,
+        "source_id": source_id,
+        "created_at": datetime.now(),
+        **extra,
+    }
+    writer(collection_name_lot_events, "derived").insert_one(event, session=session)
+    return event
+
+
+def record_buy(user_id: str, asset_name: str, quantity: int, price: float, date: datetime, source_id: str):
+    """Opens a new lot and updates the position incrementally."""
+    if quantity <= 0:
+        return
+    with write_session(user_id) as session:
+        _apply_buy(user_id, _record(user_id, "buy", asset_name, quantity, price, date, source_id, session), session)
+
+
+def record_sell(user_id: str, asset_name: str, quantity: int, price: float, date: datetime, source_id: str, method: str = DEFAULT_METHOD):
+    """Matches a sell against open lots and books the realized P&L incrementally."""
+    if quantity <= 0:
+        return
+    with write_session(user_id) as session:
+        _apply_sell(user_id, _record(user_id, "sell", asset_name, quantity, price, date, source_id, session), method, session)
+
+
+def record_round_trip(user_id: str, asset_name: str, quantity: int, enter_price: float, exit_price: float, date: datetime, source_id: str):
+    """Books a closed trade, which is matched against its own entry and never touches open lots."""
+    with write_session(user_id) as session:
+        _record(user_id, "round_trip", asset_name, quantity, enter_price, date, source_id, session, exit_price=exit_price)
+        _update_position(user_id, asset_name, 0, 0.0, realized=quantity * (exit_price - enter_price), session=session)
+
+
+def mark_price(user_id: str, asset_name: str, price: float):
+    """Revalues the open quantity of a position at a new market price."""
+    with write_session(user_id) as session:
+        _update_position(user_id, asset_name, 0, 0.0, last_price=price, session=session)
+
+
+def rebuild(user_id: str, asset_name: str, method: str = DEFAULT_METHOD, session=None):
+    """Replays the ledger of a single (user, asset) after a past entry was edited or removed."""
+    events = list(collection_name_lot_events.find({"user": user_id, "asset_name": asset_name}, session=session).sort([("date", ASCENDING), ("_id", ASCENDING)]))
+    position = collection_name_pnl.find_one({"user": user_id, "asset_name": asset_name}, session=session) or {}
+
+    lots = []
+    open_quantity, cost_basis, realized, unmatched = 0, 0.0, 0.0, 0
+
+    # The stored mark is the current market price; ledger prices only stand in when there is none
+    marked_price = position.get("last_price")
+    last_price = None
+    for event in events:
+        if event["side"] == "buy":
+            lots.append({
+                "_id": event["_id"],
+                "user": user_id,
+                "asset_name": asset_name,
+                "quantity": event["quantity"],
+                "remaining": event["quantity"],
+                "price": event["price"],
+                "date": event["date"],
+                "source_id": event["source_id"],
+            })
+            open_quantity += event["quantity"]
+            cost_basis += event["quantity"] * event["price"]
+            last_price = event["price"]
+        elif event["side"] == "round_trip":
+            realized += event["quantity"] * (event["exit_price"] - event["price"])
+        else:
+            taken, matched, cost_removed, pnl = _match(lots, event["quantity"], event["price"], method, open_quantity, cost_basis)
+            for lot, take in taken:
+                lot["remaining"] -= take
+            lots = [lot for lot in lots if lot["remaining"] > 0]
+            open_quantity -= matched
+            cost_basis -= cost_removed
+            realized += pnl
+            unmatched += event["quantity"] - matched
+            last_price = event["price"]
+
+    writer(collection_name_lots, "derived").delete_many({"user": user_id, "asset_name": asset_name}, session=session)
+    if lots:
+        writer(collection_name_lots, "derived").bulk_write([InsertOne(lot) for lot in lots], ordered=False, session=session)
+
+    if not events:
+        writer(collection_name_pnl, "derived").delete_one({"user": user_id, "asset_name": asset_name}, session=session)
+        return
+
+    last_price = marked_price if marked_price is not None else (last_price or 0.0)
+    writer(collection_name_pnl, "derived").update_one(
+        {"user": user_id, "asset_name": asset_name},
+        {"$set": {
+            "open_quantity": open_quantity,
+            "cost_basis": cost_basis,
+            "realized_pnl": realized,
+            "unmatched_quantity": unmatched,
+            "last_price": last_price,
+            "unrealized_pnl": open_quantity * last_price - cost_basis,
+            "updated_at": datetime.now(),
+        }},
+        upsert=True,
+        session=session,
+    )
+
+
+def remove_source(user_id: str, source_id: str, method: str = DEFAULT_METHOD):
+    """Drops the ledger entries written for a trade or holding and rebuilds the affected assets."""
+    with write_session(user_id) as session:
+        assets = collection_name_lot_events.distinct("asset_name", {"user": user_id, "source_id": source_id}, session=session)
+        writer(collection_name_lot_events, "derived").delete_many({"user": user_id, "source_id": source_id}, session=session)
+        for asset_name in assets:
+            rebuild(user_id, asset_name, method, session)
+
+
+def reprice_source(user_id: str, source_id: str, price: float, method: str = DEFAULT_METHOD):
+    """Changes the cost of the buy lots opened by a holding and rebuilds the affected assets."""
+    with write_session(user_id) as session:
+        assets = collection_name_lot_events.distinct("asset_name", {"user": user_id, "source_id": source_id, "side": "buy"}, session=session)
+        writer(collection_name_lot_events, "derived").update_many({"user": user_id, "source_id": source_id, "side": "buy"}, {"$set": {"price": price}}, session=session)
+        for asset_name in assets:
+            rebuild(user_id, asset_name, method, session)
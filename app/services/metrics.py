@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import defaultdict
+
+from pymongo import monitoring
+
+_lock = threading.Lock()
+
+# (name, labels) -> running totals
+_counters = defaultdict(float)
+_timings = defaultdict(lambda: {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+_gauges = {}
+
+
+def _key(name: str, labels: dict):
+    return name, tuple(sorted((labels or {}).items()))
+
+
+def increment(name: str, labels: dict = None, value: float = 1):
+    """Adds to a counter."""
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def set_gauge(name: str, value: float, labels: dict = None):
+    """Sets a gauge to its current value."""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, seconds: float, labels: dict = None):
+    """Records one timing sample."""
+    with _lock:
+        timing = _timings[_key(name, labels)]
+        timing["count"] += 1
+        timing["total_seconds"] += seconds
+        timing["max_seconds"] = max(timing["max_seconds"], seconds)
+
+
+def snapshot() -> dict:
+    """Returns all counters and timings in a JSON friendly shape."""
+    with _lock:
+        return {
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in _counters.items()
+            ],
+            "gauges": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in _gauges.items()
+            ],
+            "timings": [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    **timing,
+                    "avg_seconds": timing["total_seconds"] / timing["count"] if timing["count"] else 0.0,
+                }
+                for (name, labels), timing in _timings.items()
+            ],
+        }
+
+
+WRITE_COMMANDS = {"insert", "update", "delete", "findAndModify"}
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times MongoDB write commands per write concern so durability tiers can be compared."""
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        if event.command_name in WRITE_COMMANDS:
+            write_concern = event.command.get("writeConcern") or {}
+            labels = {
+                "command": event.command_name,
+                "w": str(write_concern.get("w", "default")),
+                "j": str(write_concern.get("j", "default")),
+            }
+            self._pending[(event.connection_id, event.request_id)] = (labels, time.perf_counter())
+
+    def _finish(self, event, outcome: str):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending:
+            labels, started = pending
+            observe("mongo_write_seconds", time.perf_counter() - started, labels)
+            increment("mongo_writes_total", {**labels, "outcome": outcome})
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from pymongo.errors import PyMongoError
+
+from app.config.read_config import reader
+from app.config.write_config import writer
+from ..config import collection_name_price_history, collection_name_holdings, collection_name_lot_events
+
+# Supported chart granularities -> ($dateTrunc unit, default look-back window)
+GRANULARITIES = {
+    "1m": ("minute", timedelta(days=1)),
+    "1h": ("hour", timedelta(days=30)),
+    "1d": ("day", timedelta(days=365)),
+}
+
+BUCKET_SECONDS = {"1m": 60, "1h": 3600, "1d": 86400}
+
+# Upper bound on buckets per query so a chart request can't scan years of minute ticks
+MAX_BUCKETS = 2000
+
+
+def record_price(asset_name: str, price: float, timestamp: Optional[datetime] = None):
+    """Appends a price tick for an asset to the time-series collection.
+
+    Ticks only feed charts, so a failed insert is logged rather than failing
+    the write that produced it.
+    """
+    try:
+        writer(collection_name_price_history, "derived").insert_one({
+            "asset_name": asset_name,
+            "price": price,
+            "timestamp": timestamp or datetime.now(),
+        })
+    except PyMongoError as e:
+        print(f"Failed to record price tick for {asset_name}: {e}")
+
+
+def resolve_range(granularity: str, start: Optional[datetime], end: Optional[datetime]):
+    """Fills in the default window for a granularity and validates the bucket count."""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unsupported granularity '{granularity}', use one of {', '.join(GRANULARITIES)}")
+
+    end = end or datetime.now()
+    start = start or end - GRANULARITIES[granularity][1]
+    if start >= end:
+        raise ValueError("start must be before end")
+
+    if (end - start).total_seconds() / BUCKET_SECONDS[granularity] > MAX_BUCKETS:
+        raise ValueError(f"Range too large for granularity '{granularity}' (max {MAX_BUCKETS} buckets)")
+
+    return start, end
+
+
+def price_buckets(asset_name: str, granularity: str, start: datetime, end: datetime) -> List[dict]:
+    """Returns OHLC buckets for one asset; `close` is the last value in each bucket."""
+    unit = GRANULARITIES[granularity][0]
+    pipeline = [
+        {"$match": {"asset_name": asset_name, "timestamp": {"$gte": start, "$lt": end}}},
+        {"$sort": {"timestamp": 1}},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$timestamp", "unit": unit}},
+            "open": {"$first": "$price"},
+            "high": {"$max": "$price"},
+            "low": {"$min": "$price"},
+            "close": {"$last": "$price"},
+            "ticks": {"$sum": 1},
+        }},
+        {"$sort": {"_id": 1}},
+        {"$project": {"_id": 0, "bucket": "$_id", "open": 1, "high": 1, "low": 1, "close": 1, "ticks": 1}},
+    ]
+    return list(reader(collection_name_price_history, "analytics").aggregate(pipeline))
+
+
+def _quantity_changes(user_id: str) -> dict:
+    """Dated open-quantity changes per asset from the lot ledger: asset -> [(date, delta), ...]."""
+    changes = {}
+    for event in reader(collection_name_lot_events, "analytics").find(
+        {"user": user_id, "side": {"$in": ["buy", "sell"]}},
+        {"asset_name": 1, "side": 1, "quantity": 1, "date": 1},
+    ).sort([("date", 1), ("_id", 1)]):
+        delta = event["quantity"] if event["side"] == "buy" else -event["quantity"]
+        changes.setdefault(event["asset_name"], []).append((event["date"], delta))
+    return changes
+
+
+def portfolio_value_series(user_id: str, granularity: str, start: datetime, end: datetime) -> List[dict]:
+    """Returns the user's portfolio value (quantity held then x last price) per bucket.
+
+    Quantities are replayed from the lot ledger so each bucket values what was
+    held at that time. Each asset opens at its current quantity less every
+    ledger change, so holdings that predate the ledger keep that part of their
+    quantity throughout. Each asset starts from its last price before `start`.
+    """
+    changes = _quantity_changes(user_id)
+    current = {
+        row["_id"]: row["quantity"]
+        for row in reader(collection_name_holdings, "analytics").aggregate([
+            {"$match": {"user": user_id}},
+            {"$group": {"_id": "$asset_name", "quantity": {"$sum": "$quantity"}}},
+        ])
+    }
+    assets = set(changes) | set(current)
+    if not assets:
+        return []
+
+    unit = GRANULARITIES[granularity][0]
+    rows = reader(collection_name_price_history, "analytics").aggregate([
+        {"$match": {"asset_name": {"$in": list(assets)}, "timestamp": {"$gte": start, "$lt": end}}},
+        {"$sort": {"timestamp": 1}},
+        {"$group": {
+            "_id": {
+                "asset_name": "$asset_name",
+                "bucket": {"$dateTrunc": {"date": "$timestamp", "unit": unit}},
+            },
+            "price": {"$last": "$price"},
+        }},
+        {"$sort": {"_id.bucket": 1}},
+    ])
+
+    # Group last prices by bucket, then carry each asset's price forward
+    # so buckets without a tick for an asset still value that asset.
+    buckets = {}
+    for row in rows:
+        buckets.setdefault(row["_id"]["bucket"], {})[row["_id"]["asset_name"]] = row["price"]
+
+    # Last price of every asset before the range in one query: sorting on
+    # (asset, time desc) and taking $first is served by the {asset_name, timestamp} index
+    last_prices = {
+        row["_id"]: row["price"]
+        for row in reader(collection_name_price_history, "analytics").aggregate([
+            {"$match": {"asset_name": {"$in": list(assets)}, "timestamp": {"$lt": start}}},
+            {"$sort": {"asset_name": 1, "timestamp": -1}},
+            {"$group": {"_id": "$asset_name", "price": {"$first": "$price"}}},
+        ])
+    }
+
+    quantities = {
+        asset_name: max(0, current.get(asset_name, 0) - sum(delta for _, delta in changes.get(asset_name, [])))
+        for asset_name in assets
+    }
+    positions = {asset_name: 0 for asset_name in changes}
+    width = timedelta(seconds=BUCKET_SECONDS[granularity])
+
+    series = []
+    for bucket in sorted(buckets):
+        last_prices.update(buckets[bucket])
+        # Apply the ledger up to the end of the bucket
+        for asset_name, dated in changes.items():
+            while positions[asset_name] < len(dated) and dated[positions[asset_name]][0] < bucket + width:
+                quantities[asset_name] = max(0, quantities[asset_name] + dated[positions[asset_name]][1])
+                positions[asset_name] += 1
+        value = sum(quantities[asset] * price for asset, price in last_prices.items())
+        series.append({"bucket": bucket, "value": value, "priced_assets": len(last_prices)})
+
+    return series
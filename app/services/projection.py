@@ -0,0 +1,29 @@
+from typing import Iterable, Optional
+
+
+def _split(value: Optional[str]) -> list:
+    return [field.strip() for field in (value or "").split(",") if field.strip()]
+
+
+def build_projection(fields: Optional[str], exclude: Optional[str], allowed: Iterable[str]) -> Optional[dict]:
+    """Turns comma separated `fields`/`exclude` query values into a MongoDB projection.
+
+    Returns None when the full document was requested and raises ValueError
+    for field names outside the allow-list.
+    """
+    allowed = set(allowed)
+    include_fields = _split(fields)
+    exclude_fields = _split(exclude)
+
+    unknown = sorted(set(include_fields + exclude_fields) - allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    if include_fields:
+        projection = {field: 1 for field in include_fields if field not in exclude_fields}
+        if not projection:
+            raise ValueError("No fields left to return")
+        return projection
+    if exclude_fields:
+        return {field: 0 for field in exclude_fields}
+    return None
@@ -0,0 +1,79 @@
+import math
+import os
+import time
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+
+from app.services.metrics import increment
+
+load_dotenv()
+
+# Buckets idle long enough to be full again are dropped past this many keys
+MAX_TRACKED_KEYS = 10000
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets refilled at `rate_per_minute` up to `burst` tokens."""
+
+    def __init__(self, name: str, rate_per_minute: float, burst: int):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.buckets = {}
+
+    def _prune(self, now: float):
+        full_after = self.burst / self.rate if self.rate else math.inf
+        for key, (_, updated) in list(self.buckets.items()):
+            if now - updated >= full_after:
+                del self.buckets[key]
+
+    def check(self, key: str) -> float:
+        """Takes a token for the key; returns 0 when allowed, else seconds until the next token."""
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self.buckets[key] = (tokens - 1, now)
+            if len(self.buckets) > MAX_TRACKED_KEYS:
+                self._prune(now)
+            return 0.0
+        self.buckets[key] = (tokens, now)
+        return (1 - tokens) / self.rate if self.rate else math.inf
+
+    def enforce(self, *keys: str):
+        """Raises 429 with Retry-After when any of the keys is out of tokens."""
+        wait = max((self.check(key) for key in keys if key), default=0.0)
+        if wait > 0:
+            increment("rate_limit_rejections_total", {"limiter": self.name})
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please retry later",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+
+login_limiter = TokenBucketLimiter(
+    "login",
+    float(os.getenv("LOGIN_RATE_PER_MINUTE", "5")),
+    int(os.getenv("LOGIN_BURST", "5")),
+)
+login_ip_limiter = TokenBucketLimiter(
+    "login_ip",
+    float(os.getenv("LOGIN_IP_RATE_PER_MINUTE", "30")),
+    int(os.getenv("LOGIN_IP_BURST", "30")),
+)
+email_limiter = TokenBucketLimiter(
+    "send_email",
+    float(os.getenv("EMAIL_RATE_PER_MINUTE", "2")),
+    int(os.getenv("EMAIL_BURST", "3")),
+)
+email_ip_limiter = TokenBucketLimiter(
+    "send_email_ip",
+    float(os.getenv("EMAIL_IP_RATE_PER_MINUTE", "10")),
+    int(os.getenv("EMAIL_IP_BURST", "10")),
+)
+
+
+def client_ip(request) -> str:
+    return request.client.host if request.client else ""
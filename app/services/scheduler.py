@@ -0,0 +1,191 @@
+import asyncio
+import os
+import socket
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.config.write_config import writer
+from app.services.metrics import increment, observe
+from ..config import collection_name_job_locks, collection_name_job_runs
+
+load_dotenv()
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+
+# Identifies this worker as a lease owner
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+CRON_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+
+def _parse_field(field: str, low: int, high: int) -> set:
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/")
+            step = int(step)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(v) for v in part.split("-"))
+        else:
+            start = end = int(part)
+            if step != 1:
+                end = high
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Invalid cron field '{field}'")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """Five-field cron expression: minute hour day-of-month month day-of-week (0 = Sunday)."""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression '{expression}' must have 5 fields")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_field(field, low, high) for field, (low, high) in zip(fields, CRON_RANGES)
+        )
+        # Like cron, a restricted day-of-month and day-of-week match when either does
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Returns the first matching minute strictly after `moment`."""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression '{self.expression}' never matches")
+
+
+class Job:
+    def __init__(self, name: str, schedule: str, func: Callable, lease_seconds: int, fleet_wide: bool):
+        self.name = name
+        self.schedule = CronSchedule(schedule)
+        self.func = func
+        self.lease_seconds = lease_seconds
+        self.fleet_wide = fleet_wide
+        self.next_run = self.schedule.next_after(datetime.now())
+
+
+jobs: List[Job] = []
+
+
+def register_job(name: str, schedule: str, lease_seconds: int = 600, fleet_wide: bool = True):
+    """Registers a function to run on a cron schedule.
+
+    Fleet-wide jobs run on one worker at a time through a lease on a lock
+    document; local jobs (e.g. in-process cache cleanup) run on every worker.
+    """
+    def decorator(func: Callable):
+        jobs.append(Job(name, schedule, func, lease_seconds, fleet_wide))
+        return func
+    return decorator
+
+
+def acquire_lease(name: str, lease_seconds: int, slot: datetime) -> bool:
+    """Takes or renews the job's lease for a scheduled slot.
+
+    False when another worker holds the lease, or when some worker already
+    took this slot: the lock remembers the last slot it was taken for, so a
+    worker whose scheduler wakes up after the previous run released the lease
+    does not run the same slot again.
+    """
+    now = datetime.now()
+    try:
+        lock = writer(collection_name_job_locks, "primary").find_one_and_update(
+            {"_id": name, "slot": {"$not": {"$gte": slot}}, "$or": [{"lease_until": {"$lte": now}}, {"owner": WORKER_ID}]},
+            {"$set": {"owner": WORKER_ID, "slot": slot, "lease_until": now + timedelta(seconds=lease_seconds), "acquired_at": now}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # The lock document exists and its lease or slot is taken
+        return False
+    return lock is not None and lock["owner"] == WORKER_ID
+
+
+def release_lease(name: str):
+    writer(collection_name_job_locks, "primary").update_one(
+        {"_id": name, "owner": WORKER_ID},
+        {"$set": {"lease_until": datetime.now()}},
+    )
+
+
+def run_job(job: Job, slot: datetime) -> bool:
+    """Runs a job for its scheduled slot (if this worker may) and records its duration and outcome."""
+    if job.fleet_wide and not acquire_lease(job.name, job.lease_seconds, slot):
+        return False
+
+    started_at = datetime.now()
+    started = time.perf_counter()
+    outcome, error, result = "ok", None, None
+    try:
+        result = job.func()
+    except Exception as e:
+        outcome, error = "error", f"{e}\n{traceback.format_exc()}"
+        print(f"Job {job.name} failed: {e}")
+    finally:
+        if job.fleet_wide:
+            release_lease(job.name)
+
+    duration = time.perf_counter() - started
+    observe("job_duration_seconds", duration, {"job": job.name})
+    increment("job_runs_total", {"job": job.name, "outcome": outcome})
+    writer(collection_name_job_runs, "audit").insert_one({
+        "job": job.name,
+        "owner": WORKER_ID,
+        "slot": slot,
+        "started_at": started_at,
+        "finished_at": datetime.now(),
+        "duration_seconds": duration,
+        "outcome": outcome,
+        "error": error,
+        "result": result,
+    })
+    return True
+
+
+async def run_scheduler():
+    """Sleeps until the next due job, runs every due job in a worker thread, repeats."""
+    while True:
+        now = datetime.now()
+        due = [(job, job.next_run) for job in jobs if job.next_run <= now]
+        for job, _ in due:
+            job.next_run = job.schedule.next_after(now)
+        if due:
+            results = await asyncio.gather(*(asyncio.to_thread(run_job, job, slot) for job, slot in due), return_exceptions=True)
+            for (job, _), result in zip(due, results):
+                if isinstance(result, Exception):
+                    print(f"Job {job.name} could not run: {result}")
+
+        next_run = min((job.next_run for job in jobs), default=now + timedelta(minutes=1))
+        await asyncio.sleep(max(1.0, min(60.0, (next_run - datetime.now()).total_seconds())))
@@ -0,0 +1,154 @@
+import csv
+import gzip
+import hashlib
+import io
+from datetime import datetime
+
+from bson import Binary, ObjectId
+from jinja2 import Environment
+
+from app.config.templates import STATEMENT_HTML_TEMPLATE
+from app.config.write_config import writer
+from app.services.fx import DEFAULT_CURRENCY, base_currency, conversion_factor, conversion_factors, convert, currency_of
+from ..config import collection_name_users, collection_name_trades, collection_name_holdings, collection_name_statements
+
+FORMATS = {"html": "text/html; charset=utf-8", "csv": "text/csv; charset=utf-8"}
+
+_html_template = Environment(autoescape=True).from_string(STATEMENT_HTML_TEMPLATE)
+
+
+def month_bounds(month: str):
+    """Parses 'YYYY-MM' into the [start, end) datetimes of that month."""
+    start = datetime.strptime(month, "%Y-%m")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+def month_key(date: datetime) -> str:
+    return date.strftime("%Y-%m")
+
+
+def mark_stale(user_id: str, *dates: datetime):
+    """Flags the user's statements for the months of the given trade dates for regeneration."""
+    months = {month_key(date) for date in dates if date}
+    if months:
+        writer(collection_name_statements, "derived").update_many(
+            {"user": user_id, "month": {"$in": list(months)}},
+            {"$set": {"stale": True}},
+        )
+
+
+def _statement_data(user_id: str, month: str) -> dict:
+    start, end = month_bounds(month)
+    match = {"user": user_id, "date": {"$gte": start, "$lt": end}}
+
+    user = collection_name_users.find_one({"_id": ObjectId(user_id)}, {"name": 1, "base_currency": 1}) or {}
+    base = base_currency(user)
+
+    trades = list(collection_name_trades.find(match, {"strategy_description": 0}).sort("date", 1))
+    # Strategy P&L is summed per currency and converted to the base currency once per group
+    strategies = list(collection_name_trades.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {"strategy": "$strategy_name", "currency": currency_of()},
+            "trade_count": {"$sum": 1},
+            "wins": {"$sum": {"$cond": [{"$gt": ["$profit_or_loss", 0]}, 1, 0]}},
+            "net_pnl": {"$sum": "$profit_or_loss"},
+        }},
+        {"$set": {"rate": conversion_factor("$_id.currency", base)}},
+        {"$group": {
+            "_id": "$_id.strategy",
+            "trade_count": {"$sum": "$trade_count"},
+            "wins": {"$sum": "$wins"},
+            "net_pnl": {"$sum": {"$multiply": ["$net_pnl", "$rate"]}},
+        }},
+        {"$project": {"_id": 0, "strategy_name": "$_id", "trade_count": 1, "wins": 1, "net_pnl": 1}},
+        {"$sort": {"net_pnl": -1}},
+    ]))
+    # Holdings are listed, not totalled, so they stay in their own currency
+    holdings = list(collection_name_holdings.aggregate([
+        {"$match": {"user": user_id}},
+        {"$group": {
+            "_id": {"asset_name": "$asset_name", "currency": currency_of()},
+            "quantity": {"$sum": "$quantity"},
+            "total_investment": {"$sum": "$total_investment"},
+            "current_investment": {"$sum": "$current_investment"},
+        }},
+        {"$project": {
+            "_id": 0,
+            "asset_name": "$_id.asset_name",
+            "currency": "$_id.currency",
+            "quantity": 1,
+            "total_investment": 1,
+            "current_investment": 1,
+            "avg_bought_price": {"$cond": [{"$gt": ["$quantity", 0]}, {"$divide": ["$total_investment", "$quantity"]}, 0]},
+        }},
+        {"$sort": {"asset_name": 1, "currency": 1}},
+    ]))
+
+    trade_count = len(trades)
+    wins = sum(1 for trade in trades if trade.get("profit_or_loss", 0) > 0)
+    factors = conversion_factors(base)
+    converted = [convert(trade.get("profit_or_loss", 0.0), trade.get("currency"), base, factors) for trade in trades]
+
+    return {
+        "name": user.get("name", ""),
+        "month": month,
+        "generated_at": datetime.now(),
+        "currency": base,
+        "summary": {
+            "trade_count": trade_count,
+            # Trades in a currency without a rate are left out of the totals and counted here
+            "net_pnl": sum(amount for amount in converted if amount is not None),
+            "unconverted_trades": converted.count(None),
+            "win_ratio": wins / trade_count if trade_count else 0.0,
+        },
+        "strategies": strategies,
+        "trades": trades,
+        "holdings": holdings,
+    }
+
+
+def _render_csv(data: dict) -> str:
+    output = io.StringIO()
+    out = csv.writer(output)
+    out.writerow(["section", "date", "asset_name", "trade_category", "quantity", "enter_price", "exit_price", "profit_or_loss", "strategy_name", "currency"])
+    for trade in data["trades"]:
+        out.writerow([
+            "trade", trade["date"].isoformat(), trade["asset_name"], trade.get("trade_category"), trade["quantity"],
+            trade["enter_price"], trade["exit_price"], trade.get("profit_or_loss"), trade.get("strategy_name"),
+            trade.get("currency") or DEFAULT_CURRENCY,
+        ])
+    for row in data["strategies"]:
+        out.writerow(["strategy", data["month"], "", "", row["trade_count"], "", "", row["net_pnl"], row["strategy_name"], data["currency"]])
+    out.writerow(["total", data["month"], "", "", data["summary"]["trade_count"], "", "", data["summary"]["net_pnl"], "", data["currency"]])
+    return output.getvalue()
+
+
+def generate_statement(user_id: str, month: str, fmt: str) -> dict:
+    """Renders a statement, stores it gzip-compressed and returns the stored document."""
+    data = _statement_data(user_id, month)
+    body = _html_template.render(**data, default_currency=DEFAULT_CURRENCY) if fmt == "html" else _render_csv(data)
+    raw = body.encode("utf-8")
+
+    statement = {
+        "_id": f"{user_id}:{month}:{fmt}",
+        "user": user_id,
+        "month": month,
+        "format": fmt,
+        "content": Binary(gzip.compress(raw)),
+        "size": len(raw),
+        "etag": hashlib.sha256(raw).hexdigest()[:32],
+        "generated_at": data["generated_at"],
+        "stale": False,
+    }
+    writer(collection_name_statements, "derived").replace_one({"_id": statement["_id"]}, statement, upsert=True)
+    return statement
+
+
+def get_statement(user_id: str, month: str, fmt: str) -> dict:
+    """Returns the stored statement, regenerating it only when missing or stale."""
+    statement = collection_name_statements.find_one({"_id": f"{user_id}:{month}:{fmt}"})
+    if statement is None or statement.get("stale"):
+        statement = generate_statement(user_id, month, fmt)
+    return statement
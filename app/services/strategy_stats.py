@@ -0,0 +1,122 @@
+import os
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from app.config.read_config import reader
+from app.config.write_config import writer
+from app.services.cache import get_cached, set_cached
+from ..config import (
+    collection_name_trades,
+    collection_name_tombstones,
+    collection_name_strategy_stats,
+    collection_name_view_checkpoints,
+)
+
+load_dotenv()
+
+# Changes this close to the last refresh are recomputed again to absorb clock skew between workers
+STRATEGY_STATS_OVERLAP_SECONDS = int(os.getenv("STRATEGY_STATS_OVERLAP_SECONDS", "60"))
+
+# Every strategy is recomputed this often, catching trades removed without a tombstone
+STRATEGY_STATS_FULL_REFRESH_HOURS = int(os.getenv("STRATEGY_STATS_FULL_REFRESH_HOURS", "24"))
+
+# Strategies traded by fewer users than this are left off the leaderboard so no one's own results are exposed
+LEADERBOARD_MIN_TRADERS = int(os.getenv("LEADERBOARD_MIN_TRADERS", "3"))
+LEADERBOARD_CACHE_SECONDS = int(os.getenv("LEADERBOARD_CACHE_SECONDS", "60"))
+
+LEADERBOARD_SORTS = ("win_rate", "avg_pnl", "trades")
+
+
+def mark_strategies_stale(*names: str):
+    """Flags strategies for recomputation on the next refresh, e.g. the old name of a renamed trade."""
+    for name in {name for name in names if name}:
+        writer(collection_name_strategy_stats, "derived").update_one({"_id": name}, {"$set": {"stale": True}}, upsert=True)
+
+
+def _changed_strategies(since: datetime) -> list:
+    """Strategies with trades written or deleted since `since`, plus those flagged stale."""
+    names = set(collection_name_trades.distinct("strategy_name", {"updated_at": {"$gte": since}}))
+    names.update(collection_name_tombstones.distinct("strategy_name", {"deleted_at": {"$gte": since}, "collection": "trades"}))
+    names.update(collection_name_strategy_stats.distinct("_id", {"stale": True}))
+    return sorted(name for name in names if isinstance(name, str))
+
+
+def refresh_strategy_stats(full: bool = False) -> dict:
+    """Recomputes per-strategy stats into strategy_stats with $merge.
+
+    Incremental runs only regroup the strategies whose trades changed since
+    the previous run; each of those is recomputed in full from the
+    {strategy_name, user, profit_or_loss} index, so the result never drifts.
+    Strategies left without trades are removed. Account deletions flag their
+    strategies stale before removing trades; a periodic full rebuild catches
+    anything removed some other way.
+    """
+    started = datetime.now()
+    run = ObjectId()
+
+    checkpoint = collection_name_view_checkpoints.find_one({"_id": "strategy_stats"})
+    if not checkpoint or started - checkpoint["full_refreshed_at"] > timedelta(hours=STRATEGY_STATS_FULL_REFRESH_HOURS):
+        full = True
+
+    if full:
+        trades_scope, stats_scope = {"strategy_name": {"$type": "string"}}, {}
+        strategies = None
+    else:
+        strategies = _changed_strategies(checkpoint["refreshed_at"] - timedelta(seconds=STRATEGY_STATS_OVERLAP_SECONDS))
+        trades_scope, stats_scope = {"strategy_name": {"$in": strategies}}, {"_id": {"$in": strategies}}
+
+    if strategies != []:
+        collection_name_trades.aggregate([
+            {"$match": trades_scope},
+            # Per user first, so counting traders never builds a set of users in memory
+            {"$group": {
+                "_id": {"strategy": "$strategy_name", "user": "$user"},
+                "trades": {"$sum": 1},
+                "wins": {"$sum": {"$cond": [{"$gt": ["$profit_or_loss", 0]}, 1, 0]}},
+                "total_pnl": {"$sum": "$profit_or_loss"},
+            }},
+            {"$group": {
+                "_id": "$_id.strategy",
+                "trades": {"$sum": "$trades"},
+                "wins": {"$sum": "$wins"},
+                "total_pnl": {"$sum": "$total_pnl"},
+                "traders": {"$sum": 1},
+            }},
+            {"$set": {
+                "win_rate": {"$divide": ["$wins", "$trades"]},
+                "avg_pnl": {"$divide": ["$total_pnl", "$trades"]},
+                "stale": {"$literal": False},
+                "run": run,
+                "refreshed_at": "$$NOW",
+            }},
+            {"$merge": {"into": collection_name_strategy_stats.name, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+        ], allowDiskUse=True)
+
+        # Anything in scope this run did not write has no trades left
+        writer(collection_name_strategy_stats, "derived").delete_many({**stats_scope, "run": {"$ne": run}})
+
+    writer(collection_name_view_checkpoints, "derived").update_one(
+        {"_id": "strategy_stats"},
+        {"$set": {"refreshed_at": started, **({"full_refreshed_at": started} if full else {})}},
+        upsert=True,
+    )
+    return {"full": full, "changed": None if full else len(strategies)}
+
+
+def leaderboard(sort: str = "win_rate", min_trades: int = 20, limit: int = 20) -> list:
+    """Top strategies across all users, served from strategy_stats and cached briefly in memory."""
+    key = f"{sort}:{min_trades}:{limit}"
+    cached = get_cached("leaderboard", key)
+    if cached is not None:
+        return cached
+
+    cursor = reader(collection_name_strategy_stats, "listing").find(
+        {"trades": {"$gte": min_trades}, "traders": {"$gte": LEADERBOARD_MIN_TRADERS}},
+        {"trades": 1, "wins": 1, "win_rate": 1, "avg_pnl": 1, "total_pnl": 1, "traders": 1, "refreshed_at": 1},
+    ).sort([(sort, -1), ("_id", 1)]).limit(limit)
+    rows = [{"strategy_name": row.pop("_id"), **row} for row in cursor]
+
+    set_cached("leaderboard", key, rows, ttl=LEADERBOARD_CACHE_SECONDS)
+    return rows
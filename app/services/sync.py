@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from app.config.write_config import writer
+from ..config import collection_name_tombstones
+
+
+def record_tombstone(user_id: str, collection: str, doc_id: str, **meta):
+    """Remembers a deleted record so delta sync can tell clients to drop it."""
+    writer(collection_name_tombstones, "primary").insert_one({
+        "user": user_id,
+        "collection": collection,
+        "doc_id": doc_id,
+        "deleted_at": datetime.now(),
+        **meta,
+    })
@@ -0,0 +1,98 @@
+from datetime import datetime
+from typing import Iterable, Optional
+
+# Tags live in a multikey index, so keep the arrays short
+MAX_TAGS = 20
+MAX_TAG_LENGTH = 40
+
+# Buckets returned per facet
+FACET_LIMIT = 50
+
+
+def normalize_tags(tags: Optional[Iterable[str]]) -> list:
+    """Trims, lower-cases and de-duplicates tags, keeping their order; raises ValueError past the limits."""
+    normalized = []
+    for tag in tags or []:
+        tag = tag.strip().lower()
+        if len(tag) > MAX_TAG_LENGTH:
+            raise ValueError(f"Tags are limited to {MAX_TAG_LENGTH} characters")
+        if tag and tag not in normalized:
+            normalized.append(tag)
+    if len(normalized) > MAX_TAGS:
+        raise ValueError(f"At most {MAX_TAGS} tags are allowed")
+    return normalized
+
+
+def filter_query(
+    user_id: str,
+    tags: Optional[list] = None,
+    match: str = "all",
+    asset_type: Optional[str] = None,
+    journal_for: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> dict:
+    """Builds the user's filter from any combination of tags, asset type, journal_for and date range.
+
+    Trades saved before they stored asset_type only match an asset_type filter
+    once `python -m app.services.backfill trade-asset-type` has filled it in.
+    """
+    if match not in ("all", "any"):
+        raise ValueError("match must be all or any")
+
+    query = {"user": user_id}
+    tags = normalize_tags(tags)
+    if tags:
+        query["tags"] = {"$all" if match == "all" else "$in": tags}
+    if asset_type:
+        query["asset_type"] = asset_type
+    if journal_for:
+        query["journal_for"] = journal_for
+    if start or end:
+        query["date"] = {op: value for op, value in (("$gte", start), ("$lt", end)) if value}
+    return query
+
+
+def faceted_search(collection, query: dict, projection: Optional[dict], page: int, page_size: int, session=None) -> dict:
+    """Returns one page of matches plus counts per tag, asset type and journal_for from a single $facet.
+
+    The sort sits before $facet, where the {user, date, _id} index can supply
+    the order; inside a $facet sub-pipeline it would always sort in memory.
+    """
+    items = [{"$skip": (page - 1) * page_size}, {"$limit": page_size}]
+    if projection:
+        items.append({"$project": projection})
+
+    def counts(field: str) -> list:
+        # Ties break on the value so the buckets are stable between pages
+        return [{"$group": {"_id": field, "count": {"$sum": 1}}}, {"$sort": {"count": -1, "_id": 1}}, {"$limit": FACET_LIMIT}]
+
+    pipeline = [
+        {"$match": query},
+        {"$sort": {"date": -1, "_id": -1}},
+        {"$facet": {
+            "items": items,
+            "total": [{"$count": "count"}],
+            "tags": [{"$unwind": "$tags"}, *counts("$tags")],
+            "asset_type": counts("$asset_type"),
+            "journal_for": counts("$journal_for"),
+        }},
+    ]
+    result = next(collection.aggregate(pipeline, session=session), {})
+
+    for document in result.get("items", []):
+        document["_id"] = str(document["_id"])
+        if "user" in document:
+            document["user"] = str(document["user"])
+
+    total = result.get("total")
+    return {
+        "page": page,
+        "page_size": page_size,
+        "total": total[0]["count"] if total else 0,
+        "items": result.get("items", []),
+        "facets": {
+            name: [{"value": bucket["_id"], "count": bucket["count"]} for bucket in result.get(name, [])]
+            for name in ("tags", "asset_type", "journal_for")
+        },
+    }
@@ -0,0 +1,324 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+
+load_dotenv()
+
+# Fraction of requests whose spans are exported (0 disables tracing)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+
+# Sampled traces are appended here as OTLP/JSON lines (unset exports nothing)
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+
+# Requests and database commands slower than these are written to the slow log
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_LOG_PATH = os.getenv("SLOW_LOG_PATH", "slow_operations.jsonl")
+
+# Trace and slow log files roll over at this size, keeping this many older files
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+TRACE_LOG_BACKUPS = int(os.getenv("TRACE_LOG_BACKUPS", "5"))
+
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "journalpro")
+
+# OTLP span kinds and status codes
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+
+# Commands that carry a query worth timing; handshakes and heartbeats are skipped
+DATA_COMMANDS = {"find", "getMore", "aggregate", "count", "distinct", "insert", "update", "delete", "findAndModify"}
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_span_id", "name", "kind", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, trace: "_Trace", parent: Optional["Span"], name: str, kind: int = KIND_INTERNAL, attributes: dict = None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent else None
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_OK
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        self.trace.spans.append(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": self.status},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+class _Trace:
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans = []
+
+
+# The sampled trace of the running request and its innermost open span
+_trace: ContextVar[Optional[_Trace]] = ContextVar("trace", default=None)
+_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class _FileWriter:
+    """Appends lines to size-rotated files from a daemon thread so requests never wait on disk."""
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._handlers = {}
+
+    def write(self, path: str, record: dict):
+        if not path:
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+                    self._thread.start()
+        self._queue.put((path, json.dumps(record, default=str)))
+
+    def _handler(self, path: str) -> RotatingFileHandler:
+        handler = self._handlers.get(path)
+        if handler is None:
+            handler = RotatingFileHandler(path, maxBytes=TRACE_LOG_MAX_BYTES, backupCount=TRACE_LOG_BACKUPS, delay=True)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._handlers[path] = handler
+        return handler
+
+    def _run(self):
+        while True:
+            path, line = self._queue.get()
+            # emit() rolls the file over when it is full and reports its own write errors
+            self._handler(path).emit(logging.LogRecord(__name__, logging.INFO, path, 0, line, None, None))
+
+
+_writer = _FileWriter()
+
+
+def _export(trace: _Trace):
+    _writer.write(TRACE_EXPORT_PATH, {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [span.to_otlp() for span in trace.spans],
+            }],
+        }],
+    })
+
+
+def slow_log(kind: str, duration_ms: float, **details):
+    """Writes one slow-operation record; callers pass shapes, never values."""
+    trace = _trace.get()
+    _writer.write(SLOW_LOG_PATH, {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "kind": kind,
+        "duration_ms": round(duration_ms, 2),
+        "trace_id": trace.trace_id if trace else None,
+        **details,
+    })
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """Records a child span of the current one; does nothing when the request is not sampled."""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+
+    current = Span(trace, _span.get(), name, kind, attributes)
+    token = _span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = STATUS_ERROR
+        current.attributes["exception.type"] = type(e).__name__
+        raise
+    finally:
+        _span.reset(token)
+        current.end()
+
+
+def query_shape(value):
+    """Strips literal values from a filter or pipeline, keeping operators, field names and field paths."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        nested = [query_shape(item) for item in value if isinstance(item, (dict, list, tuple))]
+        return nested or ["?"]
+    if isinstance(value, str) and value.startswith("$"):
+        return value
+    return "?"
+
+
+def _command_shape(command_name: str, command) -> dict:
+    if command_name in ("find", "count", "distinct"):
+        return {"filter": query_shape(command.get("filter") or command.get("query") or {})}
+    if command_name == "aggregate":
+        return {"pipeline": query_shape(command.get("pipeline", []))}
+    if command_name == "findAndModify":
+        return {"filter": query_shape(command.get("query", {})), "update": query_shape(command.get("update", {}))}
+    if command_name == "update":
+        updates = command.get("updates") or [{}]
+        return {"filter": query_shape(updates[0].get("q", {})), "update": query_shape(updates[0].get("u", {})), "statements": len(updates)}
+    if command_name == "delete":
+        deletes = command.get("deletes") or [{}]
+        return {"filter": query_shape(deletes[0].get("q", {})), "statements": len(deletes)}
+    if command_name == "insert":
+        return {"documents": len(command.get("documents", []))}
+    return {}
+
+
+class CommandTracing(monitoring.CommandListener):
+    """Turns MongoDB commands into client spans and logs the slow ones by query shape."""
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        if event.command_name not in DATA_COMMANDS:
+            return
+        command = event.command
+        collection = command.get(event.command_name) if event.command_name != "getMore" else command.get("collection")
+        shape = _command_shape(event.command_name, command)
+
+        child = None
+        trace = _trace.get()
+        if trace is not None:
+            child = Span(trace, _span.get(), f"mongo.{event.command_name}", KIND_CLIENT, {
+                "db.system": "mongodb",
+                "db.name": event.database_name,
+                "db.operation": event.command_name,
+                "db.mongodb.collection": str(collection),
+                "db.statement": json.dumps(shape, default=str),
+            })
+        self._pending[(event.connection_id, event.request_id)] = (child, shape, str(collection), time.perf_counter())
+
+    def _finish(self, event, failed: bool):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if not pending:
+            return
+        child, shape, collection, started = pending
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        if child is not None:
+            child.status = STATUS_ERROR if failed else STATUS_OK
+            child.end()
+        if duration_ms >= SLOW_QUERY_MS:
+            slow_log("db", duration_ms, command=event.command_name, database=event.database_name, collection=collection, shape=shape)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+def _traced_endpoint(endpoint):
+    """Wraps the endpoint in an "endpoint" span, keeping the signature FastAPI inspects."""
+    # include_router rebuilds each route from the already wrapped endpoint
+    if getattr(endpoint, "_traced", False):
+        return endpoint
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            with span("endpoint", **{"code.function": endpoint.__name__}):
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            with span("endpoint", **{"code.function": endpoint.__name__}):
+                return endpoint(*args, **kwargs)
+    wrapper._traced = True
+    return wrapper
+
+
+def _record_serialization(trace: _Trace, root: Span):
+    """Adds a span from the endpoint's return until now, covering response validation and rendering."""
+    endpoint_span = next((s for s in reversed(trace.spans) if s.name == "endpoint" and s.parent_span_id == root.span_id), None)
+    if endpoint_span is not None:
+        serialize = Span(trace, root, "serialize")
+        serialize.start_ns = endpoint_span.end_ns
+        serialize.end()
+
+
+class TracedRoute(APIRoute):
+    """Route that opens the request's root span, samples it and logs slow requests."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _traced_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route_name = f"{','.join(sorted(self.methods))} {self.path_format}"
+
+        async def traced_handler(request):
+            started = time.perf_counter()
+            status_code = 500
+            trace = _Trace() if TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE else None
+            trace_token = _trace.set(trace)
+            try:
+                with span(route_name, KIND_SERVER, **{"http.method": request.method, "http.route": self.path_format}) as root:
+                    try:
+                        response = await handler(request)
+                    except Exception as e:
+                        status_code = getattr(e, "status_code", 500)
+                        raise
+                    status_code = response.status_code
+                    if root is not None:
+                        root.attributes["http.status_code"] = status_code
+                        _record_serialization(trace, root)
+                    return response
+            finally:
+                duration_ms = (time.perf_counter() - started) * 1000
+                if duration_ms >= SLOW_REQUEST_MS:
+                    slow_log("request", duration_ms, method=request.method, route=self.path_format, status=status_code)
+                _trace.reset(trace_token)
+                if trace is not None:
+                    _export(trace)
+
+        return traced_handler
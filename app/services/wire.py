@@ -0,0 +1,78 @@
+import json
+from contextvars import ContextVar
+
+from fastapi.responses import JSONResponse
+
+# msgpack is in requirements.txt; a deployment without it simply does not offer the binary encoding
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.journalpro.columnar+json"
+MSGPACK = "application/msgpack"
+
+MEDIA_TYPE_ALIASES = {"application/x-msgpack": MSGPACK, "*/*": JSON, "application/*": JSON}
+
+# Encoding picked for the running request from its Accept header
+wire_format: ContextVar[str] = ContextVar("wire_format", default=JSON)
+
+
+def available_formats() -> list:
+    return [JSON, COLUMNAR_JSON] + ([MSGPACK] if msgpack is not None else [])
+
+
+def negotiate(accept: str) -> str:
+    """Returns the supported media type the Accept header ranks highest, falling back to JSON."""
+    supported = available_formats()
+    best, best_q = JSON, 0.0
+    for position, entry in enumerate(accept.split(",")):
+        media_type, *params = [part.strip() for part in entry.split(";")]
+        media_type = MEDIA_TYPE_ALIASES.get(media_type.lower(), media_type.lower())
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        # Earlier entries win ties, as clients list their preference first
+        if media_type in supported and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def columnar(value):
+    """Rewrites every list of objects as {"columns": [...], "values": [[column values], ...]}.
+
+    Each key is sent once instead of once per row, and values of one column
+    sit next to each other, which also compresses better. Rows missing a
+    column get null.
+    """
+    if isinstance(value, dict):
+        return {key: columnar(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(row, dict) for row in value):
+        columns = list(dict.fromkeys(key for row in value for key in row))
+        return {"columns": columns, "values": [[row.get(column) for row in value] for column in columns]}
+    return value
+
+
+def encode(content, media_type: str) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(content, use_bin_type=True)
+    if media_type == COLUMNAR_JSON:
+        content = columnar(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class NegotiatedResponse(JSONResponse):
+    """JSON response that switches to columnar JSON or MessagePack when the client asks for it."""
+
+    def render(self, content) -> bytes:
+        self.media_type = wire_format.get()
+        return encode(content, self.media_type)
+
+    def init_headers(self, headers=None):
+        super().init_headers(headers)
+        self.headers.add_vary_header("Accept")
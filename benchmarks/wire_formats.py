@@ -0,0 +1,120 @@
+"""Compares bytes on the wire and CPU cost of the response encodings.
+
+    python benchmarks/wire_formats.py --rows 500 --repeat 50
+
+Each list payload (trades, holdings, journals) is encoded as JSON, columnar
+JSON and MessagePack, then sent through gzip and brotli at the settings the
+compression middleware uses.
+"""
+import argparse
+import importlib.util
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _load(name: str, relative_path: str):
+    # Loaded by path: importing the app package starts the app and connects to MongoDB
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+wire = _load("wire", "app/services/wire.py")
+compression = _load("compression", "app/middleware/compression.py")
+
+ASSETS = ["AAPL", "MSFT", "NVDA", "TSLA", "RELIANCE", "BTC-USD", "ETH-USD", "EURUSD"]
+STRATEGIES = ["Breakout", "Pullback", "Mean reversion", "Momentum", "Earnings drift"]
+
+
+def _object_id() -> str:
+    return os.urandom(12).hex()
+
+
+def _date(i: int) -> str:
+    return (datetime(2025, 1, 1) + timedelta(hours=7 * i)).isoformat()
+
+
+def trades(rows: int) -> list:
+    result = []
+    for i in range(rows):
+        quantity, enter = random.randint(1, 500), round(random.uniform(10, 900), 2)
+        exit_price = round(enter * random.uniform(0.9, 1.1), 2)
+        result.append({
+            "_id": _object_id(), "asset_name": random.choice(ASSETS), "asset_type": "equity", "quantity": quantity,
+            "trade_category": random.choice(["buy", "sell"]), "journal_for": "Trade", "trade_type": random.choice(["Intraday", "Swing"]),
+            "enter_price": enter, "stop_loss": 0.0, "exit_price": exit_price, "total_traded": quantity * enter,
+            "profit_or_loss": round(quantity * (exit_price - enter), 2), "date": _date(i), "strategy_name": random.choice(STRATEGIES),
+            "strategy_description": "Entered on a volume-confirmed break of the prior day's high", "tags": ["breakout"],
+            "user": "65f1c0ffee0000000000beef", "updated_at": _date(i),
+        })
+    return result
+
+
+def holdings(rows: int) -> list:
+    result = []
+    for i in range(rows):
+        quantity, bought = random.randint(1, 500), round(random.uniform(10, 900), 2)
+        current = round(bought * random.uniform(0.7, 1.5), 2)
+        result.append({
+            "_id": _object_id(), "asset_name": random.choice(ASSETS), "quantity": quantity, "bought_price": bought,
+            "current_price": current, "total_investment": quantity * bought, "current_investment": quantity * current,
+            "date": _date(i), "user": "65f1c0ffee0000000000beef", "updated_at": _date(i),
+        })
+    return result
+
+
+def journals(rows: int) -> list:
+    result = []
+    for i in range(rows):
+        enter = round(random.uniform(10, 900), 2)
+        result.append({
+            "_id": _object_id(), "asset_name": random.choice(ASSETS), "quantity": random.randint(1, 500), "asset_type": "equity",
+            "journal_for": random.choice(["Trade", "Holding", "Deleted Trade"]), "trade_category": "buy", "enter_price": enter,
+            "exit_price": round(enter * 1.05, 2), "stop_loss": round(enter * 0.97, 2), "strategy_name": random.choice(STRATEGIES),
+            "strategy_description": "Waited for the retest, sized to one percent of the account", "tags": ["plan", "review"],
+            "date": _date(i), "user": "65f1c0ffee0000000000beef", "updated_at": _date(i),
+        })
+    return result
+
+
+def _time_ms(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    random.seed(7)
+
+    encodings = ["identity", "gzip"] + (["br"] if compression.brotli is not None else [])
+    print(f"{'payload':<10}{'format':<44}{'encoding':<10}{'bytes':>10}{'ratio':>8}{'encode ms':>12}{'compress ms':>13}")
+    for name, build in (("trades", trades), ("holdings", holdings), ("journals", journals)):
+        payload = {"success": True, "message": f"{name.capitalize()} retrieved successfully", "data": build(args.rows)}
+        baseline = None
+        for media_type in wire.available_formats():
+            body = wire.encode(payload, media_type)
+            encode_ms = _time_ms(lambda: wire.encode(payload, media_type), args.repeat)
+            for encoding in encodings:
+                if encoding == "identity":
+                    sent, compress_ms = body, 0.0
+                else:
+                    sent = compression.compress(body, encoding)
+                    compress_ms = _time_ms(lambda: compression.compress(body, encoding), args.repeat)
+                baseline = baseline or len(sent)
+                print(f"{name:<10}{media_type:<44}{encoding:<10}{len(sent):>10}{len(sent) / baseline:>8.2f}{encode_ms:>12.3f}{compress_ms:>13.3f}")
+    if wire.msgpack is None:
+        print("msgpack is not installed; MessagePack was skipped")
+
+
+if __name__ == "__main__":
+    main()
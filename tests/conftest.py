@@ -0,0 +1,183 @@
+"""Fixtures for running the routers' queries against a real, seeded mongod.
+
+The suite needs a reachable server: set MONGO_TEST_URL (defaults to a local
+mongod). Everything is written to a throwaway database that is dropped at the
+end, and the tests are skipped when no server answers.
+"""
+import asyncio
+import copy
+import functools
+import os
+from datetime import datetime, timedelta
+
+import bcrypt
+import pytest
+from pymongo import MongoClient, monitoring
+from pymongo.errors import PyMongoError
+
+MONGO_TEST_URL = os.getenv("MONGO_TEST_URL", "mongodb://localhost:27017")
+TEST_DATABASE = os.getenv("MONGO_TEST_DATABASE", "journalpro_query_plans")
+
+
+@functools.lru_cache(maxsize=None)
+def server_available() -> bool:
+    probe = MongoClient(MONGO_TEST_URL, serverSelectionTimeoutMS=1500)
+    try:
+        probe.admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        probe.close()
+
+
+def _fail_fast(url: str) -> str:
+    if "?" in url:
+        separator = "&"
+    elif "/" in url.split("://", 1)[-1]:
+        separator = "?"
+    else:
+        separator = "/?"
+    return f"{url}{separator}serverSelectionTimeoutMS=200"
+
+
+# Point the app at the test server before any app module creates its client;
+# without one, unit tests still import the app but its startup ping gives up quickly
+os.environ["MONGO_URL"] = MONGO_TEST_URL if server_available() else _fail_fast(MONGO_TEST_URL)
+os.environ["DATABASE_NAME"] = TEST_DATABASE
+
+# Importing the app builds the mail config and starts nothing else
+os.environ.setdefault("MAIL_USERNAME", "tests")
+os.environ.setdefault("MAIL_PASSWORD", "tests")
+os.environ.setdefault("MAIL_FROM", "tests@example.com")
+os.environ.setdefault("MAIL_PORT", "587")
+os.environ.setdefault("MAIL_SERVER", "localhost")
+
+# Commands whose plans can be explained
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+
+# Session, topology and API fields the driver adds that explain does not accept
+SESSION_FIELDS = {
+    "$db", "lsid", "txnNumber", "$clusterTime", "$readPreference", "readConcern",
+    "writeConcern", "autocommit", "startTransaction", "apiVersion", "apiStrict", "apiDeprecationErrors",
+}
+
+# Background users make a collection scan examine far more than one user's documents
+BACKGROUND_USERS = 20
+DOCS_PER_USER = 8
+SEED_PASSWORD_HASH = bcrypt.hashpw(b"password", bcrypt.gensalt(rounds=4)).decode("utf-8")
+
+
+class QueryRecorder(monitoring.CommandListener):
+    """Keeps a copy of every explainable command sent while recording."""
+
+    def __init__(self):
+        self.recording = False
+        self.commands = []
+
+    def started(self, event):
+        if self.recording and event.command_name in EXPLAINABLE:
+            self.commands.append(copy.deepcopy(dict(event.command)))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+recorder = QueryRecorder()
+monitoring.register(recorder)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture(scope="session")
+def explain_client():
+    if not server_available():
+        pytest.skip(f"no mongod reachable at {MONGO_TEST_URL} (set MONGO_TEST_URL)")
+
+    client = MongoClient(MONGO_TEST_URL)
+    client.drop_database(TEST_DATABASE)
+
+    from app.config.database import init_collections
+    init_collections()
+
+    yield client
+
+    client.drop_database(TEST_DATABASE)
+    client.close()
+
+
+def _seed_user(index: int) -> str:
+    from app.config import collection_name_users
+    from app.models.holding import NewHolding
+    from app.models.journal import NewJournal
+    from app.models.trade import NewTrade
+    from app.routes import holdings_route, journal_route, trades_route
+
+    user_id = str(collection_name_users.insert_one({
+        "name": f"user{index}",
+        "email": f"user{index}@example.com",
+        "password": SEED_PASSWORD_HASH,
+        "holdings": [],
+        "trades": [],
+        "journal": [],
+        "created_at": datetime.now(),
+        "is_banned": False,
+        "ban_time": None,
+    }).inserted_id)
+
+    start = datetime(2025, 1, 1)
+    for n in range(DOCS_PER_USER):
+        date = start + timedelta(days=7 * n)
+        asset_name = f"U{index}-A{n % 4}"
+        run(holdings_route.create_holding(
+            user_id=user_id,
+            new_holding=NewHolding(asset_name=asset_name, quantity=10, bought_price=100.0, current_price=100.0 + n, date=date),
+            user={},
+        ))
+        run(trades_route.create_trade(
+            user_id=user_id,
+            new_trade=NewTrade(
+                asset_name=asset_name, quantity=5, trade_type="Swing", asset_type="equity", trade_category="buy",
+                enter_price=100.0, exit_price=100.0 + (n % 3 - 1) * 5, strategy_name=f"S{n % 3}",
+                strategy_description="seeded", date=date,
+            ),
+            user={},
+        ))
+        run(journal_route.create_journal(
+            user_id=user_id,
+            new_journal=NewJournal(
+                asset_name=asset_name, quantity=5, asset_type="equity", journal_for="Trade", trade_category="buy",
+                enter_price=100.0, exit_price=105.0, stop_loss=95.0, strategy_name=f"S{n % 3}",
+                strategy_description="seeded", date=date,
+            ),
+            user={},
+        ))
+    return user_id
+
+
+@pytest.fixture(scope="session")
+def seeded(explain_client):
+    """Seeds background users plus the user whose queries are explained; returns that user's id."""
+    for index in range(BACKGROUND_USERS):
+        _seed_user(index)
+    return _seed_user(BACKGROUND_USERS)
+
+
+@pytest.fixture
+def record():
+    """Records the commands issued inside the `with` block."""
+    class _Recording:
+        def __enter__(self):
+            recorder.commands = []
+            recorder.recording = True
+            return recorder.commands
+
+        def __exit__(self, *exc):
+            recorder.recording = False
+
+    return _Recording
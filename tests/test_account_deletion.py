@@ -0,0 +1,97 @@
+"""Account deletion: ownership check, batched cascade, resume after the deadline, export purge."""
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from .conftest import MONGO_TEST_URL, TEST_DATABASE, run, server_available
+
+if not server_available():
+    pytest.skip(f"no mongod reachable at {MONGO_TEST_URL} (set MONGO_TEST_URL)", allow_module_level=True)
+
+from app.routes import user_route
+from app.services import account_deletion, export
+
+
+class _Clock:
+    """Stands in for the time module: every pause between batches advances it by one tick."""
+
+    def __init__(self):
+        self.now = 0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += 1
+
+
+@pytest.fixture
+def leaving(explain_client):
+    db = explain_client[TEST_DATABASE]
+    email = f"leaving-{datetime.now().timestamp()}@example.com"
+    user_id = str(db.users.insert_one({"name": "leaving", "email": email}).inserted_id)
+    db.trades.insert_many([
+        {"user": user_id, "asset_name": "DEL-A", "strategy_name": "Leaving", "date": datetime(2025, 1, n + 1)} for n in range(7)
+    ])
+    db.holdings.insert_many([{"user": user_id, "asset_name": "DEL-A", "date": datetime(2025, 1, 1)} for _ in range(3)])
+    return {"user_id": user_id, "email": email, "db": db}
+
+
+def test_only_the_account_holder_can_delete_it(leaving):
+    with pytest.raises(HTTPException) as raised:
+        run(user_route.delete_user(user_id=leaving["user_id"], user={"email": "someone-else@example.com"}))
+    assert raised.value.status_code == 403
+    assert leaving["db"].users.count_documents({"email": leaving["email"]}) == 1
+    assert leaving["db"].deletion_jobs.find_one({"_id": leaving["user_id"]}) is None
+
+
+def test_deletion_runs_in_batches_and_resumes_after_the_deadline(leaving, monkeypatch):
+    db, user_id = leaving["db"], leaving["user_id"]
+    clock = _Clock()
+    monkeypatch.setattr(account_deletion, "time", clock)
+    monkeypatch.setattr(account_deletion, "DELETION_BATCH_SIZE", 2)
+
+    run(user_route.delete_user(user_id=user_id, user={"email": leaving["email"]}))
+    assert db.users.count_documents({"email": leaving["email"]}) == 0
+
+    # One tick: a single batch of trades fits before the deadline stops the run
+    assert account_deletion.process_deletion(user_id, deadline=1) is False
+    job = db.deletion_jobs.find_one({"_id": user_id})
+    assert (job["status"], job["step"], job["deleted"]["trades"]) == ("running", "trades", 2)
+    assert db.trades.count_documents({"user": user_id}) == 5
+    assert db.holdings.count_documents({"user": user_id}) == 3
+    # Trades go without tombstones, so the leaderboard is told to recompute their strategies
+    assert db.strategy_stats.find_one({"_id": "Leaving"})["stale"] is True
+
+    # A retry of the request finds the job it started
+    retried = run(user_route.delete_user(user_id=user_id, user={"email": leaving["email"]}))
+    assert retried.user["status"] == "running"
+
+    assert account_deletion.process_deletion(user_id, deadline=clock.now + 100) is True
+    job = db.deletion_jobs.find_one({"_id": user_id})
+    assert job["status"] == "done"
+    assert (job["deleted"]["trades"], job["deleted"]["holdings"]) == (7, 3)
+    assert "requested_by" not in job
+    assert db.trades.count_documents({"user": user_id}) == 0
+    assert db.holdings.count_documents({"user": user_id}) == 0
+
+
+@pytest.mark.skipif(export.pa is None, reason="pyarrow is not installed")
+def test_deletion_removes_the_users_rows_from_exports(leaving, monkeypatch, tmp_path):
+    db, user_id = leaving["db"], leaving["user_id"]
+    db.trades.insert_one({"user": "someone-else", "asset_name": "DEL-B", "date": datetime(2025, 1, 2)})
+    monkeypatch.setattr(export, "EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(account_deletion, "DELETION_BATCH_PAUSE_MS", 0)
+
+    export.export_collection("trades", full=True)
+    before = export.pa.concat_tables(export._read_table(str(path)) for path in tmp_path.rglob("part-*.parquet"))
+    assert user_id in before["user"].to_pylist()
+
+    account_deletion.schedule_deletion(user_id, leaving["email"])
+    assert account_deletion.process_deletion(user_id, deadline=float("inf")) is True
+
+    after = export.pa.concat_tables(export._read_table(str(path)) for path in tmp_path.rglob("part-*.parquet"))
+    assert user_id not in after["user"].to_pylist()
+    assert after.num_rows == before.num_rows - 7
+    assert db.deletion_jobs.find_one({"_id": user_id})["deleted"]["exports"] == 7
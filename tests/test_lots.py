@@ -0,0 +1,70 @@
+"""Lot matching for FIFO, LIFO and AVERAGE, checked on the pure matcher."""
+from datetime import datetime
+
+import pytest
+
+from app.services.lots import _match, resolve_method
+
+
+def _lots():
+    return [
+        {"_id": 2, "remaining": 10, "price": 7.0, "date": datetime(2025, 1, 2)},
+        {"_id": 1, "remaining": 10, "price": 5.0, "date": datetime(2025, 1, 1)},
+        {"_id": 3, "remaining": 5, "price": 9.0, "date": datetime(2025, 1, 3)},
+    ]
+
+
+def _takes(taken):
+    return [(lot["_id"], take) for lot, take in taken]
+
+
+def test_fifo_consumes_oldest_lots_first():
+    taken, matched, cost_removed, realized = _match(_lots(), 15, 8.0, "FIFO", 25, 165.0)
+    assert _takes(taken) == [(1, 10), (2, 5)]
+    assert matched == 15
+    assert cost_removed == 10 * 5.0 + 5 * 7.0
+    assert realized == 15 * 8.0 - cost_removed
+
+
+def test_lifo_consumes_newest_lots_first():
+    taken, matched, cost_removed, realized = _match(_lots(), 12, 8.0, "LIFO", 25, 165.0)
+    assert _takes(taken) == [(3, 5), (2, 7)]
+    assert cost_removed == 5 * 9.0 + 7 * 7.0
+    assert realized == 12 * 8.0 - cost_removed
+
+
+def test_average_removes_cost_at_the_average_price():
+    taken, matched, cost_removed, realized = _match(_lots(), 10, 8.0, "AVERAGE", 25, 165.0)
+    assert matched == 10
+    assert cost_removed == pytest.approx(10 * 165.0 / 25)
+    assert realized == pytest.approx(80.0 - 66.0)
+
+
+def test_same_date_lots_match_in_insertion_order():
+    lots = [
+        {"_id": 2, "remaining": 3, "price": 2.0, "date": datetime(2025, 1, 1)},
+        {"_id": 1, "remaining": 3, "price": 1.0, "date": datetime(2025, 1, 1)},
+    ]
+    assert _takes(_match(lots, 4, 1.0, "FIFO", 6, 9.0)[0]) == [(1, 3), (2, 1)]
+    assert _takes(_match(lots, 4, 1.0, "LIFO", 6, 9.0)[0]) == [(2, 3), (1, 1)]
+
+
+def test_oversell_matches_only_the_open_quantity():
+    taken, matched, cost_removed, realized = _match(_lots(), 40, 8.0, "FIFO", 25, 165.0)
+    assert matched == 25
+    assert cost_removed == 165.0
+    assert realized == 25 * 8.0 - 165.0
+
+
+def test_empty_position_matches_nothing():
+    assert _match([], 5, 8.0, "AVERAGE", 0, 0.0) == ([], 0, 0.0, 0.0)
+
+
+@pytest.mark.parametrize("user_doc, expected", [
+    (None, "FIFO"),
+    ({"lot_method": "lifo"}, "LIFO"),
+    ({"lot_method": "average"}, "AVERAGE"),
+    ({"lot_method": "HIFO"}, "FIFO"),
+])
+def test_resolve_method(user_doc, expected):
+    assert resolve_method(user_doc) == expected
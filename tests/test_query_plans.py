@@ -0,0 +1,207 @@
+"""Explains every query the routers issue and fails when one stops using an index.
+
+Each scenario calls a route handler against the seeded database while its
+commands are recorded. Every recorded read and write filter is then explained
+with executionStats: the plan must not contain a COLLSCAN, must be driven by an
+index, and must examine no more documents or keys than the calling user owns
+(plus a little slack), so a scan across other users' data is caught.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from .conftest import BACKGROUND_USERS, MONGO_TEST_URL, SESSION_FIELDS, TEST_DATABASE, run, server_available
+
+# Importing the app pings the database, so bail out before that when there is none
+if not server_available():
+    pytest.skip(f"no mongod reachable at {MONGO_TEST_URL} (set MONGO_TEST_URL)", allow_module_level=True)
+
+from app.models.holding import AdjustHolding, NewHolding, UpdateHolding
+from app.models.journal import NewJournal, UpdateJournal
+from app.models.trade import NewTrade, UpdateTrade
+from app.routes import holdings_route, journal_route, pnl_route, prices_route, statements_route, strategies_route, sync_route, trades_route, user_route
+
+# Plan stages that read through an index rather than the whole collection
+INDEX_STAGES = ("IXSCAN", "IDHACK", "COUNT_SCAN", "DISTINCT_SCAN", "EOF")
+
+# Allowance on top of twice the documents the user owns in the queried collection
+SLACK = 5
+
+
+def _request(headers: dict = None) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": ("127.0.0.1", 50000),
+    })
+
+
+def _new_trade(**overrides) -> NewTrade:
+    fields = dict(
+        asset_name="PLAN-A", quantity=3, trade_type="Swing", asset_type="equity", trade_category="buy",
+        enter_price=50.0, exit_price=55.0, strategy_name="Plan", strategy_description="query plan", date=datetime(2025, 2, 3),
+        tags=["plan", "breakout"],
+    )
+    return NewTrade(**{**fields, **overrides})
+
+
+def _new_holding(**overrides) -> NewHolding:
+    fields = dict(asset_name="PLAN-A", quantity=4, bought_price=50.0, current_price=52.0, date=datetime(2025, 2, 3))
+    return NewHolding(**{**fields, **overrides})
+
+
+def _new_journal(**overrides) -> NewJournal:
+    fields = dict(
+        asset_name="PLAN-A", quantity=3, asset_type="equity", journal_for="Trade", trade_category="buy",
+        enter_price=50.0, exit_price=55.0, stop_loss=45.0, strategy_name="Plan", strategy_description="query plan",
+        date=datetime(2025, 2, 3), tags=["plan"],
+    )
+    return NewJournal(**{**fields, **overrides})
+
+
+@pytest.fixture
+def target(seeded, explain_client):
+    """Fresh holding, trade and journal for the seeded user, created outside the recording."""
+    db = explain_client[TEST_DATABASE]
+    run(holdings_route.create_holding(user_id=seeded, new_holding=_new_holding(), user={}))
+    run(trades_route.create_trade(user_id=seeded, new_trade=_new_trade(), user={}))
+    run(journal_route.create_journal(user_id=seeded, new_journal=_new_journal(), user={}))
+
+    def latest(collection):
+        return str(db[collection].find_one({"user": seeded}, sort=[("_id", -1)])["_id"])
+
+    return {"user_id": seeded, "holding_id": latest("holdings"), "trade_id": latest("trades"), "journal_id": latest("journals")}
+
+
+def _login(t):
+    with pytest.raises(HTTPException) as raised:
+        run(user_route.login_user(login_user=user_route.LoginUser(email=f"user{BACKGROUND_USERS}@example.com", password="wrong"), request=_request()))
+    assert raised.value.status_code == 401
+
+
+def _delete_user(t):
+    from app.config import collection_name_users
+    email = f"leaving-{t['trade_id']}@example.com"
+    user_id = str(collection_name_users.insert_one({"name": "leaving", "email": email}).inserted_id)
+    run(user_route.delete_user(user_id=user_id, user={"email": email}))
+
+
+SCENARIOS = {
+    "register": lambda t: run(user_route.create_user(user_route.NewUser(name="plan", email=f"plan-{t['trade_id']}@example.com", password="password"))),
+    "login": _login,
+    "delete_user": _delete_user,
+    "create_holding": lambda t: run(holdings_route.create_holding(user_id=t["user_id"], new_holding=_new_holding(asset_name="PLAN-B"), user={})),
+    "all_holdings": lambda t: run(holdings_route.get_all_holdings(user_id=t["user_id"], fields=None, exclude=None, user={})),
+    "positions": lambda t: run(holdings_route.get_positions(user_id=t["user_id"], page=1, page_size=20, sort_by="exposure", order="desc", user={})),
+    "get_holding": lambda t: run(holdings_route.get_holding(user_id=t["user_id"], holding_id=t["holding_id"], fields=None, exclude=None, user={})),
+    "update_holding": lambda t: run(holdings_route.update_holding(
+        user_id=t["user_id"], holding_id=t["holding_id"],
+        holding_data=UpdateHolding(asset_name="PLAN-A", quantity=6, bought_price=51.0, current_price=53.0, date=datetime(2025, 2, 4)),
+        user={},
+    )),
+    "adjust_holding": lambda t: run(holdings_route.adjust_holding(
+        user_id=t["user_id"], holding_id=t["holding_id"], adjustment=AdjustHolding(quantity_delta=-1), user={},
+    )),
+    "patch_holding": lambda t: run(holdings_route.patch_holding(
+        user_id=t["user_id"], holding_id=t["holding_id"], holding_data=UpdateHolding(quantity=5, current_price=54.0), user={},
+    )),
+    "delete_holding": lambda t: run(holdings_route.delete_holding(user_id=t["user_id"], holding_id=t["holding_id"], user={})),
+    "create_trade": lambda t: run(trades_route.create_trade(user_id=t["user_id"], new_trade=_new_trade(asset_name="PLAN-B"), user={})),
+    "all_trades": lambda t: run(trades_route.get_all_trades(user_id=t["user_id"], fields=None, exclude=None, user={})),
+    "calendar": lambda t: run(trades_route.get_pnl_calendar(
+        user_id=t["user_id"], unit="week", start=datetime(2025, 1, 1), end=datetime(2025, 3, 1), tz=None, user={},
+    )),
+    "get_trade": lambda t: run(trades_route.get_trade(user_id=t["user_id"], trade_id=t["trade_id"], fields=None, exclude=None, user={})),
+    "update_trade": lambda t: run(trades_route.update_holding(
+        user_id=t["user_id"], trade_id=t["trade_id"], trade_data=_new_trade(exit_price=49.0), user={},
+    )),
+    "patch_trade": lambda t: run(trades_route.patch_trade(
+        user_id=t["user_id"], trade_id=t["trade_id"], trade_data=UpdateTrade(exit_price=57.0, date=datetime(2025, 3, 3)), user={},
+    )),
+    "delete_trade": lambda t: run(trades_route.delete_trade(user_id=t["user_id"], trade_id=t["trade_id"], user={})),
+    "create_journal": lambda t: run(journal_route.create_journal(user_id=t["user_id"], new_journal=_new_journal(), user={})),
+    "all_journals": lambda t: run(journal_route.get_all_journals(user_id=t["user_id"], fields=None, exclude=None, user={})),
+    "get_journal": lambda t: run(journal_route.get_journal(user_id=t["user_id"], journal_id=t["journal_id"], fields=None, exclude=None, user={})),
+    "update_journal": lambda t: run(journal_route.update_journal(
+        user_id=t["user_id"], journal_id=t["journal_id"], journal_data=_new_journal(stop_loss=44.0), user={},
+    )),
+    "patch_journal": lambda t: run(journal_route.patch_journal(
+        user_id=t["user_id"], journal_id=t["journal_id"], journal_data=UpdateJournal(stop_loss=43.0), user={},
+    )),
+    "search_trades": lambda t: run(trades_route.search_trades(
+        user_id=t["user_id"], tags=["plan"], match="all", asset_type="equity", journal_for=None, start=None, end=None,
+        page=1, page_size=20, fields=None, exclude=None, user={},
+    )),
+    "search_journals": lambda t: run(journal_route.search_journals(
+        user_id=t["user_id"], tags=["plan", "breakout"], match="any", asset_type=None, journal_for="Trade",
+        start=datetime(2025, 1, 1), end=None, page=1, page_size=20, fields=None, exclude=None, user={},
+    )),
+    "leaderboard": lambda t: run(strategies_route.get_leaderboard(sort="win_rate", min_trades=1, limit=20, user={})),
+    "delete_journal": lambda t: run(journal_route.delete_journal(user_id=t["user_id"], journal_id=t["journal_id"], user={})),
+    "pnl": lambda t: run(pnl_route.get_pnl(user_id=t["user_id"], user={})),
+    "open_lots": lambda t: run(pnl_route.get_open_lots(user_id=t["user_id"], asset_name="PLAN-A", user={})),
+    "full_sync": lambda t: run(sync_route.sync(user_id=t["user_id"], checkpoint=None, user={})),
+    "delta_sync": lambda t: run(sync_route.sync(user_id=t["user_id"], checkpoint=datetime.now() - timedelta(minutes=5), user={})),
+    "price_history": lambda t: run(prices_route.get_price_history(asset_name="PLAN-A", granularity="1h", start=None, end=None, user={})),
+    "portfolio_value": lambda t: run(prices_route.get_portfolio_value(user_id=t["user_id"], granularity="1d", start=None, end=None, user={})),
+    "statement": lambda t: run(statements_route.get_monthly_statement(
+        user_id=t["user_id"], month="2025-02", request=_request({"Accept-Encoding": "gzip"}), format="html", user={},
+    )),
+}
+
+
+def _walk(node, stages: list, totals: dict):
+    """Collects plan stage names and examined totals, ignoring rejected plans."""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key in ("rejectedPlans", "allPlansExecution"):
+                continue
+            if key == "stage" and isinstance(value, str):
+                stages.append(value)
+            elif key in totals and isinstance(value, int):
+                totals[key] += value
+            else:
+                _walk(value, stages, totals)
+    elif isinstance(node, list):
+        for item in node:
+            _walk(item, stages, totals)
+
+
+def _owned(db, collection: str, user_id: str) -> int:
+    """How many documents in the collection a user-scoped query may legitimately touch."""
+    if collection == "users":
+        return 1
+    if collection == "price_history":
+        # Time-series reads examine buckets, roughly one per asset in the seeded window
+        return len(db.holdings.distinct("asset_name", {"user": user_id})) + 1
+    return db[collection].count_documents({"user": user_id})
+
+
+@pytest.mark.parametrize("scenario", sorted(SCENARIOS))
+def test_route_queries_use_indexes(scenario, target, record, explain_client):
+    with record() as commands:
+        SCENARIOS[scenario](target)
+
+    assert commands, f"{scenario} issued no explainable queries"
+
+    db = explain_client[TEST_DATABASE]
+    for command in commands:
+        name = next(iter(command))
+        collection = command[name]
+        inner = {key: value for key, value in command.items() if key not in SESSION_FIELDS}
+        explained = db.command({"explain": inner, "verbosity": "executionStats"})
+
+        stages, totals = [], {"totalDocsExamined": 0, "totalKeysExamined": 0}
+        _walk(explained, stages, totals)
+        shape = f"{scenario}: {name} on {collection} {inner.get('filter') or inner.get('query') or inner.get('pipeline') or inner.get('updates') or inner.get('deletes')}"
+
+        assert "COLLSCAN" not in stages, f"collection scan in {shape}"
+        assert any(marker in stage for stage in stages for marker in INDEX_STAGES), f"no index used in {shape} (stages: {stages})"
+
+        limit = 2 * _owned(db, collection, target["user_id"]) + SLACK
+        assert totals["totalDocsExamined"] <= limit, f"{totals['totalDocsExamined']} documents examined (limit {limit}) in {shape}"
+        assert totals["totalKeysExamined"] <= limit, f"{totals['totalKeysExamined']} keys examined (limit {limit}) in {shape}"
@@ -0,0 +1,77 @@
+"""Read-your-own-writes across a replica set.
+
+Listing and analytics reads go to secondaries, so right after a write they
+would miss it unless they carry the writer's causal session. These tests
+write through the route handlers and check that the following reads wait for
+that write (afterClusterTime) and see it. They need MONGO_TEST_URL to point at
+a replica set; a standalone server has no secondaries to route to.
+"""
+from datetime import datetime
+
+import pytest
+
+from .conftest import MONGO_TEST_URL, run, server_available
+
+if not server_available():
+    pytest.skip(f"no mongod reachable at {MONGO_TEST_URL} (set MONGO_TEST_URL)", allow_module_level=True)
+
+from app.models.holding import NewHolding
+from app.models.trade import NewTrade
+from app.routes import holdings_route, pnl_route, trades_route
+from app.config.read_config import user_write_times
+
+
+@pytest.fixture
+def user_id(explain_client):
+    if not explain_client.admin.command("hello").get("setName"):
+        pytest.skip("MONGO_TEST_URL is not a replica set")
+
+    from app.config import collection_name_users
+    return str(collection_name_users.insert_one({"name": "routing", "email": f"routing-{datetime.now().timestamp()}@example.com"}).inserted_id)
+
+
+def _reads_after(commands: list, collection: str) -> list:
+    return [
+        command["readConcern"].get("afterClusterTime")
+        for command in commands
+        if command.get("find") == collection or command.get("aggregate") == collection
+        if "readConcern" in command
+    ]
+
+
+def test_pnl_reads_wait_for_the_users_last_lot_write(user_id, record):
+    run(holdings_route.create_holding(
+        user_id=user_id,
+        new_holding=NewHolding(asset_name="ROUTE-A", quantity=10, bought_price=10.0, current_price=12.0, date=datetime(2025, 2, 3)),
+        user={},
+    ))
+    # The last write the user made is the P&L update, which the read must not run ahead of
+    _, operation_time, _ = user_write_times[user_id]
+
+    with record() as commands:
+        response = run(pnl_route.get_pnl(user_id=user_id, user={}))
+
+    waits = _reads_after(commands, "pnl")
+    assert waits and all(wait is not None and wait >= operation_time for wait in waits)
+    assert [p["asset_name"] for p in response.data["positions"]] == ["ROUTE-A"]
+    assert response.data["unrealized_pnl"] == pytest.approx(20.0)
+
+
+def test_calendar_sees_a_trade_written_just_before(user_id, record):
+    run(trades_route.create_trade(
+        user_id=user_id,
+        new_trade=NewTrade(
+            asset_name="ROUTE-B", quantity=2, trade_type="Swing", asset_type="equity", trade_category="buy",
+            enter_price=10.0, exit_price=15.0, strategy_name="Routing", strategy_description="routing", date=datetime(2025, 2, 3),
+        ),
+        user={},
+    ))
+
+    with record() as commands:
+        response = run(trades_route.get_pnl_calendar(
+            user_id=user_id, unit="month", start=datetime(2025, 1, 1), end=datetime(2025, 3, 1), tz="UTC", user={},
+        ))
+
+    waits = _reads_after(commands, "trades")
+    assert waits and all(wait is not None for wait in waits)
+    assert sum(bucket["net_pnl"] for bucket in response.data["buckets"]) == pytest.approx(10.0)
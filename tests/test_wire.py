@@ -0,0 +1,118 @@
+"""Response encodings: Accept negotiation, columnar JSON, MessagePack and Accept-Encoding compression."""
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware import compression
+from app.middleware.compression import CompressionMiddleware, choose_encoding
+from app.middleware.negotiation import ContentNegotiationMiddleware
+from app.services import wire
+from app.services.wire import COLUMNAR_JSON, JSON, MSGPACK, NegotiatedResponse, columnar, encode, negotiate
+
+ROWS = [{"asset_name": f"A{n}", "quantity": n, "price": 1.5 * n} for n in range(100)]
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(ContentNegotiationMiddleware)
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/rows", response_class=NegotiatedResponse)
+    async def rows():
+        return {"success": True, "data": ROWS}
+
+    @app.get("/small", response_class=NegotiatedResponse)
+    async def small():
+        return {"success": True}
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("application/json", JSON),
+    ("*/*", JSON),
+    ("text/html", JSON),
+    (COLUMNAR_JSON, COLUMNAR_JSON),
+    (f"application/json;q=0.5, {COLUMNAR_JSON}", COLUMNAR_JSON),
+    (f"{COLUMNAR_JSON};q=0.2, application/json;q=0.9", JSON),
+    (f"{COLUMNAR_JSON};q=0", JSON),
+    (f"{COLUMNAR_JSON};q=oops, application/json;q=0.1", JSON),
+    # Earlier entries win ties
+    (f"application/json, {COLUMNAR_JSON}", JSON),
+])
+def test_negotiate(accept, expected):
+    assert negotiate(accept) == expected
+
+
+def test_negotiate_msgpack_only_when_installed(monkeypatch):
+    if wire.msgpack is not None:
+        assert negotiate("application/x-msgpack") == MSGPACK
+    monkeypatch.setattr(wire, "msgpack", None)
+    assert negotiate("application/msgpack, application/json;q=0.1") == JSON
+
+
+def test_columnar_rewrites_lists_of_objects_at_any_depth():
+    value = {"data": [{"a": 1, "b": 2}, {"b": 3, "c": 4}], "total": 2, "tags": ["x", "y"], "empty": []}
+    assert columnar(value) == {
+        "data": {"columns": ["a", "b", "c"], "values": [[1, None], [2, 3], [None, 4]]},
+        "total": 2,
+        "tags": ["x", "y"],
+        "empty": [],
+    }
+    assert columnar([{"a": 1}, "not an object"]) == [{"a": 1}, "not an object"]
+
+
+def test_encode_round_trips():
+    content = {"data": ROWS[:3]}
+    assert json.loads(encode(content, JSON)) == content
+    assert json.loads(encode(content, COLUMNAR_JSON)) == columnar(content)
+    if wire.msgpack is not None:
+        assert wire.msgpack.unpackb(encode(content, MSGPACK), raw=False) == content
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "br"),
+    ("br, gzip", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("GZIP;q=0.8, deflate", "gzip"),
+    ("*;q=0.3, gzip;q=0", "br"),
+])
+def test_choose_encoding(accept_encoding, expected):
+    if compression.brotli is None:
+        pytest.skip("brotli is not installed")
+    assert choose_encoding(accept_encoding) == expected
+
+
+def test_choose_encoding_without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding("br") is None
+    assert choose_encoding("br, gzip;q=0.1") == "gzip"
+
+
+def test_responses_switch_encoding_and_compress(client):
+    plain = client.get("/rows", headers={"Accept": "application/json", "Accept-Encoding": "gzip"})
+    assert plain.headers["content-type"].startswith(JSON)
+    assert plain.headers["content-encoding"] == "gzip"
+    assert "Accept" in plain.headers["vary"] and "Accept-Encoding" in plain.headers["vary"]
+    assert plain.json()["data"] == ROWS
+
+    packed = client.get("/rows", headers={"Accept": COLUMNAR_JSON, "Accept-Encoding": "gzip"})
+    assert packed.headers["content-type"].startswith(COLUMNAR_JSON)
+    assert packed.json()["data"]["columns"] == ["asset_name", "quantity", "price"]
+    assert int(packed.headers["content-length"]) < int(plain.headers["content-length"])
+
+
+def test_small_and_unaccepted_bodies_are_not_compressed(client):
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+    raw = client.get("/rows", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert raw.json()["data"] == ROWS